@@ -1,52 +1,91 @@
-import time
+from math import copysign
+from weakref import WeakKeyDictionary
+
+import Clock
+from State import button_bit
 # ==============================================================================
 # ======================== ACTION HANDLING SYSTEM (不变) ======================
 # ==============================================================================
 # ... (所有 Action 类代码保持不变, 省略) ...
 class Action:
     def update(self, state, last_state, mouse, keyboard): pass
+    # 释放仍被按住的输出（离开所在的层时调用）
+    def release(self, mouse, keyboard): pass
+    # 接管当前已按住的按钮而不产生按下沿（进入所在的层时调用）
+    def sync(self, state): pass
 class MouseMoveAction(Action):
-    def __init__(self, x_axis, y_axis, sensitivity, deadzone): self.x_axis, self.y_axis, self.sensitivity, self.deadzone = x_axis, y_axis, sensitivity, deadzone
+    # exponent 是响应曲线的指数（保留符号），默认 3 与原来的 x ** 3 相同；可用 Replay.py 离线比较不同的取值
+    def __init__(self, x_axis, y_axis, sensitivity, deadzone, exponent=3): self.x_axis, self.y_axis, self.sensitivity, self.deadzone, self.exponent = x_axis, y_axis, sensitivity, deadzone, exponent
     def update(self, state, last_state, mouse, keyboard):
         x_val, y_val = state[self.x_axis], state[self.y_axis]
         if abs(x_val) < self.deadzone: x_val = 0
         if abs(y_val) < self.deadzone: y_val = 0
-        if x_val != 0 or y_val != 0: mouse.move((x_val ** 3) * self.sensitivity, -(y_val ** 3) * self.sensitivity)
+        if x_val != 0 or y_val != 0: mouse.move(copysign(abs(x_val) ** self.exponent, x_val) * self.sensitivity, -copysign(abs(y_val) ** self.exponent, y_val) * self.sensitivity)
 class ClickAction(Action):
-    def __init__(self, controller_button, mouse_button): self.controller_button, self.mouse_button = controller_button, mouse_button
+    def __init__(self, controller_button, mouse_button): self.controller_button, self.mouse_button = controller_button, mouse_button; self.held = False
     def update(self, state, last_state, mouse, keyboard):
         is_pressed = state['buttons'].get(self.controller_button, False)
         was_pressed = last_state['buttons'].get(self.controller_button, False) if last_state else False
-        if is_pressed and not was_pressed: mouse.press(self.mouse_button)
-        elif not is_pressed and was_pressed: mouse.release(self.mouse_button)
+        if is_pressed and not was_pressed: mouse.press(self.mouse_button); self.held = True
+        elif not is_pressed and was_pressed and self.held: mouse.release(self.mouse_button); self.held = False
+    def release(self, mouse, keyboard):
+        if self.held: mouse.release(self.mouse_button); self.held = False
 class ScrollAction(Action):
     def __init__(self, controller_button, scroll_speed, initial_delay, repeat_rate): self.controller_button, self.scroll_speed, self.initial_delay, self.repeat_rate = controller_button, scroll_speed, initial_delay, repeat_rate; self.pressed, self.next_scroll_time = False, 0
     def update(self, state, last_state, mouse, keyboard):
         is_down = state['buttons'].get(self.controller_button, False)
-        current_time = time.time()
+        current_time = Clock.now()
         if is_down:
             if not self.pressed: mouse.scroll(0, self.scroll_speed); self.pressed = True; self.next_scroll_time = current_time + self.initial_delay
             elif current_time >= self.next_scroll_time: mouse.scroll(0, self.scroll_speed); self.next_scroll_time = current_time + self.repeat_rate
         else: self.pressed = False
+    def release(self, mouse, keyboard): self.pressed = False
+    def sync(self, state):
+        self.pressed = state['buttons'].get(self.controller_button, False)
+        if self.pressed: self.next_scroll_time = Clock.now() + self.initial_delay
+# 每个键盘对象上各个键被多少个绑定按住（引用计数）：同一个修饰键被几个绑定同时使用时，
+# 只在第一个按下时发送 press、最后一个松开时发送 release，不会互相提前松开或重复发送
+HELD_KEYS = WeakKeyDictionary()
+def press_key(keyboard, key):
+    counts = HELD_KEYS.setdefault(keyboard, {}); counts[key] = counts.get(key, 0) + 1
+    if counts[key] == 1: keyboard.press(key)
+def release_key(keyboard, key):
+    counts = HELD_KEYS.get(keyboard, {}); count = counts.get(key, 0)
+    if count > 1: counts[key] = count - 1
+    elif count == 1: del counts[key]; keyboard.release(key)
 class KeyboardAction(Action):
-    def __init__(self, controller_button, key, modifier=None): self.controller_button, self.key, self.modifier = controller_button, key, ([modifier] if modifier and not isinstance(modifier, (list, tuple)) else modifier)
+    # hold=False: 按下时点按一次（修饰键只在点按期间按住）；hold=True: 按下时按住键和修饰键，松开时松开，由系统自己产生重复
+    def __init__(self, controller_button, key, modifier=None, hold=False): self.controller_button, self.key, self.modifier, self.hold = controller_button, key, ([modifier] if modifier and not isinstance(modifier, (list, tuple)) else modifier), hold; self.held = False
     def update(self, state, last_state, mouse, keyboard):
         is_pressed = state['buttons'].get(self.controller_button, False)
         was_pressed = last_state['buttons'].get(self.controller_button, False) if last_state else False
         if is_pressed and not was_pressed:
-            if self.modifier:
-                with keyboard.pressed(*self.modifier): keyboard.tap(self.key)
-            else: keyboard.tap(self.key)
+            for modifier in self.modifier or (): press_key(keyboard, modifier)
+            if self.hold: press_key(keyboard, self.key); self.held = True
+            else:
+                try: keyboard.tap(self.key)
+                finally:
+                    for modifier in reversed(self.modifier or ()): release_key(keyboard, modifier)
+        elif not is_pressed and was_pressed and self.held: self.release(mouse, keyboard)
+    def release(self, mouse, keyboard):
+        if self.held:
+            release_key(keyboard, self.key); self.held = False
+            for modifier in reversed(self.modifier or ()): release_key(keyboard, modifier)
 class AnalogAsButtonScrollAction(Action):
     def __init__(self, axis_name, threshold, scroll_speed, initial_delay, repeat_rate): self.axis_name, self.threshold, self.scroll_speed, self.initial_delay, self.repeat_rate = axis_name, threshold, scroll_speed, initial_delay, repeat_rate; self.pressed, self.next_scroll_time = False, 0
     def update(self, state, last_state, mouse, keyboard):
-        value = state.get(self.axis_name, 0.0); is_down = value >= self.threshold if self.threshold >= 0 else value <= self.threshold; current_time = time.time()
+        value = state.get(self.axis_name, 0.0); is_down = value >= self.threshold if self.threshold >= 0 else value <= self.threshold; current_time = Clock.now()
         if is_down:
             if not self.pressed: mouse.scroll(0, self.scroll_speed); self.pressed = True; self.next_scroll_time = current_time + self.initial_delay
             elif current_time >= self.next_scroll_time: mouse.scroll(0, self.scroll_speed); self.next_scroll_time = current_time + self.repeat_rate
         else: self.pressed = False
+    def release(self, mouse, keyboard): self.pressed = False
+    def sync(self, state):
+        value = state.get(self.axis_name, 0.0); self.pressed = value >= self.threshold if self.threshold >= 0 else value <= self.threshold
+        if self.pressed: self.next_scroll_time = Clock.now() + self.initial_delay
 class ThresholdAction(Action):
-    def __init__(self, source_axis, threshold, output_button_name): self.source_axis, self.threshold, self.output_button_name = source_axis, threshold, output_button_name
+    def __init__(self, source_axis, threshold, output_button_name): self.source_axis, self.threshold, self.output_button_name = source_axis, threshold, output_button_name; self.output_bit = button_bit(output_button_name)
     def update(self, state, last_state, mouse, keyboard):
-        value = state.get(self.source_axis, 0.0)
-        state['buttons'][self.output_button_name] = (value >= self.threshold if self.threshold >= 0 else value <= self.threshold)
\ No newline at end of file
+        value = state.get(self.source_axis, 0.0); is_on = value >= self.threshold if self.threshold >= 0 else value <= self.threshold
+        state['buttons'][self.output_button_name] = is_on
+        state['mask'] = (state['mask'] | self.output_bit) if is_on else (state['mask'] & ~self.output_bit)
\ No newline at end of file
@@ -0,0 +1,119 @@
+from array import array
+
+import Clock
+from Action import Action, press_key, release_key
+
+# ==============================================================================
+# ======================== 连发 (Turbo / Autofire) =============================
+# ==============================================================================
+# 按住按钮时以 rate 次/秒重复点击鼠标键或键盘键，松开即停。每次点击的按下和松开都由
+# 中央定时器 Clock.scheduler 触发，而不是在 update 里比较时间：主循环每轮都会执行到期的
+# 定时器，所以手柄不发报文（按住不动时 HID 手柄不发新报文）也不影响连发。
+#
+# 第 k 次按下安排在 start + k / rate，按绝对时间计算，单次触发的延迟不会累积成频率偏差；
+# 主循环卡住超过一个周期时跳过错过的点击（计入 skipped），而不是恢复后一口气补发。
+# 每次触发时记录实际时刻与计划时刻之差（保存最近 JITTER_SAMPLES 个），stats() 给出
+# 分位数和实测频率；运行时可通过控制接口 (Control.py) 的 get 命令查看。
+# 键盘键经由 Action.press_key / release_key 按引用计数按下和松开：另一个 Action 按住同一个
+# 键时（例如 hold 模式的 KeyboardAction），连发的松开不会把它松掉。
+
+JITTER_SAMPLES = 256
+
+
+class AutofireAction(Action):
+    """
+    AutofireAction('A', mouse_button=Button.left, rate=20)
+    AutofireAction('X', key='z', rate=10, duty=0.3)
+    duty 是每个周期中保持按下的比例。
+    """
+    def __init__(self, controller_button, mouse_button=None, key=None, rate=20.0, duty=0.5):
+        if (mouse_button is None) == (key is None):
+            raise ValueError("AutofireAction 需要且只能指定 mouse_button 或 key 之一")
+        if rate <= 0 or not 0 < duty < 1:
+            raise ValueError("rate 必须大于 0，duty 必须在 0 和 1 之间")
+        self.controller_button, self.mouse_button, self.key, self.rate, self.duty = controller_button, mouse_button, key, rate, duty
+        self.period = 1.0 / rate
+        self.lateness = array('d', bytes(8 * JITTER_SAMPLES))
+        self.samples = self.pulses = self.skipped = 0
+        self.burst_start = self.burst_last = None
+        self.burst_pulses = 0
+        self.active = self.down = False
+        self.press_timer = self.release_timer = None
+        self.mouse = self.keyboard = None
+
+    # --- 输出 ---
+    def _press(self):
+        if self.mouse_button is not None: self.mouse.press(self.mouse_button)
+        else: press_key(self.keyboard, self.key)
+        self.down = True
+
+    def _release(self):
+        if self.mouse_button is not None: self.mouse.release(self.mouse_button)
+        else: release_key(self.keyboard, self.key)
+        self.down = False
+
+    def _measure(self, when):
+        self.lateness[self.samples % JITTER_SAMPLES] = Clock.now() - when
+        self.samples += 1
+
+    # --- 定时器回调 ---
+    def _on_press_timer(self, index):
+        when = self.start + index * self.period
+        self.press_timer = None
+        self._measure(when)
+        now = Clock.now()
+        if now - when >= self.period:
+            # 主循环卡住了：放弃错过的点击，从下一个周期重新对齐
+            missed = int((now - when) / self.period)
+            self.skipped += missed
+            index += missed
+            when = self.start + index * self.period
+        if self.down: self._release()
+        self._press()
+        self.pulses += 1
+        self.burst_pulses += 1
+        self.burst_last = now
+        self.release_timer = Clock.scheduler.call_at(when + self.duty * self.period, self._on_release_timer, when + self.duty * self.period)
+        self.press_timer = Clock.scheduler.call_at(when + self.period, self._on_press_timer, index + 1)
+
+    def _on_release_timer(self, when):
+        self.release_timer = None
+        self._measure(when)
+        if self.down: self._release()
+
+    # --- 按钮边沿 ---
+    def _start(self, mouse, keyboard):
+        self.mouse, self.keyboard = mouse, keyboard
+        self.active = True
+        self.start = self.burst_start = Clock.now()
+        self.burst_pulses = 0
+        self._on_press_timer(0)
+
+    def _stop(self):
+        Clock.scheduler.cancel(self.press_timer)
+        Clock.scheduler.cancel(self.release_timer)
+        self.press_timer = self.release_timer = None
+        if self.down: self._release()
+        self.active = False
+
+    def update(self, state, last_state, mouse, keyboard):
+        is_pressed = state['buttons'].get(self.controller_button, False)
+        was_pressed = last_state['buttons'].get(self.controller_button, False) if last_state else False
+        if is_pressed and not was_pressed and not self.active: self._start(mouse, keyboard)
+        elif not is_pressed and self.active: self._stop()
+
+    def release(self, mouse, keyboard):
+        if self.active:
+            self.mouse, self.keyboard = mouse, keyboard
+            self._stop()
+
+    def stats(self):
+        """触发延迟（实际时刻 - 计划时刻）的分位数 (ms) 与最近一次连发的实测频率。"""
+        n = min(self.samples, JITTER_SAMPLES)
+        late = sorted(self.lateness[:n])
+        result = {'rate': self.rate, 'pulses': self.pulses, 'skipped': self.skipped, 'samples': n}
+        if late:
+            result.update(late_p50_ms=late[n // 2] * 1e3, late_p99_ms=late[min(n - 1, int(n * 0.99))] * 1e3, late_max_ms=late[-1] * 1e3)
+        if self.burst_pulses > 1:
+            result['measured_rate'] = (self.burst_pulses - 1) / (self.burst_last - self.burst_start)
+        return result
@@ -0,0 +1,67 @@
+import math
+
+# ==============================================================================
+# ======================== 摇杆/扳机校准 =======================================
+# ==============================================================================
+# 映射工具在校准阶段以全速采样每个轴，用 Welford 流式算法累计均值和方差，
+# 不保存样本。结果写入 controller_map.json 的 "calibration" 字段（原始值，即 pygame
+# get_axis() 的 -1..1 范围）：
+#     "calibration": {"lx": {"center": 0.012, "noise": 0.0021, "rest": 0.006,
+#                            "min": -0.98, "max": 0.97, "deadzone": 0.023}, ...}
+# 运行时 JoystickDecoder.bind() 把它换算成每个轴的系数，解码时只多几次乘加。
+
+NOISE_SIGMAS = 4.0       # 死区至少为静止时噪声标准差的这么多倍
+DEADZONE_MARGIN = 0.01   # 在静止时的最大偏移之外再留的余量
+MAX_DEADZONE = 0.3
+TRIGGERS = ('lt', 'rt')
+
+
+class Welford:
+    """流式统计：均值、方差、最小值、最大值，每个样本 O(1)，不保存样本。"""
+    __slots__ = ('n', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self):
+        self.n, self.mean, self.m2 = 0, 0.0, 0.0
+        self.min, self.max = math.inf, -math.inf
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        if x < self.min: self.min = x
+        if x > self.max: self.max = x
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+
+def axis_calibration(name, rest, motion):
+    """由静止阶段和全范围阶段的统计得到一个轴的校准数据；样本不足时返回 None。"""
+    if rest.n < 2 or motion.n < 2:
+        return None
+    center = rest.mean
+    spread = max(rest.max - center, center - rest.min)
+    deadzone = min(MAX_DEADZONE, max(NOISE_SIGMAS * rest.std, spread) + DEADZONE_MARGIN)
+    low, high = min(motion.min, rest.min), max(motion.max, rest.max)
+    if name in TRIGGERS:
+        # 扳机静止在一端：只有按下的方向
+        if high - center <= deadzone:
+            return None
+    elif high - center <= deadzone or center - low <= deadzone:
+        return None   # 没有推到两端
+    return {'center': round(center, 5), 'noise': round(rest.std, 5), 'rest': round(spread, 5),
+            'min': round(low, 5), 'max': round(high, 5), 'deadzone': round(deadzone, 5)}
+
+
+def axis_coefficients(name, calibration):
+    """
+    把校准数据换算成解码用的系数 (center, deadzone, 负方向增益, 正方向增益)：
+        v = raw - center；|v| <= deadzone 时输出 0，否则去掉死区后按各自方向的量程缩放到 ±1。
+    扳机的负方向增益为 0（输出 0..1）。
+    """
+    center, deadzone = calibration['center'], calibration['deadzone']
+    positive = 1.0 / (calibration['max'] - center - deadzone)
+    negative = 0.0 if name in TRIGGERS else 1.0 / (center - calibration['min'] - deadzone)
+    return center, deadzone, negative, positive
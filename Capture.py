@@ -0,0 +1,392 @@
+import sys
+import struct
+import argparse
+
+# ==============================================================================
+# ======================== HID 原始报文录制与批量分析 ==========================
+# ==============================================================================
+# 录制：python s.py --backend hid --capture 文件
+# 分析：python Capture.py 文件
+#
+# 录制文件是定长记录，便于用 numpy.memmap 一次性映射整个文件，不需要逐条解析：
+#     文件头  <8s H H H H H 2x>  魔数, 版本, 每条记录中报文区的长度 (REPORT_SIZE), VID, PID, 描述符长度
+#             + 描述符          设备的 HID 报告描述符（读不到时长度为 0）
+#     记录    <d H> + 64 字节    读到报文的时间 (Clock.now()), 报文实际长度, 报文 (不足补 0)
+# 时间是主循环读到报文的时间，而不是手柄发出的时间；主循环跟不上时内核中排队的报文
+# 会被连续读出，表现为一串很短的间隔。
+#
+# 分析与录制时的实时解码使用同一种布局：文件头里的描述符能生成解码器时
+# (HidDescriptor.get_decoder，例如蓝牙 0B13)，按描述符中的字段解码；否则按 XboxController 的
+# 固定布局：[4] 按钮字节1, [5] 按钮字节2, [6:10] LT/RT (uint16), [10:18] 左右摇杆 (int16)。
+# 固定布局 (USB GIP) 输入报文的 [2] 是逐条加一的序号，用来统计丢失和重复的报文；
+# 描述符布局默认不统计，可用 --seq-byte 指定。
+# 版本 1 的文件没有记录设备信息，只能按固定布局分析，会给出警告。
+# numpy 只在分析时需要，录制只用标准库。
+
+MAGIC = b'XBOXCAP\0'
+VERSION = 2
+REPORT_SIZE = 64
+FILE_HEADER = struct.Struct('<8sHHHHH2x')
+FILE_HEADER_V1 = struct.Struct('<8sHH4x')
+RECORD_HEADER = struct.Struct('<dH')
+RECORD_SIZE = RECORD_HEADER.size + REPORT_SIZE
+
+STICKS = ('lx', 'ly', 'rx', 'ry')
+TRIGGERS = ('lt', 'rt')
+REST_LIMIT = 0.2          # 摇杆在 ±REST_LIMIT、扳机在 TRIGGER_REST_LIMIT 以内视为静止
+TRIGGER_REST_LIMIT = 0.05
+GAP_FACTOR = 2.5          # 间隔超过中位数的这么多倍记为停顿
+BOUNCE_WINDOW = 0.015     # 秒：松开后这么快又按下、或按下后这么快就松开，记为抖动
+CHUNK = 1 << 16           # 每次解码的记录数：输入和输出都留在 CPU 缓存中
+SAMPLE = 1 << 20          # 估计直方图范围时最多使用的样本数
+BAR_WIDTH = 40
+
+
+class ReportCapture:
+    """
+    录制 HID 原始报文。XboxController 每次打开设备时调用 begin()，写入设备信息和描述符；
+    之后对每个读到的报文调用 write()。一个文件只能录制一种布局：重连到布局不同的设备时停止录制。
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.device = None   # 写入文件头的 (VID, PID, 描述符)
+        self.count = 0
+        print(f"正在录制 HID 原始报文: {path}")
+
+    def begin(self, vendor_id, product_id, descriptor):
+        device = (vendor_id, product_id, bytes(descriptor or b''))
+        if self.device is None:
+            self.device = device
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION, REPORT_SIZE, vendor_id, product_id, len(device[2])) + device[2])
+        elif device != self.device and self.file:
+            print(f"\n警告：重新连接的设备 ({vendor_id:04X}:{product_id:04X}) 布局与录制文件不同，停止录制 {self.path}")
+            self.close()
+
+    def write(self, raw, t):
+        if self.device is None or self.file is None:
+            return
+        self.file.write(RECORD_HEADER.pack(t, len(raw)) + raw[:REPORT_SIZE].ljust(REPORT_SIZE, b'\0'))
+        self.count += 1
+
+    def close(self):
+        if self.file is None:
+            return
+        self.file.close()
+        self.file = None
+        print(f"\n已录制 {self.count} 个报文。")
+
+
+# ==============================================================================
+# ======================== 分析 (需要 numpy) ===================================
+# ==============================================================================
+def record_dtype(np):
+    return np.dtype([('t', '<f8'), ('size', '<u2'), ('report', 'u1', (REPORT_SIZE,))])
+
+
+def fields_dtype(np):
+    """把整条记录看作结构体，报文中的字段按固定布局的偏移直接从映射的文件中读取，不复制报文。"""
+    base = RECORD_HEADER.size
+    return np.dtype({'names': ['t', 'size', 'id', 'b1', 'b2', 'lt', 'rt', 'lx', 'ly', 'rx', 'ry'],
+                     'formats': ['<f8', '<u2', 'u1', 'u1', 'u1', '<u2', '<u2', '<i2', '<i2', '<i2', '<i2'],
+                     'offsets': [0, 8, base, base + 4, base + 5, base + 6, base + 8, base + 10, base + 12, base + 14, base + 16],
+                     'itemsize': RECORD_SIZE})
+
+
+def decoded_dtype(np):
+    # mask 和六个轴放在最前面、连续的 32 字节，比较两个报文的状态时可以当作 4 个 uint64
+    return np.dtype([('mask', '<u8')] + [(axis, '<f4') for axis in STICKS + TRIGGERS] + [('t', '<f8'), ('seq', 'u1')])
+
+
+def state_words_dtype(np):
+    return np.dtype({'names': ['w0', 'w1', 'w2', 'w3'], 'formats': ['<u8'] * 4,
+                     'offsets': [0, 8, 16, 24], 'itemsize': decoded_dtype(np).itemsize})
+
+
+def _sample(values):
+    """等间隔抽取至多 SAMPLE 个值，用于只需要近似分位数的地方（直方图的范围）。"""
+    return values[::max(1, len(values) // SAMPLE)]
+
+
+def button_lookup(np, table):
+    """按钮字节 -> 状态掩码的 256 项查找表，代替逐位判断。"""
+    lookup = np.zeros(256, np.uint64)
+    for value in range(256):
+        for _, byte_bit, _, bit in table:
+            if value & byte_bit:
+                lookup[value] |= np.uint64(bit)
+    return lookup
+
+
+def read_header(path):
+    """读取文件头，返回 (记录起始偏移, VID, PID, 描述符)；版本 1 的文件 VID/PID/描述符为 None。"""
+    with open(path, 'rb') as f:
+        header = f.read(FILE_HEADER.size)
+        magic, version = (header[:8], struct.unpack_from('<H', header, 8)[0]) if len(header) >= 10 else (None, None)
+        if magic == MAGIC and version == 1 and len(header) >= FILE_HEADER_V1.size and FILE_HEADER_V1.unpack_from(header)[2] == REPORT_SIZE:
+            return FILE_HEADER_V1.size, None, None, None
+        if magic != MAGIC or version != VERSION or len(header) < FILE_HEADER.size:
+            raise ValueError(f"{path} 不是本工具录制的 HID 报文文件")
+        _, _, report_size, vendor_id, product_id, length = FILE_HEADER.unpack(header)
+        descriptor = f.read(length)
+        if report_size != REPORT_SIZE or len(descriptor) != length:
+            raise ValueError(f"{path} 的文件头不完整或格式不符")
+    return FILE_HEADER.size + length, vendor_id, product_id, descriptor
+
+
+def capture_layout(vendor_id, product_id, descriptor):
+    """与实时解码相同的选择：描述符能生成解码器时返回 HidDescriptor.plan_layout 的布局，否则 None（固定布局）。"""
+    from HidDescriptor import get_decoder, parse_report_descriptor, plan_layout
+    if not descriptor or get_decoder(vendor_id, product_id, descriptor) is None:
+        return None
+    return plan_layout(parse_report_descriptor(descriptor), vendor_id, product_id)
+
+
+def open_capture(path):
+    """把录制文件映射为结构化数组（不读入内存），末尾不完整的记录被忽略。"""
+    import os
+    import numpy as np
+    offset = read_header(path)[0]
+    count = (os.path.getsize(path) - offset) // RECORD_SIZE
+    if count <= 0:
+        return np.empty(0, record_dtype(np))
+    return np.memmap(path, record_dtype(np), 'r', offset, (count,))
+
+
+def load_capture(path, seq_byte=None, report_id=None):
+    """打开并按录制时的布局解码，返回 (记录, 解码结果, 布局说明)。seq_byte 为 None 时按布局选择默认值。"""
+    _, vendor_id, product_id, descriptor = read_header(path)
+    records = open_capture(path)
+    layout = None
+    if vendor_id is None:
+        print(f"警告：{path} 是版本 1 的录制文件，没有设备信息，按固定布局 (USB GIP) 分析")
+        name = "固定布局"
+    else:
+        from HidDescriptor import describe_layout
+        layout = capture_layout(vendor_id, product_id, descriptor)
+        name = f"{vendor_id:04X}:{product_id:04X} " + (f"描述符布局 ({describe_layout(layout)})" if layout else "固定布局")
+    if seq_byte is None:
+        seq_byte = 2 if layout is None else -1
+    return records, decode_reports(records, seq_byte, report_id, layout), name
+
+
+def decode_reports(records, seq_byte=2, report_id=None, layout=None):
+    """
+    批量解码，返回结构化数组 (t, seq, mask, lx ly rx ry lt rt)。layout 为 None 时按 XboxController
+    的固定布局，否则按 HidDescriptor.plan_layout 的布局（与生成的解码函数结果相同）。
+    与实时解码一样丢弃长度不足或报文 ID 不符的报文；给出 report_id 时只保留首字节相符的报文。
+    """
+    if layout is not None:
+        return _decode_layout(records, seq_byte, report_id, layout)
+    import numpy as np
+    from HidController import XboxController
+    fields = records.view(fields_dtype(np))
+    keep = fields['size'] >= 18
+    if report_id is not None:
+        keep &= fields['id'] == report_id
+    if not keep.all():
+        fields, records = fields[keep], records[keep]
+    first = button_lookup(np, XboxController.BUTTON_TABLE[:8])
+    second = button_lookup(np, XboxController.BUTTON_TABLE[8:])
+    # int16 -> 与 XboxController._normalize_axis 相同的 -1..1，按 uint16 的位模式查表
+    raw = np.arange(65536).astype(np.uint16).view(np.int16).astype(np.float32)
+    stick = np.where(raw < 0, raw / np.float32(32768.0), raw / np.float32(32767.0))
+    out = np.empty(len(fields), decoded_dtype(np))
+    for start in range(0, len(fields), CHUNK):
+        chunk = fields[start:start + CHUNK]
+        part = out[start:start + len(chunk)]
+        part['t'] = chunk['t']
+        part['seq'] = records['report'][start:start + len(chunk), seq_byte] if seq_byte >= 0 else 0
+        part['mask'] = first[chunk['b1']] | second[chunk['b2']]
+        for axis in STICKS:
+            part[axis] = stick[chunk[axis].view(np.uint16)]
+        for axis in TRIGGERS:
+            part[axis] = chunk[axis] / np.float32(1023.0)
+    return out
+
+
+def _field_values(np, reports, field):
+    """按 HidDescriptor 的字段定义，从报文矩阵中取出该字段的原始整数值 (int64)。"""
+    byte, shift, size = field.bit_offset >> 3, field.bit_offset & 7, field.bit_size
+    value = np.zeros(len(reports), np.int64)
+    for k in range((shift + size + 7) // 8):
+        value |= reports[:, byte + k].astype(np.int64) << (8 * k)
+    value = (value >> shift) & ((1 << size) - 1)
+    if field.logical_min < 0:
+        value = np.where(value >> (size - 1), value - (1 << size), value)
+    return value
+
+
+def _decode_layout(records, seq_byte, report_id, layout):
+    import numpy as np
+    from State import button_bit
+    fields = layout['fields']
+    min_length = max(((f.bit_offset + f.bit_size + 7) >> 3 for f in fields), default=0)
+    keep = records['size'] >= min_length
+    if layout['report_id']:
+        keep &= records['report'][:, 0] == layout['report_id']
+    if report_id is not None:
+        keep &= records['report'][:, 0] == report_id
+    out = np.zeros(int(keep.sum()), decoded_dtype(np))
+    first = 0
+    for start in range(0, len(records), CHUNK):
+        chunk_keep = keep[start:start + CHUNK]
+        reports = records['report'][start:start + CHUNK][chunk_keep]
+        part = out[first:first + len(reports)]
+        first += len(reports)
+        part['t'] = records['t'][start:start + CHUNK][chunk_keep]
+        part['seq'] = reports[:, seq_byte] if seq_byte >= 0 else 0
+        mask = np.zeros(len(reports), np.uint64)
+        for field, name in layout['buttons']:
+            mask |= np.where(reports[:, field.bit_offset >> 3] & (1 << (field.bit_offset & 7)), np.uint64(button_bit(name)), np.uint64(0))
+        hat = layout['hat']
+        if hat is not None:
+            h = _field_values(np, reports, hat) - hat.logical_min
+            for name, directions in (('UP', (7, 0, 1)), ('DOWN', (3, 4, 5)), ('LEFT', (5, 6, 7)), ('RIGHT', (1, 2, 3))):
+                mask |= np.where(np.isin(h, directions), np.uint64(button_bit(name)), np.uint64(0))
+        part['mask'] = mask
+        # 与 HidDescriptor.generate_source 相同的归一化：摇杆 -1..1（Y 轴取反），扳机 0..1
+        for name, field in layout['sticks'].items():
+            if field:
+                center = (field.logical_min + field.logical_max) / 2.0
+                scale = 2.0 / (field.logical_max - field.logical_min) * (-1.0 if name in ('ly', 'ry') else 1.0)
+                part[name] = np.clip((_field_values(np, reports, field) - center) * scale, -1.0, 1.0)
+        for name, field in layout['triggers'].items():
+            if field:
+                part[name] = (_field_values(np, reports, field) - field.logical_min) * (1.0 / (field.logical_max - field.logical_min))
+    return out
+
+
+def _print_histogram(title, values, low, high, bins):
+    import numpy as np
+    counts, edges = np.histogram(values, bins, (low, high))
+    outside = len(values) - counts.sum()
+    print(f"  {title}  (n={len(values)}, 范围外 {outside})")
+    peak = counts.max() if len(counts) and counts.max() else 1
+    for count, left in zip(counts, edges):
+        print(f"    {left:+.4f} {'#' * int(round(count * BAR_WIDTH / peak)):<{BAR_WIDTH}} {count}")
+
+
+def report_timing(decoded):
+    import numpy as np
+    t = decoded['t']
+    print(f"报文: {len(decoded)}，时长 {t[-1] - t[0]:.2f} 秒，平均 {(len(t) - 1) / max(t[-1] - t[0], 1e-9):.1f} 个/秒")
+    dt = np.diff(t) * 1000.0
+    p50, p90, p99, p999 = np.percentile(dt, (50, 90, 99, 99.9))
+    median = float(p50)
+    print(f"间隔 (ms): p50 {p50:.3f}  p90 {p90:.3f}  p99 {p99:.3f}  p99.9 {p999:.3f}  最大 {dt.max():.3f}")
+    active = dt[dt <= GAP_FACTOR * median]   # 手柄只在状态变化时发送，停顿不算抖动
+    jitter = np.abs(active - median)
+    j50, j99 = np.percentile(jitter, (50, 99)) if len(jitter) else (0.0, 0.0)
+    print(f"抖动 |间隔-中位数| (ms, 不含停顿): p50 {j50:.3f}  p99 {j99:.3f}  标准差 {active.std():.3f}")
+    print(f"停顿 (> {GAP_FACTOR:g} 倍中位数): {len(dt) - len(active)} 次，内核中排队后连续读出 (< 0.1 ms): {int((dt < 0.1).sum())} 次")
+    if (dt < 0).any():
+        print(f"警告：时间倒退 {int((dt < 0).sum())} 次")
+
+
+def report_sequence(decoded):
+    import numpy as np
+    step = np.diff(decoded['seq']).astype(np.uint8)   # 序号按 256 回绕
+    duplicates = int((step == 0).sum())
+    late = step >= 128                                 # 回退：乱序或设备重新编号
+    gaps = (step > 1) & ~late
+    dropped = int((step[gaps].astype(np.int64) - 1).sum())
+    print(f"序号: 丢失 {dropped} 个 ({int(gaps.sum())} 处)，重复 {duplicates} 个，回退 {int(late.sum())} 次")
+    words = decoded.view(state_words_dtype(np))
+    same = np.ones(len(words) - 1, bool)
+    for name in words.dtype.names:
+        same &= words[name][1:] == words[name][:-1]
+    same = int(same.sum())
+    print(f"与上一个报文状态相同的报文: {same}")
+
+
+def report_axes(decoded):
+    import numpy as np
+    t = decoded['t']
+    print("各轴静止时的噪声（相邻报文之差）与零点漂移:")
+    for axis in STICKS + TRIGGERS:
+        v = decoded[axis]
+        limit = TRIGGER_REST_LIMIT if axis in TRIGGERS else REST_LIMIT
+        rest = np.abs(v) <= limit
+        both = rest[1:] & rest[:-1]
+        noise = np.diff(v)[both]
+        print(f"[{axis}] 静止报文 {int(rest.sum())} / {len(v)}")
+        if len(noise) < 2 or not noise.any():
+            continue   # 没有噪声（未连接的轴或录制太短）
+        spread = max(float(np.percentile(np.abs(_sample(noise)), 99.9)), 1e-4)
+        _print_histogram("噪声", noise, -spread, spread, 15)
+        values = v[rest]
+        center = float(np.median(_sample(values)))
+        _print_histogram("静止位置", values, center - limit / 4, center + limit / 4, 15)
+        # 漂移：把静止的报文按时间分成几段，比较各段的平均位置
+        times = t[rest]
+        means = [f"{part[0] - t[0]:.1f}s:{chunk.mean():+.4f}"
+                 for part, chunk in zip(np.array_split(times, 5), np.array_split(values, 5)) if len(chunk)]
+        print(f"  漂移 (各时间段的平均静止位置): {'  '.join(means)}")
+
+
+def report_bounce(decoded, window=BOUNCE_WINDOW):
+    import numpy as np
+    from State import BUTTON_NAMES
+    mask = decoded['mask']
+    # 只在按钮状态变化的报文上逐个按钮计算，变化的报文通常远少于全部报文
+    changed = np.flatnonzero(mask[1:] != mask[:-1]) + 1
+    t, now, flipped = decoded['t'][changed], mask[changed], mask[changed] ^ mask[changed - 1]
+    print(f"按钮抖动 (窗口 {window * 1000:g} ms):")
+    seen = int(np.bitwise_or.reduce(flipped)) if len(flipped) else 0
+    for index, name in enumerate(BUTTON_NAMES):
+        if not seen >> index & 1:
+            continue
+        bit = np.uint64(1 << index)
+        edges = np.flatnonzero(flipped & bit)
+        if not len(edges):
+            continue
+        on = (now[edges] & bit) != 0
+        presses, releases = edges[on], edges[~on]
+        # 松开后很快再次按下
+        rebound = 0
+        if len(releases) and len(presses):
+            after = np.searchsorted(releases, presses) - 1
+            valid = after >= 0
+            rebound = int((t[presses[valid]] - t[releases[after[valid]]] < window).sum())
+        # 按下后很快松开
+        short = 0
+        if len(presses) and len(releases):
+            following = np.searchsorted(releases, presses)
+            valid = following < len(releases)
+            short = int((t[releases[following[valid]]] - t[presses[valid]] < window).sum())
+        print(f"  {name:<5} 按下 {len(presses):>6}  松开后立即重按 {rebound:>5}  过短的按下 {short:>5}")
+
+
+def analyze(path, seq_byte=None, report_id=None, bounce_window=BOUNCE_WINDOW):
+    records, decoded, layout = load_capture(path, seq_byte, report_id)
+    print(f"解码布局: {layout}")
+    if len(decoded) < 2:
+        print(f"{path}: 可解码的报文不足 2 个（共 {len(records)} 条记录）")
+        return decoded
+    if len(decoded) < len(records):
+        print(f"跳过 {len(records) - len(decoded)} 条不是手柄状态的记录")
+    report_timing(decoded)
+    if decoded['seq'].any():
+        report_sequence(decoded)
+    report_axes(decoded)
+    report_bounce(decoded, bounce_window)
+    return decoded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量解码并分析 HID 原始报文录制文件（s.py --backend hid --capture 文件）。")
+    parser.add_argument('capture', help="录制文件")
+    parser.add_argument('--seq-byte', type=int, help="报文中序号所在的字节，-1 表示没有序号；默认固定布局 (GIP) 为 2，描述符布局不统计")
+    parser.add_argument('--report-id', type=lambda s: int(s, 0), help="只分析首字节等于该值的报文，例如 0x20")
+    parser.add_argument('--bounce-ms', type=float, default=BOUNCE_WINDOW * 1000, help="按钮抖动的时间窗口（毫秒）")
+    args = parser.parse_args()
+    try:
+        analyze(args.capture, args.seq_byte, args.report_id, args.bounce_ms / 1000)
+    except (OSError, ValueError) as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import Clock
+from Action import Action
+from State import button_bit, button_name
+
+# ==============================================================================
+# ======================== 组合键 / 序列键识别 =================================
+# ==============================================================================
+
+class ChordAction(Action):
+    """
+    识别组合键（同时按下，如 LB+A）和序列键（依次按下，如 UP, UP, A）。
+
+    识别成功后，在 state['buttons'] 中写入一个虚拟按钮（名字即配置中的键），
+    因此可以像普通按钮一样绑定 KeyboardAction / ClickAction 等。
+    虚拟按钮在触发它的按钮松开前保持按下。
+
+    - 组合键的成员按钮按下后会被暂时隐藏 window 秒，等待其余成员；
+      组合键成立时成员按钮对后续 Action 一直隐藏到松开，单键动作不会触发；
+      超时未成立则放出该按键（晚 window 秒），期间松开则补发一次点按。
+    - 序列键每一步之间最多间隔 timeout 秒；完成序列的最后一个按键会被隐藏。
+      走不通时像 KMP / Aho-Corasick 一样退到已输入部分的最长后缀所在的节点继续匹配，
+      例如序列 A, A, B 在输入 A, A, A, B 时也能识别。某个序列是已输入部分的后缀时同样
+      立即识别：有序列 B, A 和 C, B, A, D 时，输入 C, B, A 会触发 B, A。
+
+    本 Action 需要放在 ACTION_CONFIG 的最前面，每帧的开销只与变化的按钮数有关。
+    """
+    def __init__(self, chords=None, sequences=None, window=0.05, timeout=0.5):
+        self.chords, self.sequences = chords, sequences
+        self.window, self.timeout = window, timeout
+
+        # --- 编译组合键：每个按钮位 -> 包含它的组合键（成员多的优先）---
+        self.chords_by_bit = {}
+        self.member_mask = 0
+        for name, members in sorted((chords or {}).items(), key=lambda item: -len(item[1])):
+            chord_mask = 0
+            for member in members:
+                chord_mask |= button_bit(member)
+            self.member_mask |= chord_mask
+            entry = (chord_mask, name, button_bit(name))
+            for member in members:
+                self.chords_by_bit.setdefault(button_bit(member), []).append(entry)
+
+        # --- 编译序列键：按下沿上的字典树，节点 0 为根 ---
+        self.trie = [{}]
+        self.terminals = {}   # 节点 -> (虚拟按钮名, 虚拟按钮位)
+        for name, steps in (sequences or {}).items():
+            node = 0
+            for step in steps:
+                bit = button_bit(step)
+                child = self.trie[node].get(bit)
+                if child is None:
+                    child = self.trie[node][bit] = len(self.trie)
+                    self.trie.append({})
+                node = child
+            self.terminals[node] = (name, button_bit(name))
+        # 失配指针：节点 -> 该节点路径的最长真后缀在字典树中对应的节点（按层次遍历计算）
+        # 输出沿失配指针合并：节点本身不是终点时，取它最长的、是某个序列终点的后缀
+        self.fail = [0] * len(self.trie)
+        self.outputs = dict(self.terminals)
+        queue = list(self.trie[0].values())
+        for node in queue:
+            for bit, child in self.trie[node].items():
+                fallback = self.fail[node] if node else 0
+                while fallback and bit not in self.trie[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.trie[fallback].get(bit, 0)
+                self.fail[child] = target if target != child else 0
+                if child not in self.outputs and self.fail[child] in self.outputs:
+                    self.outputs[child] = self.outputs[self.fail[child]]
+                queue.append(child)
+
+        # --- 运行时状态 ---
+        self.last_mask = 0
+        self.pending = {}        # 等待组合键的按钮位 -> 截止时间
+        self.pending_mask = 0
+        self.consumed_mask = 0   # 已被组合键/序列键吃掉、直到松开前都隐藏的按钮
+        self.flush_mask = 0      # 等待期间被松开的按钮，本帧补发一次按下
+        self.active = {}         # 虚拟按钮名 -> (保持它所需的按钮掩码, 虚拟按钮位)
+        self.seq_node, self.seq_deadline = 0, 0.0
+
+    def _fire(self, name, vbit, hold_mask):
+        self.active[name] = (hold_mask, vbit)
+        self.consumed_mask |= hold_mask
+        if self.pending_mask & hold_mask:
+            for bit in tuple(self.pending):
+                if bit & hold_mask:
+                    del self.pending[bit]
+            self.pending_mask &= ~hold_mask
+
+    def _on_press(self, bit, mask, now):
+        # 1. 序列键：沿字典树前进，走不通则沿失配指针退到最长的可继续的后缀
+        node = self.seq_node
+        if node and now > self.seq_deadline:
+            node = 0
+        while node and bit not in self.trie[node]:
+            node = self.fail[node]
+        child = self.trie[node].get(bit)
+        self.seq_node = child or 0
+        if child is not None:
+            self.seq_deadline = now + self.timeout
+            terminal = self.outputs.get(child)
+            if terminal:
+                self.seq_node = 0
+                self._fire(terminal[0], terminal[1], bit)
+                return
+
+        # 2. 组合键：所有成员都已按下即成立
+        for chord_mask, name, vbit in self.chords_by_bit.get(bit, ()):
+            if mask & chord_mask == chord_mask:
+                self._fire(name, vbit, chord_mask)
+                return
+
+        # 3. 可能是某个组合键的开头，先隐藏等待其余成员
+        if bit & self.member_mask:
+            self.pending[bit] = now + self.window
+            self.pending_mask |= bit
+
+    def _on_release(self, bit):
+        if self.pending_mask & bit:
+            del self.pending[bit]
+            self.pending_mask &= ~bit
+            self.flush_mask |= bit
+        self.consumed_mask &= ~bit
+        for name, (hold_mask, vbit) in tuple(self.active.items()):
+            if hold_mask & bit:
+                del self.active[name]
+
+    def release(self, mouse, keyboard):
+        self.pending.clear()
+        self.active.clear()
+        self.pending_mask = self.consumed_mask = self.flush_mask = 0
+        self.seq_node = 0
+
+    def sync(self, state):
+        # 已按住的按钮视为旧输入：不参与组合键，也不会被隐藏
+        self.release(None, None)
+        self.last_mask = state['mask']
+
+    def update(self, state, last_state, mouse, keyboard):
+        mask = state['mask']
+        changed = mask ^ self.last_mask
+        if not changed and not self.pending and not self.active and not (self.consumed_mask | self.flush_mask):
+            return
+        now = Clock.now()
+        self.last_mask = mask
+
+        # --- 只处理变化的按钮 ---
+        while changed:
+            bit = changed & -changed
+            changed ^= bit
+            if mask & bit:
+                self._on_press(bit, mask, now)
+            else:
+                self._on_release(bit)
+
+        # --- 等待超时的按钮放行给后续 Action ---
+        if self.pending:
+            for bit, deadline in tuple(self.pending.items()):
+                if now >= deadline:
+                    del self.pending[bit]
+                    self.pending_mask &= ~bit
+
+        # --- 写回状态：隐藏被吃掉的按钮，写入虚拟按钮 ---
+        buttons = state['buttons']
+        hidden = self.consumed_mask | self.pending_mask
+        bits = hidden
+        while bits:
+            bit = bits & -bits
+            bits ^= bit
+            buttons[button_name(bit)] = False
+        bits = self.flush_mask
+        while bits:
+            bit = bits & -bits
+            bits ^= bit
+            buttons[button_name(bit)] = True
+        mask = (mask | self.flush_mask) & ~hidden
+        self.flush_mask = 0
+        for name, (hold_mask, vbit) in self.active.items():
+            buttons[name] = True
+            mask |= vbit
+        state['mask'] = mask
@@ -0,0 +1,95 @@
+import heapq
+import time
+
+# ==============================================================================
+# ======================== 中央时钟 ============================================
+# ==============================================================================
+# 所有与时间相关的逻辑（组合键窗口、重复滚动等）都应通过这里取时间，
+# 而不是各自调用 time.time()，这样才能统一替换时钟。
+
+class MonotonicClock:
+    """基于 time.monotonic() 的系统时钟，不受系统时间调整影响。"""
+    def now(self):
+        return time.monotonic()
+
+
+clock = MonotonicClock()
+
+
+def now():
+    """返回中央时钟的当前时间（秒）。"""
+    return clock.now()
+
+
+def set_clock(new_clock):
+    """替换中央时钟，返回旧的时钟。"""
+    global clock
+    old_clock, clock = clock, new_clock
+    return old_clock
+
+
+class VirtualClock:
+    """手动推进的虚拟时钟，用于测试和模拟，结果完全确定。"""
+    def __init__(self, start=0.0):
+        self.t = start
+
+    def now(self):
+        return self.t
+
+    def advance(self, dt):
+        self.t += dt
+        return self.t
+
+
+# ==============================================================================
+# ======================== 中央定时器 ==========================================
+# ==============================================================================
+
+class Scheduler:
+    """
+    基于中央时钟的定时器队列（最小堆）。
+    主循环每轮调用 run_due()，到期的回调按时间顺序在主线程中执行。
+    取消只做标记，被取消的条目在到达堆顶时丢弃。
+    """
+    def __init__(self):
+        self.heap = []
+        self.counter = 0
+
+    def call_at(self, when, callback, *args):
+        """在时刻 when 调用 callback(*args)，返回可用于 cancel() 的句柄。"""
+        self.counter += 1
+        entry = [when, self.counter, callback, args]
+        heapq.heappush(self.heap, entry)
+        return entry
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(now() + delay, callback, *args)
+
+    def cancel(self, entry):
+        if entry is not None:
+            entry[2] = None
+
+    def next_deadline(self):
+        """返回最近一个有效定时器的到期时间，没有则返回 None。"""
+        heap = self.heap
+        while heap and heap[0][2] is None:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def run_due(self, current_time=None):
+        """执行所有已到期的定时器，返回执行的个数。"""
+        if current_time is None:
+            current_time = now()
+        heap = self.heap
+        count = 0
+        while heap and heap[0][0] <= current_time:
+            entry = heapq.heappop(heap)
+            callback = entry[2]
+            if callback is not None:
+                entry[2] = None
+                callback(*entry[3])
+                count += 1
+        return count
+
+
+scheduler = Scheduler()
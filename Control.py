@@ -0,0 +1,246 @@
+import os
+import json
+import socket
+import inspect
+import threading
+from collections import deque
+
+from Layers import Layers
+
+# ==============================================================================
+# ======================== 运行时控制接口（JSON lines） ========================
+# ==============================================================================
+# 在 UNIX socket 上每行一个 JSON 请求，每行一个 JSON 回复，例如：
+#     {"cmd": "list"}
+#     {"cmd": "get", "id": "1/browser/0"}
+#     {"cmd": "set", "id": "1/browser/0", "params": {"sensitivity": 30, "deadzone": 0.1}}
+#     {"cmd": "profile", "name": "presentation"}
+#     {"cmd": "pause"} / {"cmd": "resume"} / {"cmd": "status"}
+#     {"cmd": "profiler", "action": "start"} / {"cmd": "profiler", "action": "stop"}   (Profiler.py)
+# 可以用 `socat - UNIX-CONNECT:路径` 手动调试。
+#
+# 请求在后台线程中处理（解析、查找、校验参数），真正的修改放进一个 deque 交给主循环；
+# 主循环在两帧之间取出执行。修改参数时新的 Action 也在这时由主循环构造：构造函数可能
+# 通过 State.button_bit() 登记新的虚拟按钮位，改动全局的 BUTTON_NAMES / BUTTON_BITS，
+# 不能与正在解码、更新的主循环并发。deque 的 append / popleft 本身是原子的，
+# 主循环不会因为控制请求而等待任何锁。
+# 等待超时的请求被标记为已取消，主循环之后取出时跳过，不会在客户端收到超时之后才生效；
+# 主循环与后台线程用 dict.setdefault（原子操作）争夺同一个请求，谁先标记归谁。
+#
+# socket 文件的权限为 0600，只有启动 s.py 的用户可以连接。
+
+PARAM_KEY_PREFIXES = ('Key.', 'Button.')
+
+
+def _to_json(value):
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_to_json(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _to_json(v) for k, v in value.items()}
+    return str(value)   # pynput 的 Key.cmd / Button.left 等
+
+
+def _from_json(value):
+    """把 "Key.cmd" / "Button.left" 这样的字符串转换回 pynput 的枚举值。"""
+    if isinstance(value, list):
+        return [_from_json(v) for v in value]
+    if isinstance(value, str) and value.startswith(PARAM_KEY_PREFIXES):
+        kind, _, name = value.partition('.')
+        if kind == 'Key':
+            from pynput.keyboard import Key
+            return Key[name]
+        from pynput.mouse import Button
+        return Button[name]
+    return value
+
+
+def action_params(action):
+    """按构造函数的参数名读出 Action 当前的参数；有参数没有同名属性时 complete 为 False。"""
+    params, complete = {}, True
+    for name in list(inspect.signature(type(action).__init__).parameters)[1:]:
+        if hasattr(action, name):
+            params[name] = getattr(action, name)
+        else:
+            complete = False
+    return params, complete
+
+
+class ControlServer:
+    def __init__(self, path, actions, profiler=None):
+        if os.path.exists(path):
+            os.unlink(path)
+        self.path = path
+        self.actions = actions
+        self.profiler = profiler
+        self.paused = False
+        self.pending = deque()     # 等待主循环执行的 (函数, 完成事件, 结果)
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)   # bind 时直接以 0600 创建，不留可被其他用户连接的间隙
+        try:
+            self.listener.bind(path)
+        finally:
+            os.umask(umask)
+        self.listener.listen(4)
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+        print(f"控制接口已启动: {path}")
+
+    # --------------------------------------------------------------------------
+    # 主循环侧
+    # --------------------------------------------------------------------------
+    def apply(self, state, mouse, keyboard):
+        """在两帧之间由主循环调用，执行后台线程准备好的修改。"""
+        while self.pending:
+            function, done, result = self.pending.popleft()
+            if result.setdefault('owner', 'main') != 'main':
+                continue   # 后台线程已等待超时并取消
+            try:
+                result['value'] = function(state, mouse, keyboard)
+            except Exception as e:
+                result['error'] = str(e)
+            done.set()
+
+    # --------------------------------------------------------------------------
+    # 后台线程侧
+    # --------------------------------------------------------------------------
+    def _handoff(self, function, timeout=2.0):
+        """把 function 交给主循环执行并等待完成（只有后台线程在等待）。"""
+        done, result = threading.Event(), {}
+        self.pending.append((function, done, result))
+        if not done.wait(timeout):
+            if result.setdefault('owner', 'client') == 'client':
+                raise TimeoutError("主循环没有响应，修改已取消")
+            done.wait()   # 主循环恰好已经开始执行，等它完成
+        if 'error' in result:
+            raise RuntimeError(result['error'])
+        return result.get('value')
+
+    def _walk(self):
+        """生成 (id, 所在容器, 位置, Action)。Layers 内的 Action 编号为 '序号/层名/序号'。"""
+        for i, action in enumerate(self.actions):
+            yield str(i), self.actions, i, action
+            if isinstance(action, Layers):
+                for name, plan in action.plans.items():
+                    for j, inner in enumerate(plan):
+                        yield f"{i}/{name}/{j}", (action, name), j, inner
+
+    def _find(self, action_id):
+        for entry in self._walk():
+            if entry[0] == action_id:
+                return entry
+        raise KeyError(f"找不到 Action: {action_id}")
+
+    def _layers(self):
+        return [action for action in self.actions if isinstance(action, Layers)]
+
+    def _replace(self, container, index, old, cls, params):
+        def swap(state, mouse, keyboard):
+            new = cls(**params)   # 在主循环中构造，见文件开头的说明
+            old.release(mouse, keyboard)
+            if isinstance(container, tuple):
+                layers, name = container
+                plan = layers.plans[name]
+                if plan[index] is not old:
+                    raise RuntimeError("该 Action 已被其他请求替换，请重新读取")
+                layers.plans[name] = plan[:index] + (new,) + plan[index + 1:]
+                if layers.name == name:
+                    layers.plan = layers.plans[name]
+            else:
+                if container[index] is not old:
+                    raise RuntimeError("该 Action 已被其他请求替换，请重新读取")
+                container[index] = new
+            if state is not None:
+                new.sync(state)
+            return new
+        return swap
+
+    def _set_paused(self, paused):
+        def swap(state, mouse, keyboard):
+            if paused and not self.paused:
+                for action in self.actions:
+                    action.release(mouse, keyboard)
+            self.paused = paused
+        return swap
+
+    def handle(self, request):
+        cmd = request.get('cmd')
+        if cmd == 'list':
+            return {'actions': [{'id': action_id, 'type': type(action).__name__}
+                                for action_id, _, _, action in self._walk()],
+                    'profiles': {str(self.actions.index(layers)): {'current': layers.name, 'names': list(layers.order)}
+                                 for layers in self._layers()}}
+        if cmd == 'get':
+            action_id, _, _, action = self._find(request['id'])
+            reply = {'id': action_id, 'type': type(action).__name__, 'params': _to_json(action_params(action)[0])}
+            if hasattr(action, 'stats'):
+                reply['stats'] = action.stats()   # 例如 AutofireAction 的触发延迟
+            return reply
+        if cmd == 'set':
+            action_id, container, index, action = self._find(request['id'])
+            if isinstance(action, Layers):
+                raise ValueError("不能直接修改 Layers，请修改其中的 Action")
+            params, complete = action_params(action)
+            if not complete:
+                raise ValueError(f"{type(action).__name__} 的参数无法完整读出，不能在运行时重建")
+            for name, value in request.get('params', {}).items():
+                if name not in params:
+                    raise KeyError(f"{type(action).__name__} 没有可修改的参数 '{name}'")
+                params[name] = _from_json(value)
+            new = self._handoff(self._replace(container, index, action, type(action), params))
+            return {'id': action_id, 'params': _to_json(action_params(new)[0])}
+        if cmd == 'profile':
+            layers = self._layers()
+            if not layers:
+                raise KeyError("当前配置中没有 Layers")
+            target = next((l for l in layers if request['name'] in l.plans), None)
+            if target is None:
+                raise KeyError(f"未知的层: {request['name']}")
+            target.request(request['name'])   # 本身就是在下一帧生效的单个引用赋值
+            return {'profile': request['name']}
+        if cmd in ('pause', 'resume'):
+            self._handoff(self._set_paused(cmd == 'pause'))
+            return {'paused': self.paused}
+        if cmd == 'profiler':
+            if self.profiler is None:
+                raise KeyError("没有启用采样分析器")
+            action = request.get('action', 'status')
+            if action == 'start':
+                self.profiler.start()
+            elif action == 'stop':
+                return {'running': False, 'files': self.profiler.stop(wait=True)}
+            elif action != 'status':
+                raise ValueError(f"未知的 profiler 操作: {action}")
+            return {'running': self.profiler.running}
+        if cmd == 'status':
+            return {'paused': self.paused, 'profiles': {str(self.actions.index(l)): l.name for l in self._layers()}}
+        raise ValueError(f"未知的命令: {cmd}")
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                return   # 已关闭
+            threading.Thread(target=self._serve_client, args=(conn,), daemon=True).start()
+
+    def _serve_client(self, conn):
+        with conn, conn.makefile('rwb') as stream:
+            for line in stream:
+                if not line.strip():
+                    continue
+                try:
+                    reply = {'ok': True}
+                    reply.update(self.handle(json.loads(line)))
+                except Exception as e:
+                    reply = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+                stream.write(json.dumps(reply, ensure_ascii=False).encode() + b'\n')
+                stream.flush()
+
+    def close(self):
+        self.listener.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
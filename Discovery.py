@@ -0,0 +1,182 @@
+import json
+import time
+import queue
+import threading
+
+# ==============================================================================
+# ======================== 启动时并行探测手柄 ==================================
+# ==============================================================================
+# 配对了多个蓝牙设备时，逐个打开设备会被响应慢（或已不在附近）的设备拖住好几秒。
+# 这里把候选设备放进线程池并行探测，每个设备有独立的超时，超时的设备直接放弃，
+# 第一个可用的设备一出现就返回。上次成功打开的设备路径记录在 LAST_DEVICE_FILE 中，
+# 下次启动时先单独探测它。
+
+LAST_DEVICE_FILE = "last_device.json"
+PROBE_TIMEOUT = 1.0
+PROBE_WORKERS = 4
+
+# HID Usage: Generic Desktop 页的 Joystick (0x04) / Game Pad (0x05)
+GAMEPAD_USAGES = {(0x01, 0x04), (0x01, 0x05)}
+GAMEPAD_WORDS = ("controller", "gamepad", "joystick")
+
+
+def _path_text(path):
+    return path.decode() if isinstance(path, bytes) else path
+
+
+def is_gamepad(info, vendor_id=None, product_id=None):
+    """根据 hid.enumerate() 的条目判断是否可能是手柄：VID/PID 匹配、HID Usage 或产品名。"""
+    if (info.get('vendor_id'), info.get('product_id')) == (vendor_id, product_id):
+        return True
+    if (info.get('usage_page'), info.get('usage')) in GAMEPAD_USAGES:
+        return True
+    product = (info.get('product_string') or "").lower()
+    return any(word in product for word in GAMEPAD_WORDS)
+
+
+def load_last_device(path=LAST_DEVICE_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_last_device(info, path=LAST_DEVICE_FILE):
+    record = {'path': _path_text(info['path']), 'vendor_id': info.get('vendor_id'), 'product_id': info.get('product_id')}
+    try:
+        with open(path, 'w') as f:
+            json.dump(record, f)
+    except OSError as e:
+        print(f"警告：无法保存上次使用的设备 '{path}': {e}")
+
+
+def probe_parallel(candidates, probe, timeout=PROBE_TIMEOUT, workers=PROBE_WORKERS, discard=None):
+    """
+    在线程池中并行调用 probe(candidate)，返回第一个成功的 (candidate, 结果, 耗时秒数)；全部失败返回 None。
+    probe 抛出异常或返回 None 表示该设备不可用。
+    每个设备从开始探测起计时，超过 timeout 即放弃，并补一个新线程接替它在池中的位置。
+    返回之后才完成的探测结果交给 discard(结果) 释放（例如关闭已打开的设备）。
+    """
+    candidates = list(candidates)
+    if not candidates:
+        return None
+    pending, results = queue.Queue(), queue.Queue()
+    for item in enumerate(candidates):
+        pending.put(item)
+    started, abandoned, finished = {}, set(), set()
+    lock = threading.Lock()
+    closed = [False]
+
+    def worker():
+        while not closed[0]:
+            try:
+                index, candidate = pending.get_nowait()
+            except queue.Empty:
+                return
+            started[index] = time.perf_counter()
+            try:
+                result, error = probe(candidate), None
+            except Exception as e:
+                result, error = None, e
+            with lock:
+                late = closed[0] or index in abandoned
+                if not late:
+                    results.put((index, result, error))
+            if late and result is not None and discard:
+                discard(result)
+
+    def spawn():
+        threading.Thread(target=worker, daemon=True).start()
+
+    t0 = time.perf_counter()
+    for _ in range(min(workers, len(candidates))):
+        spawn()
+    remaining = len(candidates)
+    try:
+        while remaining:
+            now = time.perf_counter()
+            wait = timeout
+            with lock:
+                for index, start in list(started.items()):
+                    if index in finished or index in abandoned:
+                        continue
+                    if now - start >= timeout:
+                        abandoned.add(index)
+                        remaining -= 1
+                        print(f"探测设备超时 ({timeout:.1f}s)，已放弃: {candidates[index]!r:.80}")
+                        spawn()
+                    else:
+                        wait = min(wait, start + timeout - now)
+            if not remaining:
+                break
+            try:
+                index, result, error = results.get(timeout=max(wait, 0.001))
+            except queue.Empty:
+                continue
+            finished.add(index)
+            remaining -= 1
+            if result is not None:
+                return candidates[index], result, time.perf_counter() - t0
+            if error is not None:
+                print(f"探测设备失败: {error}")
+        return None
+    finally:
+        # 置位之前已经放进队列、但没有被返回的成功结果同样要释放，否则两个设备同时探测成功时会泄漏一个
+        leftovers = []
+        with lock:
+            closed[0] = True
+            while True:
+                try:
+                    leftovers.append(results.get_nowait()[1])
+                except queue.Empty:
+                    break
+        if discard:
+            for result in leftovers:
+                if result is not None:
+                    discard(result)
+
+
+def discover_hid(vendor_id=None, product_id=None, timeout=PROBE_TIMEOUT, workers=PROBE_WORKERS, cache_path=LAST_DEVICE_FILE):
+    """
+    找到第一个能打开的 HID 手柄，返回 (enumerate 条目, 已打开的 hid.device)；找不到返回 None。
+    上次成功的设备先单独探测；其余候选设备（VID/PID 匹配的排在前面）并行探测。
+    """
+    import hid
+
+    def probe(info):
+        device = hid.device()
+        device.open_path(info['path'])
+        try:
+            device.set_nonblocking(True)
+            device.get_product_string()   # 蓝牙设备不在附近时这一步可能卡住
+        except (OSError, ValueError):
+            device.close()
+            raise
+        return device
+
+    t0 = time.perf_counter()
+    seen, candidates = set(), []
+    for info in hid.enumerate():
+        if info['path'] not in seen and is_gamepad(info, vendor_id, product_id):
+            seen.add(info['path'])
+            candidates.append(info)
+    candidates.sort(key=lambda info: (info.get('vendor_id'), info.get('product_id')) != (vendor_id, product_id))
+
+    last = load_last_device(cache_path)
+    preferred = [info for info in candidates if last and _path_text(info['path']) == last.get('path')]
+    found = None
+    if preferred:
+        found = probe_parallel(preferred, probe, timeout, 1, discard=lambda device: device.close())
+    if not found:
+        others = [info for info in candidates if info not in preferred]
+        found = probe_parallel(others, probe, timeout, workers, discard=lambda device: device.close())
+    if not found:
+        return None
+    info, device, _ = found
+    print(f"找到可用手柄: {info.get('product_string') or _path_text(info['path'])}，"
+          f"用时 {(time.perf_counter() - t0) * 1e3:.1f} ms（候选设备 {len(candidates)} 个"
+          f"{'，优先尝试了上次使用的设备' if preferred else ''}）")
+    if not last or last.get('path') != _path_text(info['path']):
+        save_last_device(info, cache_path)
+    return info, device
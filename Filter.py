@@ -0,0 +1,120 @@
+import math
+
+from State import AXES
+
+# ==============================================================================
+# ======================== 摇杆平滑滤波 ========================================
+# ==============================================================================
+# 磨损的摇杆在死区边缘附近来回跳动，MouseMoveAction 会让光标抖动；加大死区又损失精度。
+# 这里的滤波器在解码阶段对六个轴一起处理（解码器的 filter 属性，s.py --filter 设置），
+# 每个轴只保存上一次的输出（One-Euro 另有一个导数），每帧 O(1)，不分配内存。
+# 滤波器按实际的时间间隔计算系数，帧率变化（HID 报文间隔、主循环轮询）不影响截止频率。
+#
+#   exp       一阶低通（指数平滑）：y += a * (x - y)，a = 1 - exp(-dt / tau)，tau = 1 / (2π·cutoff)。
+#   one-euro  One-Euro 滤波：截止频率随（平滑后的）速度升高，cutoff = min_cutoff + beta * |dx/dt|。
+#             静止和慢速移动时强平滑，快速推动时接近不滤波。
+#
+# 增加的延迟：一阶低通对缓慢变化的输入滞后 tau 秒，阶跃输入到达 63% 也需要 tau 秒。
+# One-Euro 的 tau 随速度变化，latency(speed) 给出理论值。下表的实测列是
+# `python bench.py filter`（默认参数：seed 1，120 秒合成的磨损摇杆输入，4 ms 一帧，约 0.08 秒
+# 推满）一次运行的输出，为原始输入穿过 0.5 到滤波后的值穿过 0.5 的时间。实测值按 4 ms 的帧
+# 量化，换一个 seed 或录制的输入会相差一帧左右，只能作为大致的参考：
+#     配置                          静止/慢速    以 10/秒 推动    实测推动 p50    实测松开 p50
+#     exp (cutoff=10)               16 ms        16 ms            12 ms           12 ms
+#     exp:cutoff=5                  32 ms        32 ms            28 ms           20 ms
+#     one-euro (默认参数)           80 ms        23 ms            16 ms           20 ms
+#     one-euro:min_cutoff=1         159 ms       27 ms            20 ms           20 ms
+# 同一输入上，不滤波时光标启停 10147 次，上面四种配置分别为 4251 / 2959 / 2371 / 1781 次；
+# 启停次数与输入的长度成正比（--seconds 30 时约为 2700 次，滤波后降到 400–1200 次）。
+#
+# 输入与输出之差小于 SNAP 时直接取输入值，静止的轴会回到精确的 0，不会留下一串极小的值。
+# 两次调用间隔超过 RESET_GAP（手柄断开重连、主循环暂停）时从当前输入重新开始。
+
+SNAP = 1e-4
+RESET_GAP = 0.5
+
+
+def _tau(cutoff):
+    return 1.0 / (2.0 * math.pi * cutoff)
+
+
+class ExponentialFilter:
+    def __init__(self, cutoff=10.0, axes=AXES):
+        self.cutoff, self.axes = cutoff, tuple(axes)
+        self.tau = _tau(cutoff)
+        self.values = [0.0] * len(self.axes)
+        self.t = None
+
+    def latency(self, speed=0.0):
+        """对缓慢变化的输入增加的延迟（秒）。"""
+        return self.tau
+
+    def apply(self, state, t):
+        """就地平滑 state 中的各轴。"""
+        values, last = self.values, self.t
+        self.t = t
+        if last is None or t - last > RESET_GAP:
+            for i, name in enumerate(self.axes):
+                values[i] = state[name]
+            return
+        dt = t - last
+        a = 1.0 - math.exp(-dt / self.tau) if dt > 0 else 0.0
+        for i, name in enumerate(self.axes):
+            x = state[name]
+            y = values[i] + a * (x - values[i])
+            if abs(y - x) < SNAP: y = x
+            values[i] = state[name] = y
+
+
+class OneEuroFilter:
+    def __init__(self, min_cutoff=2.0, beta=0.5, d_cutoff=1.0, axes=AXES):
+        self.min_cutoff, self.beta, self.d_cutoff, self.axes = min_cutoff, beta, d_cutoff, tuple(axes)
+        self.d_tau = _tau(d_cutoff)
+        self.values = [0.0] * len(self.axes)
+        self.speeds = [0.0] * len(self.axes)   # 平滑后的导数 dx/dt (每秒满量程的倍数)
+        self.t = None
+
+    def latency(self, speed=0.0):
+        """以 speed（每秒满量程的倍数）稳定移动时增加的延迟（秒）。"""
+        return _tau(self.min_cutoff + self.beta * abs(speed))
+
+    def apply(self, state, t):
+        """就地平滑 state 中的各轴。"""
+        values, speeds, last = self.values, self.speeds, self.t
+        self.t = t
+        if last is None or t - last > RESET_GAP:
+            for i, name in enumerate(self.axes):
+                values[i] = state[name]
+                speeds[i] = 0.0
+            return
+        dt = t - last
+        if dt <= 0:
+            for i, name in enumerate(self.axes):
+                state[name] = values[i]   # 同一时刻再次解码（没有新报文）：沿用上一次的输出
+            return
+        a_d = dt / (dt + self.d_tau)
+        min_cutoff, beta, two_pi_dt = self.min_cutoff, self.beta, 2.0 * math.pi * dt
+        for i, name in enumerate(self.axes):
+            x = state[name]
+            y = values[i]
+            d = speeds[i] + a_d * ((x - y) / dt - speeds[i])
+            speeds[i] = d
+            w = two_pi_dt * (min_cutoff + beta * abs(d))   # a = dt / (dt + tau) = w / (w + 1)
+            y += w / (w + 1.0) * (x - y)
+            if abs(y - x) < SNAP: y = x
+            values[i] = state[name] = y
+
+
+FILTERS = {'exp': ExponentialFilter, 'one-euro': OneEuroFilter}
+
+
+def parse_filter(spec):
+    """'one-euro' / 'one-euro:min_cutoff=1,beta=0.3' / 'exp:cutoff=5' -> 滤波器对象。"""
+    kind, _, params = spec.partition(':')
+    if kind not in FILTERS:
+        raise ValueError(f"未知的滤波器 '{kind}'，可选: {', '.join(FILTERS)}")
+    kwargs = {}
+    for item in filter(None, params.split(',')):
+        name, _, value = item.partition('=')
+        kwargs[name.strip()] = float(value)
+    return FILTERS[kind](**kwargs)
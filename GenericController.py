@@ -1,24 +1,34 @@
+import time
 import pygame
+from State import JoystickDecoder
 
 class GenericController:
-    def __init__(self, custom_mapping):
-        if not custom_mapping:
-            raise ValueError("必须提供自定义映射 (custom_mapping)。")
+    def __init__(self, custom_mapping, profiles=None):
+        if not custom_mapping and not profiles:
+            raise ValueError("必须提供自定义映射 (custom_mapping) 或手柄配置库 (profiles)。")
         
         self.mapping = custom_mapping
+        self.profiles = profiles  # Profiles.ProfileStore，按手柄 GUID 查找映射
         
         # --- 核心数据结构 ---
         self.joysticks = {}       # 存储所有【可用】手柄对象 {instance_id: joy_object}
         self.active_joy = None    # 当前被激活用于控制的手柄
 
-        # 映射解析逻辑保持不变
-        self.button_map = {v[1]: k for k, v in self.mapping.items() if v[0] == 'button'}
-        self.axis_map = {v[1]: k for k, v in self.mapping.items() if v[0] == 'axis'}
-        self.hat_map_index = self.mapping.get("dpad", (None, -1))[1]
+        # 每个手柄在热插拔时按 GUID 选好映射并编译成解码器 {instance_id: (decoder, 映射, 是否按GUID匹配)}
+        # 解码表预先生成，状态写入预分配的双缓冲字典
+        self.decoders = {}
+        self.decoder = None
+        self.filter = None        # Filter.py 的摇杆平滑滤波器，激活手柄时交给它的解码器
 
-        # 初始化 Pygame 及其 joystick 模块
-        pygame.init()
+        # 只初始化需要的 SDL 子系统：joystick，以及事件队列必需的 display
+        # （在 SDL_VIDEODRIVER=dummy 下不会创建窗口）。不再调用 pygame.init()，
+        # 避免拉起音频、字体等用不到的模块。
+        pygame.display.init()
         pygame.joystick.init()
+        # 事件队列只接收手柄与热插拔事件，其余事件直接在 SDL 中丢弃
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed([pygame.QUIT, pygame.JOYAXISMOTION, pygame.JOYBALLMOTION, pygame.JOYHATMOTION,
+                                  pygame.JOYBUTTONDOWN, pygame.JOYBUTTONUP, pygame.JOYDEVICEADDED, pygame.JOYDEVICEREMOVED])
         print("Pygame 已初始化。")
         
         # 启动时扫描并添加所有已连接的【可用】手柄
@@ -43,7 +53,15 @@ class GenericController:
                 print(f"检测到无效或非输入设备: '{joy.get_name()}' (ID: {instance_id})，已忽略。")
                 return
 
+            mapping = self.profiles.lookup(joy.get_guid()) if self.profiles else None
+            by_guid = mapping is not None
+            mapping = mapping or self.mapping
+            if not mapping:
+                print(f"手柄 '{joy.get_name()}' (GUID: {joy.get_guid()}) 没有可用的映射，已忽略。请使用 --map 为它创建映射。")
+                return
+
             self.joysticks[instance_id] = joy
+            self.decoders[instance_id] = (JoystickDecoder(mapping), mapping, by_guid)
             print(f"发现可用手柄: {joy.get_name()} (ID: {instance_id})")
 
         except pygame.error as e:
@@ -53,6 +71,10 @@ class GenericController:
     def close(self):
         pygame.quit()
 
+    def wait(self, timeout):
+        """主循环空闲时调用。"""
+        time.sleep(timeout)
+
     def read(self):
         # --- 核心逻辑：完全基于事件驱动 ---
         for event in pygame.event.get():
@@ -66,6 +88,7 @@ class GenericController:
                 if instance_id in self.joysticks:
                     print(f"\n手柄 '{self.joysticks[instance_id].get_name()}' (ID: {instance_id}) 已断开。")
                     del self.joysticks[instance_id]
+                    del self.decoders[instance_id]
                 
                 if self.active_joy and self.active_joy.get_instance_id() == instance_id:
                     print("当前活动手柄已断开，控制已暂停。")
@@ -81,11 +104,17 @@ class GenericController:
                     joy_to_activate = self.joysticks.get(event.instance_id)
                     if joy_to_activate:
                         self.active_joy = joy_to_activate
+                        self.decoder, mapping, by_guid = self.decoders[event.instance_id]
+                        self.decoder.bind(self.active_joy)
+                        self.decoder.filter = self.filter
                         print(f"\n手柄已激活: {self.active_joy.get_name()} (ID: {self.active_joy.get_instance_id()})")
                         
-                        if self.mapping['name'].split(' ')[0].lower() not in self.active_joy.get_name().lower():
-                            print(f"警告：激活的手柄 '{self.active_joy.get_name()}' 可能与映射文件中的 '{self.mapping['name']}' 不匹配。")
-                        print("已成功加载自定义映射。")
+                        if by_guid:
+                            print(f"已按 GUID 匹配到手柄配置 '{mapping['name']}'。")
+                        else:
+                            if mapping['name'].split(' ')[0].lower() not in self.active_joy.get_name().lower():
+                                print(f"警告：激活的手柄 '{self.active_joy.get_name()}' 可能与映射文件中的 '{mapping['name']}' 不匹配。")
+                            print("已成功加载自定义映射。")
                         # 激活后不立即返回数据，让主循环在下一轮开始读取状态
                         # 这避免了激活时的那个按键被立即解析为一次点击
 
@@ -94,27 +123,4 @@ class GenericController:
             return None
 
         # --- 如果手柄已激活，执行正常的轮询来获取状态 ---
-        joy = self.active_joy
-        
-        buttons = {name: False for name in self.button_map.values()}
-        for i in range(joy.get_numbuttons()):
-            if joy.get_button(i):
-                button_name = self.button_map.get(i)
-                if button_name: buttons[button_name] = True
-        
-        if self.hat_map_index != -1 and joy.get_numhats() > self.hat_map_index:
-            hat = joy.get_hat(self.hat_map_index)
-            buttons['UP'], buttons['DOWN'], buttons['LEFT'], buttons['RIGHT'] = (hat[1] == 1), (hat[1] == -1), (hat[0] == -1), (hat[0] == 1)
-        
-        axes = {name: 0.0 for name in self.axis_map.values()}
-        for i in range(joy.get_numaxes()):
-            axis_name = self.axis_map.get(i)
-            if axis_name:
-                value = joy.get_axis(i)
-                if axis_name in ['ly', 'ry']: value *= -1
-                axes[axis_name] = value
-
-        lt_val = (axes.get('lt', -1.0) + 1.0) / 2.0
-        rt_val = (axes.get('rt', -1.0) + 1.0) / 2.0
-
-        return {"buttons": buttons, "lt": lt_val, "rt": rt_val, "lx": axes.get('lx', 0.0), "ly": axes.get('ly', 0.0), "rx": axes.get('rx', 0.0), "ry": axes.get('ry', 0.0)}
\ No newline at end of file
+        return self.decoder.decode(self.active_joy)
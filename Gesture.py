@@ -0,0 +1,104 @@
+import Clock
+from Action import Action
+from State import button_bit
+
+# ==============================================================================
+# ======================== 点按 / 长按 / 双击识别 ==============================
+# ==============================================================================
+
+IDLE, DOWN, HELD, WAIT_SECOND, SECOND_DOWN = range(5)
+
+
+class GestureAction(Action):
+    """
+    让一个按钮在点按、长按、双击时分别产生不同的虚拟按钮：
+        GestureAction('A', tap='A_TAP', hold='A_HOLD', double_tap='A_DOUBLE')
+    之后用普通 Action 绑定这些虚拟按钮即可。
+
+    - tap / double_tap 是只持续一帧的脉冲；hold 在达到 hold_time 后保持按下直到松开。
+    - 计时全部交给中央定时器 Clock.scheduler，空闲的按钮不挂任何定时器；
+      每个按钮只有固定的几个状态变量。
+    - 没有配置 double_tap 时，点按在松开时立即触发，不需要等待双击窗口。
+
+    本 Action 需要放在使用这些虚拟按钮的 Action 之前。
+    """
+    def __init__(self, controller_button, tap=None, hold=None, double_tap=None, hold_time=0.4, double_tap_time=0.25):
+        self.controller_button = controller_button
+        self.bit = button_bit(controller_button)
+        self.tap, self.hold, self.double_tap = tap, hold, double_tap
+        self.tap_bit = button_bit(tap) if tap else 0
+        self.hold_bit = button_bit(hold) if hold else 0
+        self.double_tap_bit = button_bit(double_tap) if double_tap else 0
+        self.hold_time, self.double_tap_time = hold_time, double_tap_time
+
+        self.phase = IDLE
+        self.timer = None
+        self.pulse = None      # 下一帧要发出的脉冲 (名字, 位)
+
+    # --- 定时器回调 ---
+    def _on_hold_timer(self):
+        self.timer = None
+        if self.phase == DOWN:
+            self.phase = HELD
+
+    def _on_tap_timer(self):
+        self.timer = None
+        if self.phase == WAIT_SECOND:
+            self.phase = IDLE
+            self._emit(self.tap, self.tap_bit)
+
+    def _emit(self, name, bit):
+        if name:
+            self.pulse = (name, bit)
+
+    # --- 按钮边沿 ---
+    def _on_press(self):
+        if self.phase == WAIT_SECOND:
+            Clock.scheduler.cancel(self.timer)
+            self.timer = None
+            self.phase = SECOND_DOWN
+            self._emit(self.double_tap, self.double_tap_bit)
+        else:
+            self.phase = DOWN
+            if self.hold:
+                self.timer = Clock.scheduler.call_later(self.hold_time, self._on_hold_timer)
+
+    def _on_release(self):
+        Clock.scheduler.cancel(self.timer)
+        self.timer = None
+        if self.phase == DOWN:
+            if self.double_tap:
+                self.phase = WAIT_SECOND
+                self.timer = Clock.scheduler.call_later(self.double_tap_time, self._on_tap_timer)
+                return
+            self._emit(self.tap, self.tap_bit)
+        self.phase = IDLE
+
+    def release(self, mouse, keyboard):
+        Clock.scheduler.cancel(self.timer)
+        self.timer = None
+        self.phase = IDLE
+        self.pulse = None
+
+    def sync(self, state):
+        # 已按住的按钮要等松开后才重新开始识别，松开时不产生点按
+        self.release(None, None)
+        if state['buttons'].get(self.controller_button, False):
+            self.phase = SECOND_DOWN
+
+    def update(self, state, last_state, mouse, keyboard):
+        is_pressed = state['buttons'].get(self.controller_button, False)
+        was_down = self.phase in (DOWN, HELD, SECOND_DOWN)
+        if is_pressed and not was_down:
+            self._on_press()
+        elif not is_pressed and was_down:
+            self._on_release()
+
+        if self.phase == HELD:
+            state['buttons'][self.hold] = True
+            state['mask'] |= self.hold_bit
+        if self.pulse:
+            name, bit = self.pulse
+            self.pulse = None
+            state['buttons'][name] = True
+            state['mask'] |= bit
@@ -0,0 +1,242 @@
+import time
+import struct
+
+import Clock
+from State import new_state, button_bit
+from HidDescriptor import get_decoder, read_report_descriptor
+
+# ==============================================================================
+# ======================== HID 后端 (hidapi) ===================================
+# ==============================================================================
+
+class XboxController:
+    """
+    通过 hidapi 直接读取 Xbox 手柄的 HID 报文。
+
+    打开设备后读取它的 HID 报告描述符，生成专门针对该布局的解码函数（见 HidDescriptor.py），
+    USB (0x0B12) 和蓝牙 (0x0B13) 等不同布局都无需手动修改偏移。
+    读不到描述符时退回到固定布局:
+    [4] 按钮字节1, [5] 按钮字节2, [6:10] LT/RT (uint16), [10:18] 左右摇杆 (int16)。
+
+    启动时并行探测所有像手柄的 HID 设备，VID/PID 与参数相同的优先，上次成功的设备最先尝试。
+
+    repeat_last=True（s.py 的用法）时没有新报文也重新解码上一份，主循环每轮都得到一帧状态；
+    8.py / controller.py 等按报文驱动的旧脚本用 repeat_last=False，只在收到新报文时返回状态，
+    否则它们按住摇杆时每约 1 ms 的一轮循环都会移动一次光标。
+
+    传入 monitor (Hotplug.UeventMonitor) 时支持热插拔：启动时手柄不在或中途断开（如蓝牙掉线）
+    都不会退出，收到内核的 add 事件后立即重新打开设备，从干净的状态继续。
+    """
+    # add 事件到达时 udev 可能还没改好设备节点权限：直接重试打开事件中的设备节点，间隔从
+    # RETRY_INTERVAL 起加倍、最长 RETRY_MAX_INTERVAL，共约 1 秒；最后一次才完整地重新探测
+    RETRY_INTERVAL = 0.005
+    RETRY_MAX_INTERVAL = 0.2
+    RETRY_LIMIT = 10
+
+    BUTTON_MAP = {0: "A1", 1: "A2", 2: "MENU", 3: "WIN", 4: "A", 5: "B", 6: "X", 7: "Y"}
+    BUTTON_MAP_2 = {0: "UP", 1: "DOWN", 2: "LEFT", 3: "RIGHT", 4: "LB", 5: "RB", 6: "LS", 7: "RS"}
+    # 固定布局中的 (字节位置, 字节内的位, 按钮名, 状态掩码中的位)；Capture.py 的批量解码也使用它
+    BUTTON_TABLE = tuple((4, 1 << b, name, button_bit(name)) for b, name in BUTTON_MAP.items()) + \
+                   tuple((5, 1 << b, name, button_bit(name)) for b, name in BUTTON_MAP_2.items())
+
+    def __init__(self, vendor_id=0x045E, product_id=0x0B12, monitor=None, repeat_last=True):
+        self.vendor_id, self.product_id = vendor_id, product_id
+        self.monitor = monitor
+        self.repeat_last = repeat_last
+        self.device = None
+        self.raw = None
+        self.decode_report = None   # 由报告描述符生成的解码函数
+        self.descriptor = None      # 当前设备的 HID 报告描述符（读不到时为 None）
+        self.connected_at = None    # 最近一次成功打开设备的时间 (perf_counter)
+        self.pinned = False         # 打开过设备之后，热插拔只认这个设备的 VID/PID
+        self.retry = None
+        self.capture = None         # Capture.ReportCapture：录制读到的每个原始报文
+        self.filter = None          # Filter.py 的摇杆平滑滤波器
+        self.button_table = self.BUTTON_TABLE
+        names = [entry[2] for entry in self.button_table]
+        self.buffers = (new_state(names), new_state(names))
+        self.current = 0
+        if not self._open():
+            if self.monitor: print("等待手柄连接...")
+
+    def _open_device(self):
+        """
+        并行探测所有像手柄的 HID 设备（见 Discovery.py），打开第一个可用的，
+        返回 (设备, hidraw 路径)；找不到时抛出 OSError。
+        """
+        from Discovery import discover_hid
+        found = discover_hid(self.vendor_id, self.product_id)
+        if not found:
+            raise OSError("no usable HID controller found")
+        info, device = found
+        self.vendor_id, self.product_id = info['vendor_id'], info['product_id']
+        return device, info['path']
+
+    def _open_path(self, path):
+        """直接打开给定的 hidraw 节点（热插拔事件中的 DEVNAME），不枚举、不探测其他设备。"""
+        import hid
+        device = hid.device()
+        device.open_path(path)
+        try:
+            device.set_nonblocking(True)
+        except (OSError, ValueError):
+            device.close()
+            raise
+        return device
+
+    def _open(self, quiet=False, path=None, ids=None):
+        try:
+            if path: self.device = self._open_path(path)
+            else: self.device, path = self._open_device()
+        except OSError as e:
+            if not quiet: print(f"Error opening device: {e}")
+            self.device = None
+            return False
+        if path and ids: self.vendor_id, self.product_id = ids
+        self.pinned = True
+        print("Connected:", self.device.get_manufacturer_string(), self.device.get_product_string())
+        self._load_layout(path)
+        self.raw = None
+        self.connected_at = time.perf_counter()
+        return True
+
+    def _disconnect(self):
+        if self.device:
+            try:
+                self.device.close()
+            except OSError:
+                pass
+        self.device = None
+        self.raw = None
+        print("\n手柄已断开，等待重新连接..." if self.monitor else "\n手柄已断开。")
+
+    def _retry_open(self, attempt, path=None, ids=None):
+        self.retry = None
+        last = attempt >= self.RETRY_LIMIT or not path
+        if self.device or self._open(quiet=True, path=None if last else path, ids=ids):
+            return
+        if not last:
+            delay = min(self.RETRY_INTERVAL * (1 << attempt), self.RETRY_MAX_INTERVAL)
+            self.retry = Clock.scheduler.call_later(delay, self._retry_open, attempt + 1, path, ids)
+
+    def _wanted(self, ids, path):
+        """
+        add 事件里的设备是不是要打开的手柄。打开过设备之后只认它的 VID/PID；
+        在此之前与启动时的探测相同，用 Discovery.is_gamepad 按 VID/PID、HID Usage 或产品名判断。
+        """
+        if self.pinned:
+            return ids == (self.vendor_id, self.product_id)
+        import hid
+        from Discovery import is_gamepad
+        entries = [info for info in hid.enumerate(*ids) if path is None or info['path'] == path]
+        if not entries:
+            entries = [{'vendor_id': ids[0], 'product_id': ids[1]}]
+        return any(is_gamepad(info, self.vendor_id, self.product_id) for info in entries)
+
+    def _handle_hotplug(self):
+        from Hotplug import OVERFLOW, device_ids
+        for event in self.monitor.poll():
+            if event is OVERFLOW:
+                # 事件丢失：未连接时直接尝试打开一次
+                if not self.device: self._open(quiet=True)
+                continue
+            ids = device_ids(event)
+            if ids is None:
+                continue
+            action = event.get('ACTION')
+            if action == 'add' and not self.device and self.retry is None:
+                node = event.get('DEVNAME')
+                path = ('/dev/' + node.rsplit('/', 1)[-1]).encode() if node else None
+                if self._wanted(ids, path):
+                    self._retry_open(0, path, ids)
+            elif action == 'remove' and self.device and ids == (self.vendor_id, self.product_id):
+                self._disconnect()
+
+    def wait(self, timeout):
+        """主循环空闲时调用：未连接时阻塞在 uevent socket 上，设备一插入就被唤醒。"""
+        if self.monitor and not self.device:
+            deadline = Clock.scheduler.next_deadline()
+            if deadline is not None:
+                timeout = max(0.0, min(timeout, deadline - Clock.now()))
+            self.monitor.wait(timeout)
+        else:
+            time.sleep(timeout)
+
+    def set_capture(self, capture):
+        """开始录制原始报文；设备已连接时立即写入设备信息，否则在连接时写入。"""
+        self.capture = capture
+        if self.device: capture.begin(self.vendor_id, self.product_id, self.descriptor)
+
+    def _load_layout(self, path):
+        self.descriptor = descriptor = read_report_descriptor(self.device, path)
+        if self.capture: self.capture.begin(self.vendor_id, self.product_id, descriptor)
+        self.decode_report = get_decoder(self.vendor_id, self.product_id, descriptor) if descriptor else None
+        if self.decode_report:
+            print(f"使用由 HID 报告描述符生成的解码器 ({self.decode_report.summary})。")
+        elif descriptor:
+            print("HID 报告描述符中没有可识别的按钮或轴（厂商自定义布局），使用固定的报文布局。")
+        else:
+            print("无法读取 HID 报告描述符，使用固定的报文布局。")
+
+    def close(self):
+        if self.retry: Clock.scheduler.cancel(self.retry)
+        if self.device: self.device.close()
+        if self.monitor: self.monitor.close()
+        if self.capture: self.capture.close()
+
+    def read(self):
+        """
+        读取最新的报文。手柄只在状态变化时发送报文，没有新报文时重新解码上一份，
+        这样按住摇杆时主循环每轮仍能得到一帧状态。收到第一份报文之前返回 None。
+        repeat_last=False 时没有新报文就返回 None（每份报文只返回一次状态）。
+        """
+        if self.monitor: self._handle_hotplug()
+        if not self.device: return None
+        try:
+            data = self.device.read(64, timeout_ms=1)
+        except OSError:
+            # 设备在 remove 事件到达之前就已不可读（或没有 monitor）
+            self._disconnect()
+            return None
+        if data:
+            raw = bytes(data)
+            if self.capture: self.capture.write(raw, Clock.now())
+            state = self._decode(raw)
+            if state is not None:
+                self.raw = raw
+                return state
+        if self.raw is None or not self.repeat_last: return None
+        return self._decode(self.raw)
+
+    def _decode(self, raw):
+        """解码到后台缓冲区；报文不属于手柄状态（ID 或长度不符）时返回 None 且不切换缓冲区。"""
+        state = self.buffers[self.current ^ 1]
+        buttons = state['buttons']
+        for name in buttons:
+            buttons[name] = False
+        if self.decode_report:
+            if not self.decode_report(raw, state, buttons):
+                return None
+            self.current ^= 1
+            if self.filter: self.filter.apply(state, Clock.now())
+            return state
+        if len(raw) < 18:
+            return None
+        self.current ^= 1
+        mask = 0
+        for index, byte_bit, name, bit in self.button_table:
+            if raw[index] & byte_bit:
+                buttons[name] = True
+                mask |= bit
+        state['mask'] = mask
+        lt, rt = struct.unpack_from("<HH", raw, 6)
+        lx, ly, rx, ry = struct.unpack_from("<hhhh", raw, 10)
+        state['lt'], state['rt'] = lt / 1023.0, rt / 1023.0
+        state['lx'], state['ly'] = self._normalize_axis(lx), self._normalize_axis(ly)
+        state['rx'], state['ry'] = self._normalize_axis(rx), self._normalize_axis(ry)
+        if self.filter: self.filter.apply(state, Clock.now())
+        return state
+
+    def _normalize_axis(self, v):
+        if v < 0: return max(-1.0, v / 32768.0)
+        else: return min(1.0, v / 32767.0)
@@ -0,0 +1,257 @@
+import os
+import struct
+import hashlib
+
+from State import button_bit
+
+# ==============================================================================
+# ======================== 由 HID 报告描述符生成解码器 ==========================
+# ==============================================================================
+# 读取设备的 HID report descriptor，找出输入报文里每个按钮、摇杆、扳机、方向键
+# 的位置，再生成一段针对该布局的 Python 解码函数并编译。编译好的函数按
+# VID/PID/描述符哈希只缓存在内存中，重连时无需再解析；解析和生成只需不到一毫秒，
+# 不写磁盘缓存，也就不会从文件里加载并执行代码。
+
+# --- HID Usage ---
+PAGE_GENERIC_DESKTOP, PAGE_SIMULATION, PAGE_BUTTON = 0x01, 0x02, 0x09
+USAGE_X, USAGE_Y, USAGE_Z, USAGE_RX, USAGE_RY, USAGE_RZ, USAGE_HAT = 0x30, 0x31, 0x32, 0x33, 0x34, 0x35, 0x39
+USAGE_ACCELERATOR, USAGE_BRAKE = 0xC4, 0xC5
+
+# 按钮页的 Usage 序号 -> 按钮名。通用手柄的常见顺序：
+DEFAULT_BUTTON_USAGES = {1: 'A', 2: 'B', 3: 'X', 4: 'Y', 5: 'LB', 6: 'RB', 7: 'MENU', 8: 'WIN', 9: 'LS', 10: 'RS'}
+# 个别手柄的按钮顺序不同，按 (VID, PID) 覆盖
+BUTTON_USAGES_BY_DEVICE = {
+    # Xbox Wireless Controller (蓝牙, 旧固件)：3/6/9/10 为空位，13 为 Guide
+    (0x045E, 0x02E0): {1: 'A', 2: 'B', 4: 'X', 5: 'Y', 7: 'LB', 8: 'RB', 11: 'MENU', 12: 'WIN', 14: 'LS', 15: 'RS'},
+    (0x045E, 0x0B13): {1: 'A', 2: 'B', 4: 'X', 5: 'Y', 7: 'LB', 8: 'RB', 11: 'MENU', 12: 'WIN', 14: 'LS', 15: 'RS'},
+}
+
+
+class Field:
+    """输入报文中的一个字段。bit_offset 从报文第一个字节（含 Report ID）算起。"""
+    def __init__(self, report_id, bit_offset, bit_size, usage_page, usage, logical_min, logical_max):
+        self.report_id, self.bit_offset, self.bit_size = report_id, bit_offset, bit_size
+        self.usage_page, self.usage = usage_page, usage
+        self.logical_min, self.logical_max = logical_min, logical_max
+
+    def __repr__(self):
+        return f"Field(id={self.report_id}, bit={self.bit_offset}, size={self.bit_size}, usage={self.usage_page:#x}:{self.usage:#x})"
+
+
+def _signed(value, size):
+    bits = size * 8
+    return value - (1 << bits) if size and value >= 1 << (bits - 1) else value
+
+
+def parse_report_descriptor(desc):
+    """解析报告描述符，返回所有 Input 变量字段 (Field) 的列表。"""
+    desc = bytes(desc)
+    fields = []
+    globals_ = {'page': 0, 'min': 0, 'max': 0, 'size': 0, 'count': 0, 'id': 0}
+    stack = []
+    usages, usage_min, usage_max = [], None, None
+    offsets = {}   # report_id -> 当前位偏移
+    i = 0
+    while i < len(desc):
+        prefix = desc[i]
+        if prefix == 0xFE:   # 长条目，跳过
+            i += 3 + (desc[i + 1] if i + 1 < len(desc) else 0)
+            continue
+        size = (0, 1, 2, 4)[prefix & 3]
+        item_type, tag = (prefix >> 2) & 3, prefix >> 4
+        raw = int.from_bytes(desc[i + 1:i + 1 + size], 'little')
+        i += 1 + size
+
+        if item_type == 1:   # --- 全局条目 ---
+            if tag == 0x0: globals_['page'] = raw
+            elif tag == 0x1: globals_['min'] = _signed(raw, size)
+            elif tag == 0x2: globals_['max'] = _signed(raw, size) if globals_['min'] < 0 else raw
+            elif tag == 0x7: globals_['size'] = raw
+            elif tag == 0x8: globals_['id'] = raw
+            elif tag == 0x9: globals_['count'] = raw
+            elif tag == 0xA: stack.append(dict(globals_))
+            elif tag == 0xB and stack: globals_ = stack.pop()
+        elif item_type == 2:   # --- 局部条目 ---
+            if tag == 0x0: usages.append(raw if size == 4 else (globals_['page'] << 16) | raw)
+            elif tag == 0x1: usage_min = raw
+            elif tag == 0x2: usage_max = raw
+        elif item_type == 0:   # --- 主条目 ---
+            if tag == 0x8:   # Input
+                report_id = globals_['id']
+                offset = offsets.get(report_id, 8 if report_id else 0)
+                is_constant, is_variable = raw & 0x01, raw & 0x02
+                if usage_min is not None and usage_max is not None:
+                    usages.extend((globals_['page'] << 16) | u for u in range(usage_min, usage_max + 1))
+                for n in range(globals_['count']):
+                    if not is_constant and is_variable and usages:
+                        full = usages[min(n, len(usages) - 1)]
+                        fields.append(Field(report_id, offset, globals_['size'], full >> 16, full & 0xFFFF, globals_['min'], globals_['max']))
+                    offset += globals_['size']
+                offsets[report_id] = offset
+            elif tag in (0x9, 0xB):   # Output / Feature 不占输入报文
+                pass
+            usages, usage_min, usage_max = [], None, None
+    return fields
+
+
+def _field_expr(field):
+    """生成读取字段原始整数值的表达式。"""
+    byte, shift, size = field.bit_offset >> 3, field.bit_offset & 7, field.bit_size
+    signed = field.logical_min < 0
+    if shift == 0 and size in (8, 16, 32):
+        fmt = {8: 'b', 16: 'h', 32: 'i'}[size] if signed else {8: 'B', 16: 'H', 32: 'I'}[size]
+        return f"_unpack_{fmt}(raw, {byte})[0]"
+    nbytes = (shift + size + 7) // 8
+    expr = f"(int.from_bytes(raw[{byte}:{byte + nbytes}], 'little') >> {shift}) & {(1 << size) - 1}"
+    if signed:
+        expr = f"_sign(({expr}), {size})"
+    return expr
+
+
+def plan_layout(fields, vendor_id=0, product_id=0):
+    """
+    从字段中找出手柄状态报文里可识别的按钮、方向键、摇杆和扳机，返回字典：
+        report_id, fields, buttons [(Field, 按钮名)], hat, sticks {轴名: Field}, triggers {轴名: Field}
+    sticks / triggers 中没有对应字段的值为 None。
+    """
+    # 选择字段最多的那个报文作为手柄状态报文
+    counts = {}
+    for field in fields:
+        counts[field.report_id] = counts.get(field.report_id, 0) + 1
+    report_id = max(counts, key=counts.get) if counts else 0
+    fields = [f for f in fields if f.report_id == report_id]
+    by_usage = {(f.usage_page, f.usage): f for f in fields}
+    button_names = BUTTON_USAGES_BY_DEVICE.get((vendor_id, product_id), DEFAULT_BUTTON_USAGES)
+
+    def axis(usage):
+        return by_usage.get((PAGE_GENERIC_DESKTOP, usage))
+
+    # --- 决定摇杆和扳机的对应关系 ---
+    sticks = {'lx': axis(USAGE_X), 'ly': axis(USAGE_Y)}
+    if axis(USAGE_Z) and axis(USAGE_RZ):
+        sticks['rx'], sticks['ry'] = axis(USAGE_Z), axis(USAGE_RZ)
+        triggers = {'lt': axis(USAGE_RX), 'rt': axis(USAGE_RY)}
+    else:
+        sticks['rx'], sticks['ry'] = axis(USAGE_RX), axis(USAGE_RY)
+        triggers = {'lt': axis(USAGE_Z), 'rt': axis(USAGE_RZ)}
+    brake, accelerator = by_usage.get((PAGE_SIMULATION, USAGE_BRAKE)), by_usage.get((PAGE_SIMULATION, USAGE_ACCELERATOR))
+    if brake or accelerator:
+        triggers = {'lt': brake, 'rt': accelerator}
+    buttons = [(f, button_names[f.usage]) for f in fields
+               if f.usage_page == PAGE_BUTTON and f.bit_size == 1 and f.usage in button_names]
+    return {'report_id': report_id, 'fields': fields, 'buttons': buttons, 'hat': axis(USAGE_HAT),
+            'sticks': sticks, 'triggers': triggers}
+
+
+def describe_layout(layout):
+    """布局的简短说明；没有任何可用的按钮或轴时返回 None。"""
+    sticks = sum(1 for f in layout['sticks'].values() if f)
+    triggers = sum(1 for f in layout['triggers'].values() if f)
+    if not (layout['buttons'] or layout['hat'] or sticks or triggers):
+        return None
+    return f"{len(layout['buttons'])} 个按钮, {sticks} 个摇杆轴, {triggers} 个扳机" + (", 方向键" if layout['hat'] else "")
+
+
+def generate_source(layout):
+    """
+    为 plan_layout() 得到的布局生成解码函数的源码：
+        decode(raw, state, buttons) -> 成功返回 True，报文 ID 不符或长度不足返回 False
+    调用前 buttons 应已全部置为 False。
+    """
+    report_id, fields, hat = layout['report_id'], layout['fields'], layout['hat']
+    sticks, triggers = layout['sticks'], layout['triggers']
+    min_length = max(((f.bit_offset + f.bit_size + 7) >> 3 for f in fields), default=0)
+    lines = [f"def decode(raw, state, buttons):",
+             f"    if len(raw) < {min_length}: return False"]
+    if report_id:
+        lines.append(f"    if raw[0] != {report_id}: return False")
+    lines.append("    mask = 0")
+
+    # --- 按钮：同一个字节只读一次 ---
+    by_byte = {}
+    for field, name in layout['buttons']:
+        by_byte.setdefault(field.bit_offset >> 3, []).append((field, name))
+    for byte, group in sorted(by_byte.items()):
+        lines.append(f"    b = raw[{byte}]")
+        for field, name in group:
+            lines.append(f"    if b & {1 << (field.bit_offset & 7)}: buttons[{name!r}] = True; mask |= {button_bit(name)}")
+
+    # --- 方向键 (Hat switch)：0..7 对应 上、右上、右、右下、下、左下、左、左上 ---
+    if hat:
+        up, down, left, right = (button_bit(n) for n in ('UP', 'DOWN', 'LEFT', 'RIGHT'))
+        lines.append(f"    h = ({_field_expr(hat)}) - {hat.logical_min}")
+        lines.append(f"    if h in (7, 0, 1): buttons['UP'] = True; mask |= {up}")
+        lines.append(f"    if h in (3, 4, 5): buttons['DOWN'] = True; mask |= {down}")
+        lines.append(f"    if h in (5, 6, 7): buttons['LEFT'] = True; mask |= {left}")
+        lines.append(f"    if h in (1, 2, 3): buttons['RIGHT'] = True; mask |= {right}")
+    lines.append("    state['mask'] = mask")
+
+    # --- 摇杆归一化到 -1..1（Y 轴取反使向上为正），扳机归一化到 0..1 ---
+    for name, field in sticks.items():
+        if field:
+            center = (field.logical_min + field.logical_max) / 2.0
+            scale = 2.0 / (field.logical_max - field.logical_min) * (-1.0 if name in ('ly', 'ry') else 1.0)
+            lines.append(f"    v = (({_field_expr(field)}) - {center!r}) * {scale!r}")
+            lines.append(f"    state[{name!r}] = -1.0 if v < -1.0 else (1.0 if v > 1.0 else v)")
+    for name, field in triggers.items():
+        if field:
+            scale = 1.0 / (field.logical_max - field.logical_min)
+            lines.append(f"    state[{name!r}] = (({_field_expr(field)}) - {field.logical_min}) * {scale!r}")
+    lines.append("    return True")
+    return "\n".join(lines) + "\n"
+
+
+def _sign(value, bits):
+    return value - (1 << bits) if value >> (bits - 1) else value
+
+
+def compile_source(source):
+    namespace = {'_sign': _sign}
+    for fmt in 'bBhHiI':
+        namespace[f'_unpack_{fmt}'] = struct.Struct('<' + fmt).unpack_from
+    exec(compile(source, '<hid-decoder>', 'exec'), namespace)
+    return namespace['decode']
+
+
+_DECODERS = {}   # (vid, pid, 描述符哈希) -> 解码函数
+
+
+def get_decoder(vendor_id, product_id, descriptor):
+    """
+    返回该描述符对应的解码函数，函数的 summary 属性是布局说明；同一个描述符只解析、生成一次
+    （仅在内存中缓存）。描述符里没有任何可识别的按钮或轴时（例如 045E:0B12 的厂商自定义
+    GIP 描述符）返回 None，调用方应使用固定布局。
+    """
+    digest = hashlib.sha1(bytes(descriptor)).hexdigest()[:16]
+    key = (vendor_id, product_id, digest)
+    if key not in _DECODERS:
+        layout = plan_layout(parse_report_descriptor(descriptor), vendor_id, product_id)
+        summary = describe_layout(layout)
+        decoder = None
+        if summary:
+            decoder = compile_source(generate_source(layout))
+            decoder.summary = summary
+        _DECODERS[key] = decoder
+    return _DECODERS[key]
+
+
+def read_report_descriptor(device, path=None):
+    """
+    读取设备的报告描述符：优先用 hidapi 的 get_report_descriptor()（hidapi >= 0.14），
+    否则在 Linux 上从 sysfs 读取 (/sys/class/hidraw/hidrawN/device/report_descriptor)。
+    都不可用时返回 None。
+    """
+    getter = getattr(device, 'get_report_descriptor', None)
+    if getter:
+        try:
+            return bytes(getter())
+        except (OSError, ValueError, IOError):
+            pass
+    if path:
+        node = os.path.basename(path.decode() if isinstance(path, bytes) else path)
+        try:
+            with open(f"/sys/class/hidraw/{node}/device/report_descriptor", 'rb') as f:
+                return f.read()
+        except OSError:
+            pass
+    return None
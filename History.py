@@ -0,0 +1,200 @@
+from array import array
+
+from State import AXES, button_bit
+
+# ==============================================================================
+# ======================== 输入历史：定长环形缓冲区 ============================
+# ==============================================================================
+# Action 只能看到当前帧和上一帧，需要更长历史的 Action 以前只能自己保存。这里由主循环
+# 在 Action 之前记录每一帧解码后的输入（时间、按钮位掩码、六个轴），保存最近 size 帧。
+# 所有存储在构造时用 array 一次性分配，运行多久占用的内存都不变，记录一帧不分配内存。
+#
+#   held_for(name)           按钮已连续按住多少秒，O(1)（每个位记录最近一次按下的时刻）
+#   presses(name, window)    最近 window 秒内按下了几次，O(log K)（每个位保存最近 K 次按下的时刻）
+#   peak(axis, window)       最近 window 秒内轴的最大绝对值，O(log N)（每个轴一棵最大值线段树）
+#   index_at(t)              t 时刻及以后的第一帧，O(log N)（时间戳单调，二分查找）
+#
+# 查询的时间窗口超出缓冲区覆盖的范围时，只统计缓冲区里还在的帧；presses 最多数到
+# PRESS_LIMIT 次。线段树按需更新：只有被查询过的轴才在查询时补上新记录的帧，
+# 从不查询 peak 的配置没有这部分开销。
+#
+# 记录的是 Action 处理之前的输入，Action 产生的虚拟按钮（组合键、手势脉冲）不在其中。
+# 按钮只记录位掩码的低 64 位。模拟 (Simulation.py) 的空闲快进会跳过静止的帧，
+# 按时间的查询不受影响。
+
+SIZE = 1024
+PRESS_LIMIT = 32
+MASK_BITS = 64
+MASK_LIMIT = (1 << MASK_BITS) - 1
+
+
+class InputHistory:
+    def __init__(self, size=SIZE, press_limit=PRESS_LIMIT, axes=AXES):
+        self.size, self.press_limit, self.axes = size, press_limit, tuple(axes)
+        self.times = array('d', bytes(8 * size))
+        self.masks = array('Q', bytes(8 * size))
+        self.values = {axis: array('d', bytes(8 * size)) for axis in self.axes}
+        self.columns = tuple(self.values.items())
+        # 每个轴一棵最大值线段树，叶子 leaves + i 对应环形缓冲区的第 i 格，存绝对值
+        self.leaves = 1 << max(size - 1, 1).bit_length()
+        self.trees = {axis: array('d', bytes(16 * self.leaves)) for axis in self.axes}
+        self.synced = dict.fromkeys(self.axes, 0)   # 各棵树已包含的帧数 (total)
+        # 每个位：最近一次按下的时刻，以及最近 press_limit 次按下时刻的环形缓冲区
+        self.since = array('d', bytes(8 * MASK_BITS))
+        self.press_times = array('d', bytes(8 * MASK_BITS * press_limit))
+        self.press_counts = array('Q', bytes(8 * MASK_BITS))
+        self.bit_index = {}
+        self.clear()
+
+    def clear(self):
+        self.total = 0          # 记录过的总帧数，最新一帧在 (total - 1) % size
+        self.mask = 0
+        for axis in self.axes:
+            self.synced[axis] = 0
+        for i in range(MASK_BITS):
+            self.press_counts[i] = 0
+
+    def __len__(self):
+        return min(self.total, self.size)
+
+    # ----------------------------------------------------------------------------
+    # 记录
+    # ----------------------------------------------------------------------------
+
+    def record(self, state, t):
+        """记录一帧。t 必须不早于上一帧。"""
+        slot = self.total % self.size
+        self.times[slot] = t
+        mask = state['mask'] & MASK_LIMIT
+        self.masks[slot] = mask
+        for axis, column in self.columns:
+            column[slot] = state[axis]
+        self.total += 1
+
+        pressed = mask & ~self.mask
+        self.mask = mask
+        while pressed:
+            low = pressed & -pressed
+            pressed ^= low
+            i = low.bit_length() - 1
+            self.since[i] = t
+            count = self.press_counts[i]
+            self.press_times[i * self.press_limit + count % self.press_limit] = t
+            self.press_counts[i] = count + 1
+
+    # ----------------------------------------------------------------------------
+    # 查询
+    # ----------------------------------------------------------------------------
+
+    @property
+    def now(self):
+        """最新一帧的时刻；还没有记录时为 None。"""
+        return self.times[(self.total - 1) % self.size] if self.total else None
+
+    def _bit(self, name):
+        i = self.bit_index.get(name)
+        if i is None:
+            i = self.bit_index[name] = button_bit(name).bit_length() - 1
+        return i
+
+    def is_held(self, name):
+        i = self._bit(name)
+        return i < MASK_BITS and bool(self.mask >> i & 1)
+
+    def held_for(self, name):
+        """按钮到最新一帧为止已连续按住的秒数，没有按住时为 0。"""
+        i = self._bit(name)
+        if i >= MASK_BITS or not self.mask >> i & 1:
+            return 0.0
+        return self.now - self.since[i]
+
+    def presses(self, name, window):
+        """最近 window 秒内（含最新一帧）按下的次数，最多 press_limit 次。"""
+        i = self._bit(name)
+        if i >= MASK_BITS or not self.total:
+            return 0
+        count, limit = self.press_counts[i], self.press_limit
+        kept = min(count, limit)
+        start = self.now - window
+        base, first = i * limit, count - kept   # 逻辑序号 first .. count-1 按时间递增
+        lo, hi = 0, kept
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.press_times[base + (first + mid) % limit] < start: lo = mid + 1
+            else: hi = mid
+        return kept - lo
+
+    def index_at(self, t):
+        """时刻不早于 t 的最早一帧在缓冲区中的逻辑序号（0 为最旧的一帧）。"""
+        n = len(self)
+        first = self.total - n
+        lo, hi = 0, n
+        times, size = self.times, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if times[(first + mid) % size] < t: lo = mid + 1
+            else: hi = mid
+        return lo
+
+    def value(self, axis, age=0):
+        """age 帧以前轴的值（0 为最新一帧）。"""
+        if age >= len(self):
+            raise IndexError(f"历史中只有 {len(self)} 帧")
+        return self.values[axis][(self.total - 1 - age) % self.size]
+
+    def peak(self, axis, window):
+        """最近 window 秒内（含最新一帧）轴的最大绝对值。"""
+        if not self.total:
+            return 0.0
+        self._sync(axis)
+        n = len(self)
+        start = self.index_at(self.now - window)
+        if start >= n:
+            return 0.0
+        size = self.size
+        first = (self.total - n + start) % size
+        last = (self.total - 1) % size
+        if first <= last:
+            return self._query(self.trees[axis], first, last)
+        return max(self._query(self.trees[axis], first, size - 1), self._query(self.trees[axis], 0, last))
+
+    # ----------------------------------------------------------------------------
+    # 线段树
+    # ----------------------------------------------------------------------------
+
+    def _sync(self, axis):
+        """把上次查询以来新记录的帧补进该轴的线段树。"""
+        pending = self.total - self.synced[axis]
+        if not pending:
+            return
+        tree, values, leaves, size = self.trees[axis], self.values[axis], self.leaves, self.size
+        if pending >= size:
+            # 整个缓冲区都换过了：直接重建，O(N)
+            for i in range(size):
+                tree[leaves + i] = abs(values[i])
+            for node in range(leaves - 1, 0, -1):
+                tree[node] = max(tree[2 * node], tree[2 * node + 1])
+        else:
+            for seq in range(self.synced[axis], self.total):
+                node = leaves + seq % size
+                tree[node] = abs(values[node - leaves])
+                node >>= 1
+                while node:
+                    tree[node] = max(tree[2 * node], tree[2 * node + 1])
+                    node >>= 1
+        self.synced[axis] = self.total
+
+    def _query(self, tree, first, last):
+        result = 0.0
+        lo, hi = first + self.leaves, last + self.leaves + 1
+        while lo < hi:
+            if lo & 1:
+                result = max(result, tree[lo]); lo += 1
+            if hi & 1:
+                hi -= 1; result = max(result, tree[hi])
+            lo >>= 1; hi >>= 1
+        return result
+
+
+# 主循环与模拟记录到这里，Action 通过 History.history 查询
+history = InputHistory()
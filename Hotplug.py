@@ -0,0 +1,112 @@
+import re
+import errno
+import select
+import socket
+
+# ==============================================================================
+# ======================== 热插拔：内核 uevent (netlink) =======================
+# ==============================================================================
+# 订阅内核通过 NETLINK_KOBJECT_UEVENT 广播的设备事件，不再轮询 hid.enumerate()。
+# 每条消息格式为 "add@/devices/...\0ACTION=add\0DEVPATH=...\0SUBSYSTEM=hidraw\0..."。
+# hidraw 设备的 DEVPATH 中带有 "总线:VID:PID.序号" 一段，据此判断是不是我们的手柄。
+# 只在 Linux 上可用；其他平台 UeventMonitor.open() 返回 None，后端退回到不支持热插拔。
+
+NETLINK_KOBJECT_UEVENT = 15
+KERNEL_GROUP = 1                 # 内核直接发出的事件（udev 处理之前）
+RECV_SIZE = 16384
+OVERFLOW = {'ACTION': 'overflow'}  # 接收缓冲区溢出，事件可能已丢失
+
+HID_ID = re.compile(r'/([0-9A-Fa-f]{4}):([0-9A-Fa-f]{4}):([0-9A-Fa-f]{4})\.[0-9A-Fa-f]{4}(?:/|$)')
+
+
+def parse_uevent(data):
+    """把一条 uevent 消息解析为 {键: 值} 字典；不是内核格式的消息（如 udev 的 libudev 消息）返回 None。"""
+    parts = data.split(b'\0')
+    if b'@' not in parts[0]:
+        return None
+    event = {}
+    for part in parts[1:]:
+        key, sep, value = part.partition(b'=')
+        if sep:
+            event[key.decode('ascii', 'replace')] = value.decode('utf-8', 'replace')
+    return event
+
+
+def device_ids(event):
+    """从 DEVPATH 中取出 (vendor_id, product_id)，取不到时返回 None。"""
+    match = HID_ID.search(event.get('DEVPATH', ''))
+    if not match:
+        return None
+    return int(match.group(2), 16), int(match.group(3), 16)
+
+
+class UeventMonitor:
+    """非阻塞地接收某个子系统的 uevent。sock 可以传入其他数据报 socket（用于模拟）。"""
+    def __init__(self, sock=None, subsystem='hidraw'):
+        if sock is None:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+            sock.bind((0, KERNEL_GROUP))
+        sock.setblocking(False)
+        self.sock = sock
+        self.subsystem = subsystem
+
+    @classmethod
+    def open(cls, subsystem='hidraw'):
+        """创建监听内核事件的 monitor；平台不支持 netlink 时返回 None。"""
+        try:
+            return cls(subsystem=subsystem)
+        except (AttributeError, OSError) as e:
+            print(f"无法监听设备热插拔事件 ({e})，断开后需要重新启动程序。")
+            return None
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def poll(self):
+        """取出所有已到达的事件，只返回所关心子系统的事件；没有事件时立即返回空列表。"""
+        events = []
+        while True:
+            try:
+                data = self.sock.recv(RECV_SIZE)
+            except BlockingIOError:
+                return events
+            except OSError as e:
+                if e.errno != errno.ENOBUFS:
+                    raise
+                events.append(OVERFLOW)
+                continue
+            event = parse_uevent(data)
+            if event and event.get('SUBSYSTEM') == self.subsystem:
+                events.append(event)
+
+    def wait(self, timeout):
+        """阻塞直到有事件到达或超时。"""
+        select.select([self.sock], [], [], timeout)
+
+    def close(self):
+        self.sock.close()
+
+
+class SimulatedUeventSource:
+    """
+    模拟内核 uevent：通过一对 UNIX 数据报 socket 发送与内核格式相同的消息，
+    用于在没有真实设备的情况下测试重连逻辑和测量重连延迟。
+    """
+    def __init__(self, subsystem='hidraw'):
+        self.sender, self.receiver = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.subsystem = subsystem
+        self.seqnum = 0
+
+    def monitor(self):
+        return UeventMonitor(self.receiver, self.subsystem)
+
+    def inject(self, action, vendor_id, product_id, bus=0x0005, node='hidraw0'):
+        self.seqnum += 1
+        devpath = f"/devices/virtual/misc/uhid/{bus:04X}:{vendor_id:04X}:{product_id:04X}.0001/hidraw/{node}"
+        fields = [f"{action}@{devpath}", f"ACTION={action}", f"DEVPATH={devpath}", f"SUBSYSTEM={self.subsystem}",
+                  f"DEVNAME={node}", f"SEQNUM={self.seqnum}"]
+        self.sender.send('\0'.join(fields).encode() + b'\0')
+
+    def close(self):
+        self.sender.close()
+        self.receiver.close()
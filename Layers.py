@@ -0,0 +1,74 @@
+from Action import Action
+
+# ==============================================================================
+# ======================== 模式层：多套预编译的 Action 配置 =====================
+# ==============================================================================
+
+class Layers(Action):
+    """
+    在内存中同时保存多套 Action 列表（层），通过按钮在它们之间切换：
+        Layers({'browser': [...], 'presentation': [...]}, switch={'LS': 'presentation'}, cycle='LAYER')
+
+    - 切换只是替换当前列表的引用，不重建任何 Action。
+    - 在某一帧里检测到的切换请求在下一帧开始时生效，一帧内只会使用同一层。
+    - 切换时旧层的 Action 释放仍被按住的输出（release），新层的 Action 接管
+      当前已按住的按钮（sync），并且第一帧看不到任何按下沿，
+      因此按住不放的按钮不会在新层里被当作一次新的按下。
+
+    switch / cycle 可以是真实按钮，也可以是前面 ChordAction 产生的虚拟按钮。
+    """
+    def __init__(self, layers, initial=None, switch=None, cycle=None):
+        self.plans = {name: tuple(actions) for name, actions in layers.items()}
+        self.order = tuple(self.plans)
+        self.name = initial or self.order[0]
+        self.plan = self.plans[self.name]
+        self.switch = dict(switch or {})   # 按钮 -> 目标层名
+        self.switch_pairs = tuple(self.switch.items())  # 每帧遍历用，避免每帧新建 dict 视图和迭代器
+        self.cycle = cycle                 # 按下后切换到下一层的按钮
+        self.requested = None
+        self.entering = False
+
+    def request(self, name):
+        """请求在下一帧切换到指定层。"""
+        if name not in self.plans:
+            raise KeyError(f"未知的层: {name}")
+        self.requested = name
+
+    def _switch(self, state, mouse, keyboard):
+        name, self.requested = self.requested, None
+        if name == self.name:
+            return
+        for action in self.plan:
+            action.release(mouse, keyboard)
+        self.name, self.plan = name, self.plans[name]
+        for action in self.plan:
+            action.sync(state)
+        self.entering = True
+        print(f"\n已切换到层: {name}")
+
+    def release(self, mouse, keyboard):
+        for action in self.plan:
+            action.release(mouse, keyboard)
+
+    def sync(self, state):
+        for action in self.plan:
+            action.sync(state)
+        self.entering = True
+
+    def update(self, state, last_state, mouse, keyboard):
+        if self.requested is not None:
+            self._switch(state, mouse, keyboard)
+
+        # 刚进入新层的第一帧，把当前状态当作上一帧，避免产生按下沿
+        previous = state if self.entering else last_state
+        self.entering = False
+        for action in self.plan:
+            action.update(state, previous, mouse, keyboard)
+
+        buttons = state['buttons']
+        last_buttons = last_state['buttons'] if last_state else {}
+        if self.cycle and buttons.get(self.cycle, False) and not last_buttons.get(self.cycle, False):
+            self.requested = self.order[(self.order.index(self.name) + 1) % len(self.order)]
+        for button, target in self.switch_pairs:
+            if buttons.get(button, False) and not last_buttons.get(button, False):
+                self.requested = target
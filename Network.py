@@ -0,0 +1,265 @@
+import hmac
+import errno
+import select
+import socket
+import struct
+import ipaddress
+
+import Clock
+from State import AXES, BUTTON_NAMES, new_state
+
+# ==============================================================================
+# ======================== 通过 UDP 转发手柄输入 ===============================
+# ==============================================================================
+# 发送端 (s.py --send 主机:端口) 在主循环中把每帧状态编码成数据报；接收端
+# (s.py --backend udp --listen [主机:]端口) 作为输入后端，状态照常交给 ACTION_CONFIG。
+#
+# 接收到的状态会直接变成键盘鼠标操作，因此接收端默认只监听 127.0.0.1。要在其他地址上
+# 接收，必须在 --listen 中明确写出主机，并且至少设置以下一项，否则拒绝启动：
+#     --secret-file 文件   两端共用的密钥：每个数据报末尾附 HMAC-SHA256 的前 TAG_SIZE 字节，
+#                          校验失败的数据报直接丢弃（发送端用同一个 --secret-file）
+#     --allow 地址,...     只接受这些发送端地址 (recvfrom 的来源地址) 的数据报
+#
+# 关键帧携带完整状态；其余数据报都是相对于上一个（倒数第二新的）关键帧的差量：
+#     与关键帧不同的按钮位（异或掩码） + 与关键帧不同的轴（量化为 int16）。
+# 每个差量数据报只依赖关键帧本身，不依赖之前的差量，因此中间丢包不会累积误差，
+# 只要收到任意一个更新的数据报就能恢复到最新状态。差量不基于最新的关键帧，
+# 这样只丢失一个关键帧时接收端仍然能解出后续的差量；关键帧还会在下一帧原样重发一次。数据报带有序号，乱序到达的旧数据报直接丢弃。
+# 状态不变时不发送，只在每个关键帧间隔发一次关键帧；状态变化后把最后一个数据报再重发几次，
+# 以免恰好丢失的最后一个数据报（比如松开按键）要等到下一个关键帧才被补上。
+#
+# 数据报格式（小端）：
+#     头部      <B B I I>   版本, 标志 (bit0=关键帧), 序号, 基于的关键帧序号
+#     关键帧    <Q 6h>      按钮位掩码, lx ly rx ry lt rt
+#     差量      <Q B> + n*h 与关键帧不同的按钮位, 变化的轴 (位 i 对应 AXES[i]), 各轴的量化值
+
+DEFAULT_PORT = 47999
+LOOPBACK = '127.0.0.1'
+TAG_SIZE = 16
+VERSION = 1
+FLAG_KEYFRAME = 1
+
+HEADER = struct.Struct('<BBII')
+KEYFRAME = struct.Struct('<Q6h')
+DELTA_HEADER = struct.Struct('<QB')
+AXIS_VALUES = [struct.Struct(f'<{n}h') for n in range(len(AXES) + 1)]
+MASK_LIMIT = (1 << 64) - 1
+SEQ_LIMIT = 1 << 32
+
+KEYFRAME_INTERVAL = 0.1   # 秒
+REPEATS = 2               # 状态停止变化后，最后一个数据报重发的次数
+RECEIVE_TIMEOUT = 0.5     # 接收端超过这么久没有数据报，视为发送端已断开
+
+
+def parse_address(text, default_host=LOOPBACK):
+    """'主机:端口' 或 '端口' -> (主机, 端口)。"""
+    host, _, port = text.rpartition(':')
+    return host or default_host, int(port) if port else DEFAULT_PORT
+
+
+def is_loopback(host):
+    try:
+        return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        return False
+
+
+def sign(secret, data):
+    return data + hmac.digest(secret, data, 'sha256')[:TAG_SIZE]
+
+
+def verify(secret, data):
+    """校验并去掉末尾的 HMAC；校验失败返回 None。"""
+    if len(data) < TAG_SIZE:
+        return None
+    body, tag = data[:-TAG_SIZE], data[-TAG_SIZE:]
+    return body if hmac.compare_digest(hmac.digest(secret, body, 'sha256')[:TAG_SIZE], tag) else None
+
+
+def quantize(value):
+    if value >= 1.0: return 32767
+    if value <= -1.0: return -32767
+    return int(round(value * 32767))
+
+
+def seq_newer(a, b):
+    """序号回绕比较：a 是否比 b 新。"""
+    return 0 < (a - b) % SEQ_LIMIT < SEQ_LIMIT // 2
+
+
+class UdpSender:
+    def __init__(self, address, keyframe_interval=KEYFRAME_INTERVAL, repeats=REPEATS, sock=None, secret=None):
+        self.address = address
+        self.secret = secret
+        self.sock = sock or socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.keyframe_interval, self.repeats = keyframe_interval, repeats
+        self.seq = 0
+        self.keyframes = []        # 最近两个关键帧 (序号, mask, 量化后的轴)，差量基于较旧的那个
+        self.next_keyframe = 0.0
+        self.last = None           # 上一次发送的 (mask, 量化后的轴)
+        self.pending_repeats = 0
+        self.keyframe_copy = None
+        self.sent_packets = self.sent_bytes = 0
+        print(f"正在把手柄输入转发到 {address[0]}:{address[1]} (UDP)。")
+
+    def _send(self, data):
+        if self.secret: data = sign(self.secret, data)
+        try:
+            self.sock.sendto(data, self.address)
+        except (BlockingIOError, InterruptedError):
+            return   # 发送缓冲区满：丢掉这一个，后续数据报会补上状态
+        except OSError as e:
+            if e.errno not in (errno.ECONNREFUSED, errno.EHOSTUNREACH, errno.ENETUNREACH):
+                raise
+            return   # 接收端暂时不在：继续发送，等它上线
+        self.sent_packets += 1
+        self.sent_bytes += len(data)
+
+    def send(self, state, t):
+        mask = state['mask'] & MASK_LIMIT
+        axes = (quantize(state['lx']), quantize(state['ly']), quantize(state['rx']),
+                quantize(state['ry']), quantize(state['lt']), quantize(state['rt']))
+        current = (mask, axes)
+        if self.keyframe_copy:
+            self._send(self.keyframe_copy)
+            self.keyframe_copy = None
+        if t >= self.next_keyframe or not self.keyframes:
+            self.seq = (self.seq + 1) % SEQ_LIMIT
+            self.keyframes = self.keyframes[-1:] + [(self.seq, mask, axes)]
+            self.next_keyframe = t + self.keyframe_interval
+            self.last, self.pending_repeats = current, 0
+            self.keyframe_copy = HEADER.pack(VERSION, FLAG_KEYFRAME, self.seq, self.seq) + KEYFRAME.pack(mask, *axes)
+            self._send(self.keyframe_copy)
+            return
+        if current == self.last:
+            if not self.pending_repeats:
+                return
+            self.pending_repeats -= 1
+        else:
+            self.last, self.pending_repeats = current, self.repeats
+        self.seq = (self.seq + 1) % SEQ_LIMIT
+        base_seq, base_mask, base = self.keyframes[0]
+        bits, values = 0, []
+        for i in range(len(AXES)):
+            if axes[i] != base[i]:
+                bits |= 1 << i
+                values.append(axes[i])
+        self._send(HEADER.pack(VERSION, 0, self.seq, base_seq) + DELTA_HEADER.pack(mask ^ base_mask, bits)
+                   + AXIS_VALUES[len(values)].pack(*values))
+
+    def close(self):
+        self.sock.close()
+
+
+class UdpController:
+    """
+    输入后端：接收 UdpSender 发出的数据报，read() 返回与其他后端相同格式的状态。
+    还没收到关键帧，或者超过 RECEIVE_TIMEOUT 没有数据报时返回 None（主循环会暂停并松开按住的输出）。
+    secret 为共用密钥（bytes），allow 为允许的发送端地址；不满足的数据报计入 rejected 后丢弃。
+    """
+    def __init__(self, address=(LOOPBACK, DEFAULT_PORT), timeout=RECEIVE_TIMEOUT, sock=None, secret=None, allow=None):
+        if sock is None:
+            if not is_loopback(address[0]) and not (secret or allow):
+                raise ValueError(f"在非回环地址 {address[0] or '*'} 上接收需要 --secret-file 或 --allow，"
+                                 "否则局域网内的任何主机都能控制键盘鼠标")
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind(address)
+            print(f"正在 {address[0] or '*'}:{address[1]} 接收手柄输入 (UDP)"
+                  f"{'，校验 HMAC' if secret else ''}{'，只接受 ' + ', '.join(allow) if allow else ''}。")
+        self.secret = secret
+        self.allow = frozenset(socket.gethostbyname(host) for host in allow) if allow else None
+        sock.setblocking(False)
+        self.sock = sock
+        self.timeout = timeout
+        self.buffers = (new_state(BUTTON_NAMES), new_state(BUTTON_NAMES))
+        self.current = 0
+        self.seq = None                  # 最近一次应用的数据报序号
+        self.keyframes = {}              # 关键帧序号 -> (mask, 轴)，只保留最近几个
+        self.mask, self.axes = 0, (0,) * len(AXES)
+        self.last_packet = None
+        self.received = self.stale = self.orphaned = self.rejected = 0
+        self.filter = None               # Filter.py 的摇杆平滑滤波器
+
+    def _apply(self, data):
+        if len(data) < HEADER.size:
+            return
+        version, flags, seq, base_seq = HEADER.unpack_from(data)
+        if version != VERSION:
+            return
+        self.received += 1
+        keyframe = None
+        if flags & FLAG_KEYFRAME:
+            # 迟到的关键帧也要保存：之后的差量可能正基于它
+            mask, *axes = KEYFRAME.unpack_from(data, HEADER.size)
+            keyframe = self.keyframes[seq] = (mask, tuple(axes))
+            if len(self.keyframes) > 4:
+                newest = seq if self.seq is None or seq_newer(seq, self.seq) else self.seq
+                del self.keyframes[max(self.keyframes, key=lambda k: (newest - k) % SEQ_LIMIT)]
+        if self.seq is not None and not seq_newer(seq, self.seq):
+            self.stale += 1   # 重复或乱序到达的旧数据报
+            return
+        if keyframe:
+            self.mask, self.axes = keyframe
+        else:
+            base = self.keyframes.get(base_seq)
+            if base is None:
+                self.orphaned += 1   # 它所基于的关键帧丢失了，等下一个关键帧
+                return
+            changed, bits = DELTA_HEADER.unpack_from(data, HEADER.size)
+            names = [i for i in range(len(AXES)) if bits >> i & 1]
+            values = AXIS_VALUES[len(names)].unpack_from(data, HEADER.size + DELTA_HEADER.size)
+            axes = list(base[1])
+            for i, value in zip(names, values):
+                axes[i] = value
+            self.mask, self.axes = base[0] ^ changed, tuple(axes)
+        self.seq = seq
+        self.last_packet = Clock.now()
+
+    def read(self):
+        while True:
+            try:
+                data, sender = self.sock.recvfrom(1024)
+            except OSError:   # 包括没有更多数据报时的 BlockingIOError
+                break
+            if self.allow is not None and sender[0] not in self.allow:
+                self.rejected += 1
+                continue
+            if self.secret:
+                data = verify(self.secret, data)
+                if data is None:
+                    self.rejected += 1
+                    continue
+            try:
+                self._apply(data)
+            except struct.error:
+                pass   # 截断的数据报
+        if self.last_packet is None or Clock.now() - self.last_packet > self.timeout:
+            if self.seq is not None and self.last_packet is not None:
+                self.seq, self.last_packet = None, None
+                self.keyframes.clear()
+            return None
+        self.current ^= 1
+        state = self.buffers[self.current]
+        buttons = state['buttons']
+        for name in buttons:
+            buttons[name] = False
+        mask = self.mask
+        state['mask'] = mask
+        while mask:
+            low = mask & -mask
+            name = BUTTON_NAMES[low.bit_length() - 1] if low.bit_length() <= len(BUTTON_NAMES) else None
+            if name:
+                buttons[name] = True
+            mask ^= low
+        axes = self.axes
+        state['lx'], state['ly'], state['rx'], state['ry'] = axes[0] / 32767, axes[1] / 32767, axes[2] / 32767, axes[3] / 32767
+        state['lt'], state['rt'] = axes[4] / 32767, axes[5] / 32767
+        if self.filter: self.filter.apply(state, Clock.now())
+        return state
+
+    def wait(self, timeout):
+        select.select([self.sock], [], [], timeout)
+
+    def close(self):
+        self.sock.close()
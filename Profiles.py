@@ -0,0 +1,188 @@
+import os
+import sys
+import time
+import json
+
+# ==============================================================================
+# ======================== 手柄配置库：按 SDL GUID 索引 ========================
+# ==============================================================================
+# 可以导入 SDL 的 gamecontrollerdb.txt（https://github.com/gabomdq/SDL_GameControllerDB），
+# 每行格式：GUID,名称,a:b0,b:b1,...,leftx:a0,dpup:h0.1,...,platform:Linux,
+# 解析后的映射表缓存为 JSON 文件（<数据库>.cache.json，只含字符串和整数，加载时不会执行
+# 任何代码），下次启动时若源文件未变则直接加载。
+#
+# 绑定的修饰符：'a2~' 反转轴；'+a2' / '-a2' 只用轴的正 / 负半边（0..1）。编译后写成映射中
+# 第三个元素，例如 "lt": ["axis", 2, "+"]，由 State.JoystickDecoder 解码。扳机绑定到按钮时
+# (lefttrigger:b6) 扳机轴按按钮取 0 或 1；方向键等按钮绑定到半轴时 (dpup:-a1) 超过一半算按下。
+
+DB_FILE = "gamecontrollerdb.txt"
+CACHE_VERSION = 2
+
+# SDL 的控件名 -> 本项目 controller_map.json 中的名字
+SDL_NAMES = {
+    'a': 'A', 'b': 'B', 'x': 'X', 'y': 'Y',
+    'leftshoulder': 'LB', 'rightshoulder': 'RB', 'back': 'MENU', 'start': 'WIN',
+    'leftstick': 'LS', 'rightstick': 'RS',
+    'lefttrigger': 'lt', 'righttrigger': 'rt',
+    'leftx': 'lx', 'lefty': 'ly', 'rightx': 'rx', 'righty': 'ry',
+    'dpup': 'UP', 'dpdown': 'DOWN', 'dpleft': 'LEFT', 'dpright': 'RIGHT',
+}
+DPAD_NAMES = ('UP', 'DOWN', 'LEFT', 'RIGHT')
+
+SDL_PLATFORMS = {'linux': 'Linux', 'darwin': 'Mac OS X', 'win32': 'Windows'}
+
+
+def _parse_binding(text):
+    """
+    'b3' -> ('button', 3, '')；'a2' -> ('axis', 2, '')，'+a2' / '-a2' -> ('axis', 2, '+' / '-')，
+    'a2~' -> ('axis', 2, '~')，'-a2~' -> ('axis', 2, '-~')；'h0.4' -> ('hat', 0, '')。
+    """
+    half = text[0] if text[:1] in ('+', '-') else ''
+    invert = '~' if text.endswith('~') else ''
+    text = text[len(half):len(text) - len(invert)]
+    if not text:
+        return None
+    kind = {'b': 'button', 'a': 'axis', 'h': 'hat'}.get(text[0])
+    if kind is None or (kind != 'axis' and (half or invert)):
+        return None
+    try:
+        return kind, int(text[1:].split('.')[0]), half + invert
+    except ValueError:
+        return None
+
+
+def parse_db_line(line, platform=None):
+    """
+    解析一行 gamecontrollerdb，返回 (guid, 名称, 编译后的映射表)；
+    注释、空行、其他平台的条目返回 None。
+    编译后的映射表是 ((名字, 类型, 序号, 修饰符), ...) 元组，比字典更紧凑。
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    fields = line.split(',')
+    if len(fields) < 3:
+        return None
+    guid, name = fields[0].lower(), fields[1]
+    entries, hat = [], None
+    for field in fields[2:]:
+        key, _, value = field.partition(':')
+        if key == 'platform':
+            if platform and value != platform:
+                return None
+            continue
+        target = SDL_NAMES.get(key)
+        binding = _parse_binding(value) if target else None
+        if binding is None:
+            continue
+        if binding[0] == 'hat':
+            hat = binding[1]
+        else:
+            entries.append((target,) + binding)
+    if hat is not None:
+        entries = [entry for entry in entries if entry[0] not in DPAD_NAMES]
+        entries.append(('dpad', 'hat', hat, ''))
+    return guid, name, tuple(entries)
+
+
+def _expand(name, entries):
+    mapping = {'name': name}
+    for target, kind, index, modifier in entries:
+        mapping[target] = [kind, index, modifier] if modifier else [kind, index]
+    return mapping
+
+
+def guid_candidates(guid):
+    """
+    生成查找用的 GUID：原值；把 CRC 字段 (第 2-3 字节) 清零；再把版本字段 (第 12-13 字节) 清零。
+    新版 SDL 生成的 GUID 带有名称 CRC，而数据库中的条目通常不带。
+    """
+    guid = guid.lower()
+    yield guid
+    if len(guid) == 32:
+        without_crc = guid[:4] + '0000' + guid[8:]
+        yield without_crc
+        yield without_crc[:24] + '0000' + without_crc[28:]
+
+
+class ProfileStore:
+    """按 GUID 保存任意数量的手柄映射，查找为 O(1) 的字典访问。"""
+    def __init__(self):
+        self.profiles = {}   # guid -> (名称, 编译后的映射表)
+        self.custom = {}     # guid -> 用户自己用映射工具生成的映射（优先）
+
+    def __len__(self):
+        return len(self.profiles) + len(self.custom)
+
+    def add(self, guid, mapping):
+        """加入一个 controller_map.json 格式的映射。"""
+        self.custom[guid.lower()] = mapping
+
+    def lookup(self, guid):
+        """返回 GUID 对应的映射（controller_map.json 格式），找不到返回 None。"""
+        if not guid:
+            return None
+        for candidate in guid_candidates(guid):
+            mapping = self.custom.get(candidate)
+            if mapping is not None:
+                return mapping
+            profile = self.profiles.get(candidate)
+            if profile is not None:
+                return _expand(*profile)
+        return None
+
+    def load_db(self, path, cache_path=None, platform=None):
+        """导入 gamecontrollerdb.txt 格式的文件，返回导入的条目数。"""
+        platform = platform or SDL_PLATFORMS.get(sys.platform)
+        cache_path = cache_path or path + '.cache.json'
+        stat = os.stat(path)
+        key = [CACHE_VERSION, platform, stat.st_size, stat.st_mtime_ns]
+        try:
+            with open(cache_path, encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached['key'] == key:
+                profiles = {guid: (name, tuple(tuple(entry) for entry in entries))
+                            for guid, (name, entries) in cached['profiles'].items()}
+                self.profiles.update(profiles)
+                return len(profiles)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            pass   # 没有缓存或缓存损坏：重新解析
+
+        profiles = {}
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                parsed = parse_db_line(line, platform)
+                if parsed:
+                    profiles[parsed[0]] = parsed[1:]
+        try:
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                json.dump({'key': key, 'profiles': profiles}, f, ensure_ascii=False, separators=(',', ':'))
+        except OSError as e:
+            print(f"警告：无法写入配置缓存 '{cache_path}': {e}")
+        self.profiles.update(profiles)
+        return len(profiles)
+
+
+def load_profiles(custom_mapping=None, db_path=DB_FILE):
+    """建立配置库：gamecontrollerdb（如果存在）+ 用户映射（带 guid 时按 guid 登记）。"""
+    store = ProfileStore()
+    if os.path.exists(db_path):
+        count = store.load_db(db_path)
+        print(f"已从 '{db_path}' 载入 {count} 个手柄配置。")
+    if custom_mapping and custom_mapping.get('guid'):
+        store.add(custom_mapping['guid'], custom_mapping)
+    return store
+
+
+if __name__ == "__main__":
+    # 用法: python Profiles.py gamecontrollerdb.txt [GUID]
+    path = sys.argv[1] if len(sys.argv) > 1 else DB_FILE
+    t0 = time.perf_counter()
+    store = ProfileStore()
+    count = store.load_db(path)
+    print(f"载入 {count} 个配置，耗时 {(time.perf_counter() - t0) * 1e3:.1f} ms")
+    if len(sys.argv) > 2:
+        t0 = time.perf_counter()
+        mapping = store.lookup(sys.argv[2])
+        print(f"查找耗时 {(time.perf_counter() - t0) * 1e6:.1f} µs")
+        print(mapping if mapping else "未找到该 GUID。")
@@ -0,0 +1,284 @@
+import sys
+import json
+import time
+import argparse
+import itertools
+
+import numpy as np
+
+from Action import MouseMoveAction, ScrollAction, AnalogAsButtonScrollAction
+from Control import action_params
+from Layers import Layers
+from State import button_bit, mask_of
+from Simulation import AXES, _load_config
+
+# ==============================================================================
+# ======================== 离线批量回放：比较鼠标移动/滚动的参数 ================
+# ==============================================================================
+# 用法：
+#     python Replay.py 录制文件 --set sensitivity=10,15,20,25 --set deadzone=0.1,0.15
+#     python Replay.py 录制文件 --config s:build_action_config --config my_configs:fast --scale sensitivity=0.5,1,2
+# 录制文件可以是 Capture.py 的 HID 原始报文（s.py --backend hid --capture），也可以是
+# Simulation.py 的时间线（s.py --record）。输入按固定帧间隔重采样，与 Simulation.simulate
+# 的帧完全一致；每个配置中的 MouseMoveAction / ScrollAction / AnalogAsButtonScrollAction
+# 按与 Action.update 相同的规则（死区、曲线、每帧一次）一次性对所有配置、所有帧计算。
+# 其他 Action（组合键、手势等）不参与回放；Layers 只回放初始的那一层。
+#
+# --set 名称=值1,值2 把所有带该构造参数的 Action 改成各个取值，--scale 名称=倍数1,倍数2 按倍数
+# 修改；多个 --set / --scale 取笛卡尔积。
+#
+# 对每个配置报告：
+#     路径长度   每帧移动距离之和（像素）
+#     超调       每段移动（两段之间静止超过 SETTLE_TIME）中，光标越过最终停下位置的最远距离
+#     小幅移动   每帧移动距离的分布。pynput 在部分平台上按整数像素移动，不足 1 像素的移动
+#                会被截断，这里同时给出逐帧取整后终点的偏差
+#     滚动       各滚动 Action 的滚动量之和
+
+SETTLE_TIME = 0.25                    # 秒：两段移动之间静止超过这么久，视为两次独立的移动
+SMALL_MOVE_EDGES = (0.5, 1.0, 2.0, 5.0)
+BATCH = 16                            # 同时计算的配置数，限制 (配置数 x 帧数) 数组的大小
+TAIL = 1.0                            # 与 Simulation.simulate 相同：最后一个事件之后再回放 1 秒
+
+
+# ==============================================================================
+# ======================== 输入：重采样到固定帧间隔 ============================
+# ==============================================================================
+def _resample(event_t, columns, frame_interval, tail):
+    """按 Simulation.simulate 的规则取每帧时刻之前最后一个事件的值。"""
+    count = int((event_t[-1] - event_t[0] + tail) / frame_interval + 1e-9) + 1
+    frames = event_t[0] + np.arange(count) * frame_interval
+    index = np.searchsorted(event_t, frames, 'right') - 1
+    return frames, {name: values[index] for name, values in columns.items()}
+
+
+def load_frames(path, frame_interval=0.008, tail=TAIL):
+    """读取录制文件，返回 (各帧时刻, {'mask': ..., 'lx': ..., ...})。"""
+    import Capture
+    with open(path, 'rb') as f:
+        is_capture = f.read(len(Capture.MAGIC)) == Capture.MAGIC
+    if is_capture:
+        decoded = Capture.load_capture(path)[1]
+        if not len(decoded):
+            raise ValueError(f"{path} 中没有可解码的报文")
+        columns = {name: decoded[name].astype(np.float64) for name in AXES}
+        columns['mask'] = decoded['mask']
+        return _resample(decoded['t'], columns, frame_interval, tail)
+    from Simulation import load_timeline
+    timeline = load_timeline(path)
+    if not timeline:
+        raise ValueError(f"{path} 是空的时间线")
+    axes = dict.fromkeys(AXES, 0.0)
+    columns = {name: np.empty(len(timeline)) for name in AXES}
+    columns['mask'] = np.empty(len(timeline), np.uint64)
+    for i, event in enumerate(timeline):
+        for axis in AXES:
+            axes[axis] = event.get(axis, axes[axis])
+            columns[axis][i] = axes[axis]
+        columns['mask'][i] = mask_of(dict.fromkeys(event.get('buttons', ()), True))
+    return _resample(np.array([event['t'] for event in timeline]), columns, frame_interval, tail)
+
+
+# ==============================================================================
+# ======================== 配置：展开参数组合 ==================================
+# ==============================================================================
+def replay_actions(actions):
+    """取出参与回放的 Action；Layers 只取初始的那一层。"""
+    result = []
+    for action in actions:
+        if isinstance(action, Layers):
+            result.extend(replay_actions(action.plan))
+        elif isinstance(action, (MouseMoveAction, ScrollAction, AnalogAsButtonScrollAction)):
+            result.append(action)
+    return result
+
+
+def _parse_values(text):
+    values = []
+    for item in text.split(','):
+        try:
+            values.append(json.loads(item))
+        except ValueError:
+            values.append(item)
+    return values
+
+
+def _rebuild(action, changes):
+    """按构造函数参数重建 Action（与控制接口的 set 相同）；Layers 逐层重建其中的 Action。"""
+    if isinstance(action, Layers):
+        plans = {name: [_rebuild(inner, changes) for inner in plan] for name, plan in action.plans.items()}
+        return Layers(plans, initial=action.name, switch=action.switch, cycle=action.cycle)
+    params, complete = action_params(action)
+    update = {}
+    for param, scale, value in changes:
+        if param in params:
+            update[param] = params[param] * value if scale else value
+    if not update:
+        return action
+    if not complete:
+        raise ValueError(f"{type(action).__name__} 的参数无法完整读出，不能修改")
+    params.update(update)
+    return type(action)(**params)
+
+
+def expand(name, actions, settings):
+    """
+    settings 为 [(参数名, 是否为倍数, 取值列表)]，返回 [(名称, Action 列表)]，每个取值组合一个配置。
+    """
+    if not settings:
+        return [(name, actions)]
+    variants = []
+    for combination in itertools.product(*(values for _, _, values in settings)):
+        changes = [(param, scale, value) for (param, scale, _), value in zip(settings, combination)]
+        label = ' '.join(f"{param}{'*' if scale else ''}={value}" for param, scale, value in changes)
+        variants.append((f"{name} {label}", [_rebuild(action, changes) for action in actions]))
+    return variants
+
+
+# ==============================================================================
+# ======================== 向量化计算 ==========================================
+# ==============================================================================
+def _curve(values, deadzone, exponent, sensitivity):
+    """values (帧,) 与参数 (配置, 1) 广播为 (配置, 帧)：死区、保留符号的幂曲线、灵敏度。"""
+    magnitude = np.abs(values)
+    return np.where(magnitude < deadzone, 0.0, np.copysign(magnitude ** exponent, values) * sensitivity)
+
+
+def mouse_moves(configs, frames):
+    """返回每个配置每帧的鼠标移动 (dx, dy)，形状均为 (配置, 帧)。相同轴的 MouseMoveAction 一起计算。"""
+    count = len(next(iter(frames.values())))
+    dx, dy = np.zeros((len(configs), count)), np.zeros((len(configs), count))
+    groups = {}
+    for c, actions in enumerate(configs):
+        for action in actions:
+            if isinstance(action, MouseMoveAction):
+                groups.setdefault((action.x_axis, action.y_axis), []).append((c, action))
+    for (x_axis, y_axis), members in groups.items():
+        rows = np.array([c for c, _ in members])
+        params = [np.array([getattr(a, name) for _, a in members], float)[:, None] for name in ('deadzone', 'exponent', 'sensitivity')]
+        if len(set(rows.tolist())) == len(rows):
+            dx[rows] += _curve(frames[x_axis], *params)
+            dy[rows] -= _curve(frames[y_axis], *params)
+        else:   # 同一个配置里有两个使用相同轴的 MouseMoveAction
+            np.add.at(dx, rows, _curve(frames[x_axis], *params))
+            np.add.at(dy, rows, -_curve(frames[y_axis], *params))
+    return dx, dy
+
+
+def _runs(down):
+    """连续为 True 的区间 -> (起始帧, 帧数)。"""
+    edges = np.diff(down.astype(np.int8), prepend=0, append=0)
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    return starts, ends - starts
+
+
+def scroll_total(action, frames, frame_interval):
+    """
+    ScrollAction / AnalogAsButtonScrollAction 的总滚动量。按下的第一帧滚动一次，
+    之后第一次在 initial_delay 之后、再之后每隔 repeat_rate 滚动一次，都落在帧上：
+    长度为 n 帧的一次按下滚动 1 + [n-1 >= d] * (1 + (n-1-d) // r) 次。
+    """
+    if isinstance(action, ScrollAction):
+        down = (frames['mask'] & np.uint64(button_bit(action.controller_button))) != 0
+    else:
+        value = frames[action.axis_name]
+        down = value >= action.threshold if action.threshold >= 0 else value <= action.threshold
+    _, lengths = _runs(down)
+    d = max(0, int(np.ceil(action.initial_delay / frame_interval - 1e-9)))
+    r = max(1, int(np.ceil(action.repeat_rate / frame_interval - 1e-9)))
+    tail = lengths - 1 - d
+    scrolls = 1 + np.where(tail >= 0, 1 + np.maximum(tail, 0) // r, 0)
+    return int(scrolls.sum()) * action.scroll_speed
+
+
+def overshoot(dx, dy, t):
+    """
+    一个配置的超调统计：按静止超过 SETTLE_TIME 把移动分段，每段的方向为起点指向终点，
+    超调为光标在该方向上越过终点的最远距离。返回 (段数, 超调总和, 超调最大值, 有超调的段数)。
+    """
+    moving = np.flatnonzero((dx != 0) | (dy != 0))
+    if not len(moving):
+        return 0, 0.0, 0.0, 0
+    x, y = np.cumsum(dx), np.cumsum(dy)
+    starts = np.flatnonzero(np.diff(t[moving], prepend=-np.inf) > SETTLE_TIME)
+    ends = np.append(starts[1:], len(moving)) - 1
+    first, last = moving[starts], moving[ends]
+    sx, sy = x[first] - dx[first], y[first] - dy[first]
+    ex, ey = x[last], y[last]
+    length = np.hypot(ex - sx, ey - sy)
+    ux, uy = np.divide(ex - sx, length, out=np.zeros_like(length), where=length > 1.0), np.divide(ey - sy, length, out=np.zeros_like(length), where=length > 1.0)
+    segment = np.repeat(np.arange(len(starts)), ends - starts + 1)
+    beyond = (x[moving] - ex[segment]) * ux[segment] + (y[moving] - ey[segment]) * uy[segment]
+    amount = np.maximum(np.maximum.reduceat(beyond, starts), 0.0)
+    return len(starts), float(amount.sum()), float(amount.max()), int((amount > 1.0).sum())
+
+
+def replay(variants, t, frames, frame_interval):
+    """对所有配置计算统计，返回每个配置一个字典。"""
+    results = []
+    for offset in range(0, len(variants), BATCH):
+        batch = variants[offset:offset + BATCH]
+        configs = [replay_actions(actions) for _, actions in batch]
+        dx, dy = mouse_moves(configs, frames)
+        step = np.hypot(dx, dy)
+        moved = step > 0
+        small = np.stack([(moved & (step < edge)).sum(axis=1) for edge in SMALL_MOVE_EDGES])
+        rounded_error = np.hypot(dx.sum(axis=1) - np.round(dx).sum(axis=1), dy.sum(axis=1) - np.round(dy).sum(axis=1))
+        for i, (name, _) in enumerate(batch):
+            segments, total, largest, overshot = overshoot(dx[i], dy[i], t)
+            moves = int(moved[i].sum())
+            results.append({
+                'name': name, 'path': float(step[i].sum()),
+                'net': (float(dx[i].sum()), float(dy[i].sum())),
+                'moves': moves, 'small': [int(n) for n in small[:, i]],
+                'rounding_error': float(rounded_error[i]),
+                'segments': segments, 'overshoot': total, 'max_overshoot': largest, 'overshot': overshot,
+                'scroll': sum(scroll_total(action, frames, frame_interval) for action in configs[i]
+                              if not isinstance(action, MouseMoveAction)),
+            })
+    return results
+
+
+def print_results(results, frame_interval):
+    print(f"帧间隔 {frame_interval * 1000:g} ms；小幅移动为每帧移动距离小于各阈值的帧所占比例。")
+    header = "  ".join(f"<{edge:g}px" for edge in SMALL_MOVE_EDGES)
+    print(f"{'路径(px)':>10} {'移动帧':>7} {'超调 总/最大(px)':>16} {'超调段/总段':>10}  {header}  {'取整偏差':>8} {'滚动':>6}  配置")
+    for r in results:
+        moves = max(1, r['moves'])
+        shares = "  ".join(f"{n / moves:>5.1%}" for n in r['small'])
+        print(f"{r['path']:>10.0f} {r['moves']:>7} {r['overshoot']:>9.0f}/{r['max_overshoot']:<6.0f} "
+              f"{r['overshot']:>5}/{r['segments']:<5}  {shares}  {r['rounding_error']:>8.1f} {r['scroll']:>6}  {r['name']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线回放录制文件，一次比较多个配置的鼠标移动和滚动。")
+    parser.add_argument('recording', help="Capture.py 的 HID 报文录制文件，或 Simulation.py 的时间线 (JSON lines)")
+    parser.add_argument('--config', action='append', help="返回 Action 列表的函数，格式 模块:函数，可重复；默认 s:build_action_config")
+    parser.add_argument('--set', action='append', default=[], metavar='参数=值1,值2', help="把带该构造参数的 Action 改成各个取值")
+    parser.add_argument('--scale', action='append', default=[], metavar='参数=倍数1,倍数2', help="按倍数修改参数")
+    parser.add_argument('--frame-ms', type=float, default=8.0, help="帧间隔（毫秒），默认 8，与 Simulation.py 相同")
+    args = parser.parse_args()
+
+    settings = []
+    for text, scale in [(text, False) for text in args.set] + [(text, True) for text in args.scale]:
+        name, _, values = text.partition('=')
+        if not values:
+            parser.error(f"参数格式应为 名称=值1,值2: {text}")
+        settings.append((name, scale, _parse_values(values)))
+    frame_interval = args.frame_ms / 1000.0
+    try:
+        t, frames = load_frames(args.recording, frame_interval)
+        variants = []
+        for spec in args.config or ['s:build_action_config']:
+            variants.extend(expand(spec, _load_config(spec), settings))
+    except (OSError, ValueError) as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+    start = time.perf_counter()
+    results = replay(variants, t, frames, frame_interval)
+    elapsed = time.perf_counter() - start
+    print_results(results, frame_interval)
+    print(f"{len(variants)} 个配置 x {len(t)} 帧 ({t[-1] - t[0]:.0f} 秒)，计算耗时 {elapsed:.2f} 秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import sys
+import time
+import struct
+from multiprocessing import shared_memory
+
+# ==============================================================================
+# ======================== 共享内存发布最新状态（seqlock） =====================
+# ==============================================================================
+# 主循环把每帧解码出的状态写进一块共享内存，叠加层、日志等本机进程直接映射读取，
+# 不需要各自打开手柄，也不经过 socket。布局（小端，共 56 字节）：
+#     [0:4]   magic  b'XBST'
+#     [4:8]   version uint32  布局版本，布局变化时加一
+#     [8:16]  seq    uint64  写入中为奇数，写完为偶数；帧序号 = seq // 2
+#     [16:24] mask   uint64  按钮位掩码，位的含义见 State.BUTTON_NAMES
+#     [24:32] t      double  Clock.now() 时间戳
+#     [32:56] lx ly rx ry lt rt  6 x float32
+# 写入方（只有一个）：seq+1 -> 写数据 -> seq+1。读取方：读 seq，读数据，再读 seq，
+# 两次相同且为偶数才算一致的快照，否则重读。读取方从不加锁，也不会阻塞写入方。
+
+DEFAULT_NAME = "xbox_state"
+
+MAGIC, VERSION = b'XBST', 1
+HEADER = struct.Struct('<4sI')
+SEQ_OFFSET = HEADER.size
+SEQ = struct.Struct('<Q')
+DATA = struct.Struct('<QQd6f')   # 从 seq 开始的部分，这里把 seq 一起打包以便一次写完
+PAYLOAD = struct.Struct('<Qd6f')
+SIZE = SEQ_OFFSET + DATA.size
+MASK_LIMIT = (1 << 64) - 1
+
+
+def _compatible(shm):
+    """段的大小和头部的 magic / 版本是否与当前布局一致。"""
+    return shm.size >= SIZE and HEADER.unpack_from(shm.buf, 0) == (MAGIC, VERSION)
+
+
+class StatePublisher:
+    """在主循环中调用 publish(state)。每次只做三次 pack_into，不分配新的缓冲区。"""
+    def __init__(self, name=DEFAULT_NAME):
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=SIZE)
+        except FileExistsError:
+            # 上次异常退出留下的段：布局一致时直接复用，否则（旧版本或大小不符）删除后重建
+            self.shm = shared_memory.SharedMemory(name=name)
+            if not _compatible(self.shm):
+                print(f"共享内存 '{name}' 的大小或版本与当前布局不符，重新创建。")
+                self.shm.close()
+                self.shm.unlink()
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=SIZE)
+        self.buf = self.shm.buf
+        self.seq = 0
+        DATA.pack_into(self.buf, SEQ_OFFSET, 0, 0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+        HEADER.pack_into(self.buf, 0, MAGIC, VERSION)
+        print(f"状态已发布到共享内存 '{name}' ({SIZE} 字节)。")
+
+    def publish(self, state, timestamp):
+        buf = self.buf
+        self.seq += 1
+        SEQ.pack_into(buf, SEQ_OFFSET, self.seq)
+        PAYLOAD.pack_into(buf, SEQ_OFFSET + 8, state['mask'] & MASK_LIMIT, timestamp,
+                          state['lx'], state['ly'], state['rx'], state['ry'], state['lt'], state['rt'])
+        self.seq += 1
+        SEQ.pack_into(buf, SEQ_OFFSET, self.seq)
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _attach(name):
+    """映射已存在的段。只读方不应在退出时删除它，因此不交给 resource_tracker 管理。"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:   # Python < 3.13 没有 track 参数
+        shm = shared_memory.SharedMemory(name=name)
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class StateReader:
+    """读取一致的快照：(帧序号, mask, t, lx, ly, rx, ry, lt, rt)。"""
+    def __init__(self, name=DEFAULT_NAME):
+        self.shm = _attach(name)
+        if not _compatible(self.shm):
+            self.shm.close()
+            raise ValueError(f"共享内存 '{name}' 的大小或版本与当前布局不符")
+        self.buf = self.shm.buf
+
+    def sequence(self):
+        """当前帧序号（只读 8 字节），用于判断是否有新帧。"""
+        return SEQ.unpack_from(self.buf, SEQ_OFFSET)[0] >> 1
+
+    def read(self):
+        buf = self.buf
+        while True:
+            snapshot = DATA.unpack_from(buf, SEQ_OFFSET)
+            seq = snapshot[0]
+            if not seq & 1 and SEQ.unpack_from(buf, SEQ_OFFSET)[0] == seq:
+                return (seq >> 1,) + snapshot[1:]
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+
+
+if __name__ == "__main__":
+    # 用法: python SharedState.py [段名]   —— 一个最简单的读取方，打印变化的帧
+    from State import BUTTON_NAMES
+    reader = StateReader(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_NAME)
+    last = None
+    try:
+        while True:
+            seq = reader.sequence()
+            if seq != last:
+                last = seq
+                seq, mask, t, lx, ly, rx, ry, lt, rt = reader.read()
+                pressed = [BUTTON_NAMES[i] if i < len(BUTTON_NAMES) else f"bit{i}" for i in range(mask.bit_length()) if mask >> i & 1]
+                print(f"#{seq} t={t:.3f} L:({lx:.2f},{ly:.2f}) R:({rx:.2f},{ry:.2f}) LT:{lt:.2f} RT:{rt:.2f} B:{pressed}      ", end='\r')
+            time.sleep(0.01)
+    except KeyboardInterrupt:
+        print()
+    finally:
+        reader.close()
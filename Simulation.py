@@ -0,0 +1,194 @@
+import sys
+import json
+import time
+import argparse
+import importlib
+from collections import Counter
+from contextlib import contextmanager
+
+import Clock
+import History
+from State import mask_of
+
+# ==============================================================================
+# ======================== 虚拟时钟下的快进模拟 ================================
+# ==============================================================================
+# 时间线（timeline）是一串状态快照，每个快照一行 JSON：
+#     {"t": 12.5, "buttons": ["A", "LB"], "lx": 0.31, "ly": -0.02}
+# 缺省的轴沿用上一个快照的值。可以手写脚本，也可以用 `python s.py --record 文件` 录制。
+
+AXES = ('lx', 'ly', 'rx', 'ry', 'lt', 'rt')
+
+
+def _name(value):
+    return value if isinstance(value, str) else str(value)
+
+
+class RecordingMouse:
+    """代替 pynput 的鼠标，把每个输出记录为 (时间, 类型, 参数...)。"""
+    def __init__(self, outputs):
+        self.outputs = outputs
+
+    def move(self, dx, dy): self.outputs.append((Clock.now(), 'move', dx, dy))
+    def press(self, button): self.outputs.append((Clock.now(), 'press', _name(button)))
+    def release(self, button): self.outputs.append((Clock.now(), 'release', _name(button)))
+    def scroll(self, dx, dy): self.outputs.append((Clock.now(), 'scroll', dx, dy))
+
+
+class RecordingKeyboard:
+    """代替 pynput 的键盘，接口与 pynput.keyboard.Controller 相同。"""
+    def __init__(self, outputs):
+        self.outputs = outputs
+
+    def press(self, key): self.outputs.append((Clock.now(), 'key_press', _name(key)))
+    def release(self, key): self.outputs.append((Clock.now(), 'key_release', _name(key)))
+
+    def tap(self, key):
+        self.press(key)
+        self.release(key)
+
+    @contextmanager
+    def pressed(self, *keys):
+        for key in keys:
+            self.press(key)
+        try:
+            yield
+        finally:
+            for key in reversed(keys):
+                self.release(key)
+
+
+class TimelineRecorder:
+    """在实时主循环中录制时间线：只在状态变化时写一行。"""
+    def __init__(self, path):
+        self.file = open(path, 'w')
+        self.last = None
+
+    def record(self, state):
+        snapshot = (state['mask'],) + tuple(round(state[axis], 4) for axis in AXES)
+        if snapshot == self.last:
+            return
+        self.last = snapshot
+        line = {'t': round(Clock.now(), 6), 'buttons': sorted(name for name, is_on in state['buttons'].items() if is_on)}
+        line.update(zip(AXES, snapshot[1:]))
+        self.file.write(json.dumps(line) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+def load_timeline(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def simulate(actions, timeline, frame_interval=0.008, tail=1.0, stick_filter=None):
+    """
+    在虚拟时钟上按固定帧间隔驱动 actions，尽可能快地运行，返回记录下的输出列表。
+
+    每帧都像实时主循环一样：先执行到期的定时器，再用新的状态字典调用各个 Action。
+    当输入完全静止（没有按钮、所有轴为 0）且没有定时器时，直接跳到下一个事件，
+    因此长时间空闲的录制也能在很短时间内跑完。
+
+    stick_filter (Filter.py) 与实时解码阶段一样，在 Action 之前就地平滑各轴。
+    """
+    start = timeline[0]['t'] if timeline else 0.0
+    end = (timeline[-1]['t'] if timeline else 0.0) + tail
+    virtual_clock = Clock.VirtualClock(start)
+    old_clock = Clock.set_clock(virtual_clock)
+    old_scheduler, Clock.scheduler = Clock.scheduler, Clock.Scheduler()
+    old_history, History.history = History.history, History.InputHistory()
+
+    outputs = []
+    mouse, keyboard = RecordingMouse(outputs), RecordingKeyboard(outputs)
+    pressed, axes = (), dict.fromkeys(AXES, 0.0)
+    last_state = None
+    index, frame = 0, 0
+    try:
+        while True:
+            t = start + frame * frame_interval
+            if t > end:
+                break
+            virtual_clock.t = t
+            while index < len(timeline) and timeline[index]['t'] <= t:
+                event = timeline[index]
+                pressed = tuple(event.get('buttons', ()))
+                for axis in AXES:
+                    if axis in event:
+                        axes[axis] = event[axis]
+                index += 1
+            Clock.scheduler.run_due(t)
+
+            buttons = dict.fromkeys(pressed, True)
+            state = {'buttons': buttons, 'mask': mask_of(buttons)}
+            state.update(axes)
+            if stick_filter: stick_filter.apply(state, t)
+            History.history.record(state, t)
+            for action in actions:
+                action.update(state, last_state, mouse, keyboard)
+
+            # --- 空闲快进 ---
+            idle = not pressed and not any(state[axis] for axis in AXES) and not (last_state and last_state['mask']) and not state['mask']
+            last_state = state
+            frame += 1
+            if idle:
+                wake = timeline[index]['t'] if index < len(timeline) else end
+                deadline = Clock.scheduler.next_deadline()
+                if deadline is not None:
+                    wake = min(wake, deadline)
+                frame = max(frame, int((wake - start) / frame_interval))
+    finally:
+        Clock.set_clock(old_clock)
+        Clock.scheduler = old_scheduler
+        History.history = old_history
+    return outputs
+
+
+def _load_config(spec):
+    module_name, _, function_name = spec.partition(':')
+    return getattr(importlib.import_module(module_name), function_name or 'build_action_config')()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在虚拟时钟上快进回放时间线，记录并比较输出。")
+    parser.add_argument('timeline', help="时间线文件 (JSON lines)")
+    parser.add_argument('--config', default='s:build_action_config', help="返回 Action 列表的函数，格式 模块:函数")
+    parser.add_argument('--frame-ms', type=float, default=8.0, help="帧间隔（毫秒），默认 8")
+    parser.add_argument('--filter', help="摇杆平滑滤波器，例如 one-euro 或 exp:cutoff=5（见 Filter.py）")
+    parser.add_argument('--out', help="把输出写入此文件 (JSON lines)")
+    parser.add_argument('--expect', help="与此前保存的输出比较，不一致时返回非零")
+    args = parser.parse_args()
+
+    timeline = load_timeline(args.timeline)
+    actions = _load_config(args.config)
+    wall_start = time.perf_counter()
+    stick_filter = None
+    if args.filter:
+        from Filter import parse_filter
+        stick_filter = parse_filter(args.filter)
+    outputs = simulate(actions, timeline, frame_interval=args.frame_ms / 1000.0, stick_filter=stick_filter)
+    wall = time.perf_counter() - wall_start
+
+    span = (timeline[-1]['t'] - timeline[0]['t']) if timeline else 0.0
+    print(f"模拟时长 {span:.1f}s，耗时 {wall:.3f}s（{span / wall if wall else 0:.0f} 倍速）")
+    print("输出统计:", dict(Counter(item[1] for item in outputs)))
+
+    lines = [json.dumps([round(item[0], 6)] + list(item[1:])) for item in outputs]
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+    if args.expect:
+        with open(args.expect) as f:
+            expected = [line.rstrip('\n') for line in f if line.strip()]
+        for i, (got, want) in enumerate(zip(lines, expected)):
+            if got != want:
+                print(f"第 {i + 1} 个输出不一致:\n  期望 {want}\n  实际 {got}")
+                sys.exit(1)
+        if len(lines) != len(expected):
+            print(f"输出数量不一致: 期望 {len(expected)}，实际 {len(lines)}")
+            sys.exit(1)
+        print("输出与期望一致。")
+
+
+if __name__ == "__main__":
+    main()
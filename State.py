@@ -0,0 +1,153 @@
+import Clock
+from Calibration import axis_coefficients
+
+# ==============================================================================
+# ======================== 状态布局：按钮位掩码 ================================
+# ==============================================================================
+# 每个按钮名对应一个固定的位。控制器在 state["mask"] 中给出按下按钮的位掩码，
+# 这样组合键等逻辑只需对掩码做异或即可得到本帧变化的按钮。
+
+BUTTON_NAMES = ['A', 'B', 'X', 'Y', 'LB', 'RB', 'MENU', 'WIN', 'LS', 'RS', 'UP', 'DOWN', 'LEFT', 'RIGHT', 'A1', 'A2']
+BUTTON_BITS = {name: 1 << i for i, name in enumerate(BUTTON_NAMES)}
+
+
+def button_bit(name):
+    """返回按钮名对应的位。未知的名字（如虚拟按钮）在第一次使用时分配新位。"""
+    bit = BUTTON_BITS.get(name)
+    if bit is None:
+        BUTTON_NAMES.append(name)
+        bit = BUTTON_BITS[name] = 1 << (len(BUTTON_NAMES) - 1)
+    return bit
+
+
+def button_name(bit):
+    """button_bit 的逆运算，bit 必须是单个位。"""
+    return BUTTON_NAMES[bit.bit_length() - 1]
+
+
+def mask_of(buttons):
+    """由 {按钮名: 是否按下} 字典计算位掩码。"""
+    mask = 0
+    for name, is_on in buttons.items():
+        if is_on:
+            mask |= button_bit(name)
+    return mask
+
+
+# ==============================================================================
+# ======================== 预分配的双缓冲状态 ==================================
+# ==============================================================================
+
+AXES = ('lx', 'ly', 'rx', 'ry', 'lt', 'rt')
+DPAD = ('UP', 'DOWN', 'LEFT', 'RIGHT')
+
+
+def new_state(button_names=()):
+    """创建一个所有按钮松开、所有轴为 0 的状态字典。"""
+    state = {'buttons': dict.fromkeys(button_names, False), 'mask': 0}
+    state.update(dict.fromkeys(AXES, 0.0))
+    return state
+
+
+class JoystickDecoder:
+    """
+    把 pygame 手柄（或任何提供 get_button / get_axis / get_hat 的对象）解码进预分配的状态。
+
+    两个状态字典轮流写入（双缓冲）：本帧写入的字典不会覆盖上一帧的字典，
+    主循环保存的 last_state 因此一直有效。稳定运行时每帧不创建新的字典，
+    只是改写已有的键；Action 写入的虚拟按钮也会在下一次复用该字典时被清零。
+    """
+    def __init__(self, mapping):
+        controls = {k: v for k, v in mapping.items() if isinstance(v, (list, tuple))}
+        # 映射项为 [类型, 序号] 或 [类型, 序号, 修饰符]；修饰符 '~' 反转轴，'+' / '-' 只用轴的正 / 负半边
+        self.modifiers = {k: v[2] if len(v) > 2 else '' for k, v in controls.items()}
+        self.button_map = {v[1]: k for k, v in controls.items() if v[0] == 'button' and k not in AXES}
+        self.axis_map = {v[1]: k for k, v in controls.items() if v[0] == 'axis' and k in AXES}
+        # 扳机绑定到按钮 (lefttrigger:b6)：轴取 0 或 1；按钮绑定到轴 (dpup:-a1)：超过一半算按下
+        self.button_axes = [(v[1], k) for k, v in controls.items() if v[0] == 'button' and k in AXES]
+        self.axis_buttons = [(v[1], k) for k, v in controls.items() if v[0] == 'axis' and k not in AXES]
+        self.hat_index = mapping.get("dpad", (None, -1))[1]
+        self.calibration = mapping.get("calibration") or {}   # 映射工具写入的每轴校准数据
+        names = list(self.button_map.values()) + [k for _, k in self.axis_buttons] + (list(DPAD) if self.hat_index != -1 else [])
+        self.buffers = (new_state(names), new_state(names))
+        self.current = 0
+        self.button_table, self.axis_table, self.calibrated_table, self.use_hat = (), (), (), False
+        self.half_axis_table, self.button_axis_table, self.axis_button_table = (), (), ()
+        self.dpad_bits = tuple(button_bit(name) for name in DPAD)
+        self.filter = None   # Filter.py 的摇杆平滑滤波器，在解码的最后一步对各轴就地处理
+
+    def _half(self, name):
+        """半轴绑定取轴值的哪一边：1 正半边，-1 负半边（已计入反转），0 表示整个轴。"""
+        modifier = self.modifiers.get(name, '')
+        half = 1.0 if '+' in modifier else (-1.0 if '-' in modifier else 0.0)
+        return -half if '~' in modifier else half
+
+    def bind(self, joy):
+        """根据手柄实际的按钮/轴/方向键数量预先生成解码表。"""
+        num_buttons, num_axes = joy.get_numbuttons(), joy.get_numaxes()
+        self.button_table = tuple((i, name, button_bit(name)) for i, name in self.button_map.items() if i < num_buttons)
+        axes = [(i, name, self._half(name), -1.0 if '~' in self.modifiers[name] else 1.0)
+                for i, name in self.axis_map.items() if i < num_axes]
+        # (轴序号, 名字, 缩放, 偏移)：Y 轴取反使向上为正；扳机从 -1..1 变为 0..1
+        self.axis_table = tuple(
+            (i, name, invert * (-1.0 if name in ('ly', 'ry') else (0.5 if name in ('lt', 'rt') else 1.0)), 0.5 if name in ('lt', 'rt') else 0.0)
+            for i, name, half, invert in axes if not half and name not in self.calibration)
+        # 半轴 (轴序号, 名字, 半边, 缩放, 偏移)：轴值 * 半边 的正值部分 (0..1) 映射到扳机的 0..1 或摇杆的 -1..1
+        self.half_axis_table = tuple(
+            (i, name, half) + ((1.0, 0.0) if name in ('lt', 'rt') else ((-2.0, 1.0) if name in ('ly', 'ry') else (2.0, -1.0)))
+            for i, name, half, invert in axes if half)
+        # 有校准数据的轴：(轴序号, 名字, 符号, 中心, 死区, 负方向增益, 正方向增益)，系数在这里一次算好
+        self.calibrated_table = tuple(
+            (i, name, invert * (-1.0 if name in ('ly', 'ry') else 1.0)) + axis_coefficients(name, self.calibration[name])
+            for i, name, half, invert in axes if not half and name in self.calibration)
+        self.button_axis_table = tuple((i, name) for i, name in self.button_axes if i < num_buttons)
+        self.axis_button_table = tuple((i, name, button_bit(name), self._half(name) or 1.0)
+                                       for i, name in self.axis_buttons if i < num_axes)
+        self.use_hat = self.hat_index != -1 and joy.get_numhats() > self.hat_index
+
+    def decode(self, joy):
+        self.current ^= 1
+        state = self.buffers[self.current]
+        buttons = state['buttons']
+        for name in buttons:
+            buttons[name] = False
+
+        mask = 0
+        for index, name, bit in self.button_table:
+            if joy.get_button(index):
+                buttons[name] = True
+                mask |= bit
+
+        if self.use_hat:
+            hat_x, hat_y = joy.get_hat(self.hat_index)
+            up_bit, down_bit, left_bit, right_bit = self.dpad_bits
+            if hat_y == 1: buttons['UP'] = True; mask |= up_bit
+            elif hat_y == -1: buttons['DOWN'] = True; mask |= down_bit
+            if hat_x == -1: buttons['LEFT'] = True; mask |= left_bit
+            elif hat_x == 1: buttons['RIGHT'] = True; mask |= right_bit
+        for index, name, bit, half in self.axis_button_table:
+            if joy.get_axis(index) * half > 0.5:
+                buttons[name] = True
+                mask |= bit
+        state['mask'] = mask
+
+        for index, name, scale, offset in self.axis_table:
+            state[name] = joy.get_axis(index) * scale + offset
+        for index, name, half, scale, offset in self.half_axis_table:
+            v = joy.get_axis(index) * half
+            state[name] = (v if v > 0.0 else 0.0) * scale + offset
+        for index, name in self.button_axis_table:
+            state[name] = 1.0 if joy.get_button(index) else 0.0
+        for index, name, sign, center, deadzone, negative, positive in self.calibrated_table:
+            v = joy.get_axis(index) - center
+            if v > deadzone:
+                v = (v - deadzone) * positive
+                if v > 1.0: v = 1.0
+            elif v < -deadzone and negative:
+                v = (v + deadzone) * negative
+                if v < -1.0: v = -1.0
+            else:
+                v = 0.0
+            state[name] = v * sign
+        if self.filter: self.filter.apply(state, Clock.now())
+        return state
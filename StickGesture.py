@@ -0,0 +1,135 @@
+import math
+
+import Clock
+from Action import Action
+from State import button_bit
+
+# ==============================================================================
+# ======================== 摇杆手势：转圈滚动 / 快拨翻页 ========================
+# ==============================================================================
+# Action 只能看到当前帧和上一帧；这里为一个摇杆保存最近 window 个采样的环形缓冲区
+# （预分配的定长列表），角速度由缓冲区内角度增量与时间之和得出。每个采样加入时
+# 减去被挤出的那个、加上新的，每帧 O(1)，不构造任何列表。
+#
+# 转圈：摇杆推到 spin_radius 以外并持续转动，缓冲区内的平均角速度达到 min_spin_speed
+#       后开始计数（包括缓冲区里已经转过的角度），每转过 step_angle 滚动一次。
+#       逆时针向上滚，顺时针向下滚，通过 mouse.scroll 输出，与 ScrollAction 相同。
+# 快拨：摇杆从中间 (rest_radius 以内) 在 flick_time 内推到 flick_radius 以外，再在
+#       return_time 内回到中间，按推出的主要方向产生一帧的虚拟按钮脉冲，例如
+#       flick={'UP': 'FLICK_UP', 'DOWN': 'FLICK_DOWN'}，再用 KeyboardAction 绑定到翻页键。
+#       正在转圈时不识别快拨。
+#
+# 同一个摇杆上如果还有 MouseMoveAction，转圈时光标也会移动；建议放在不用该摇杆移动鼠标的层里。
+# 产生虚拟按钮时，本 Action 需要放在使用这些按钮的 Action 之前。
+
+TWO_PI = 2.0 * math.pi
+
+
+class StickGestureAction(Action):
+    def __init__(self, x_axis='rx', y_axis='ry', scroll_speed=1, step_angle=math.pi / 6, spin_radius=0.6,
+                 min_spin_speed=4.0, window=12, flick=None, rest_radius=0.25, flick_radius=0.9, flick_time=0.12, return_time=0.25):
+        self.x_axis, self.y_axis = x_axis, y_axis
+        self.scroll_speed, self.step_angle, self.spin_radius, self.min_spin_speed, self.window = scroll_speed, step_angle, spin_radius, min_spin_speed, window
+        self.flick = dict(flick or {})
+        self.flick_bits = {direction: button_bit(name) for direction, name in self.flick.items()}
+        self.rest_radius, self.flick_radius, self.flick_time, self.return_time = rest_radius, flick_radius, flick_time, return_time
+        # 环形缓冲区：每个采样相对上一个采样的角度增量和时间间隔
+        self.deltas = [0.0] * window
+        self.intervals = [0.0] * window
+        self.release(None, None)
+
+    def release(self, mouse, keyboard):
+        self.head = self.count = 0
+        self.sum_delta = self.sum_interval = 0.0
+        self.last_angle = self.last_t = None
+        self.spinning = False
+        self.turned = 0.0            # 开始转圈后累计、尚未换成滚动的角度
+        self.at_rest = False
+        self.leave_t = None          # 摇杆最近一次离开中间的时刻
+        self.flick_direction = None  # 已推出、等待回到中间的快拨方向
+        self.flick_t = 0.0
+
+    def sync(self, state):
+        self.release(None, None)
+
+    @property
+    def angular_velocity(self):
+        """缓冲区内的平均角速度 (弧度/秒，逆时针为正)；缓冲区未满时为 0。"""
+        if self.count < self.window or self.sum_interval <= 0:
+            return 0.0
+        return self.sum_delta / self.sum_interval
+
+    def _push(self, delta, interval):
+        head = self.head
+        if self.count == self.window:
+            self.sum_delta -= self.deltas[head]
+            self.sum_interval -= self.intervals[head]
+        else:
+            self.count += 1
+        self.deltas[head], self.intervals[head] = delta, interval
+        self.sum_delta += delta
+        self.sum_interval += interval
+        self.head = head + 1 if head + 1 < self.window else 0
+
+    def _reset_spin(self):
+        self.head = self.count = 0
+        self.sum_delta = self.sum_interval = 0.0
+        self.last_angle = None
+        self.spinning = False
+        self.turned = 0.0
+
+    def update(self, state, last_state, mouse, keyboard):
+        x, y = state[self.x_axis], state[self.y_axis]
+        t = Clock.now()
+        r = math.hypot(x, y)
+
+        # --- 转圈 ---
+        if r >= self.spin_radius:
+            angle = math.atan2(y, x)
+            if self.last_angle is not None and t > self.last_t:
+                delta = angle - self.last_angle
+                if delta > math.pi: delta -= TWO_PI
+                elif delta < -math.pi: delta += TWO_PI
+                self._push(delta, t - self.last_t)
+                speed = self.angular_velocity
+                if not self.spinning:
+                    if abs(speed) >= self.min_spin_speed:
+                        self.spinning = True
+                        self.turned = self.sum_delta   # 缓冲区里已经转过的角度也算
+                        self.flick_direction = None
+                elif abs(speed) < self.min_spin_speed:
+                    self._reset_spin()
+                else:
+                    self.turned += delta
+                if self.spinning:
+                    step = self.step_angle
+                    while self.turned >= step:
+                        self.turned -= step
+                        mouse.scroll(0, self.scroll_speed)
+                    while self.turned <= -step:
+                        self.turned += step
+                        mouse.scroll(0, -self.scroll_speed)
+            self.last_angle, self.last_t = angle, t
+        elif self.last_angle is not None:
+            self._reset_spin()
+
+        # --- 快拨 ---
+        if not self.flick:
+            return
+        if r <= self.rest_radius:
+            direction = self.flick_direction
+            if direction and t - self.flick_t <= self.return_time and direction in self.flick:
+                state['buttons'][self.flick[direction]] = True
+                state['mask'] |= self.flick_bits[direction]
+            self.flick_direction = None
+            self.at_rest = True
+            return
+        if self.at_rest:
+            self.at_rest = False
+            self.leave_t = t
+        if r >= self.flick_radius and self.flick_direction is None and not self.spinning and self.leave_t is not None:
+            if t - self.leave_t <= self.flick_time:
+                if abs(x) >= abs(y): self.flick_direction = 'RIGHT' if x > 0 else 'LEFT'
+                else: self.flick_direction = 'UP' if y > 0 else 'DOWN'
+                self.flick_t = t
+            self.leave_t = None   # 慢慢推出去的不算快拨，必须先回到中间
@@ -0,0 +1,229 @@
+import os
+import socket
+import struct
+from collections import deque
+
+from State import AXES
+
+# ==============================================================================
+# ======================== 本机 IPC：通过 UNIX socket 推送状态和按键事件 ========
+# ==============================================================================
+# 主循环每帧调用 StreamServer.publish(state, t)。服务器在同一线程里用非阻塞 socket
+# 完成 accept 和发送，任何订阅者都不会拖慢输入处理。
+#
+# 二进制帧格式（小端），第一个字节是消息类型：
+#   SNAPSHOT  <B I d Q 6f>   类型, 帧序号, 时间, 按钮位掩码, lx ly rx ry lt rt —— 订阅时发送一次
+#   EDGE      <B I d Q Q>    类型, 帧序号, 时间, 本帧按下的位, 本帧松开的位
+#   MOTION    <B I d B> + n*f  类型, 帧序号, 时间, 变化的轴 (位 i 对应 AXES[i]), 各轴新值 (float32)
+# MOTION 携带的是轴的新值而不是差值。订阅者来不及接收时，队列中尚未发送的 MOTION
+# 会被丢弃，由一条包含全部轴的 MOTION 代替；EDGE 永远不会被丢弃。
+
+SNAPSHOT, EDGE, MOTION = 0, 1, 2
+SNAPSHOT_FORMAT = struct.Struct('<BIdQ6f')
+EDGE_FORMAT = struct.Struct('<BIdQQ')
+MOTION_HEADER = struct.Struct('<BIdB')
+MOTION_VALUES = [struct.Struct(f'<{n}f') for n in range(len(AXES) + 1)]
+ALL_AXES = (1 << len(AXES)) - 1
+MASK_LIMIT = (1 << 64) - 1
+
+QUEUE_LIMIT = 256        # 每个订阅者最多排队的消息数，超过时丢弃运动消息
+EDGE_LIMIT = 4096        # 只剩按键事件仍然积压到这个数量时，认为订阅者已失去响应，断开它
+SEND_BATCH = 64          # 每次 sendmsg 最多合并的消息数
+
+
+def encode_motion(seq, t, bits, axes):
+    values = [axes[i] for i in range(len(AXES)) if bits >> i & 1]
+    return MOTION_HEADER.pack(MOTION, seq, t, bits) + MOTION_VALUES[len(values)].pack(*values)
+
+
+def decode_messages(data):
+    """
+    从接收缓冲区中解析出完整的消息，返回 (消息列表, 剩余的不完整数据)。消息为元组：
+        (SNAPSHOT, 帧序号, 时间, mask, (lx, ly, rx, ry, lt, rt))
+        (EDGE, 帧序号, 时间, pressed, released)
+        (MOTION, 帧序号, 时间, {轴名: 值})
+    """
+    messages, offset, size = [], 0, len(data)
+    while offset < size:
+        kind = data[offset]
+        if kind == SNAPSHOT:
+            if size - offset < SNAPSHOT_FORMAT.size: break
+            _, seq, t, mask, *axes = SNAPSHOT_FORMAT.unpack_from(data, offset)
+            messages.append((SNAPSHOT, seq, t, mask, tuple(axes)))
+            offset += SNAPSHOT_FORMAT.size
+        elif kind == EDGE:
+            if size - offset < EDGE_FORMAT.size: break
+            messages.append(EDGE_FORMAT.unpack_from(data, offset))
+            offset += EDGE_FORMAT.size
+        elif kind == MOTION:
+            if size - offset < MOTION_HEADER.size: break
+            _, seq, t, bits = MOTION_HEADER.unpack_from(data, offset)
+            names = [name for i, name in enumerate(AXES) if bits >> i & 1]
+            values = MOTION_VALUES[len(names)]
+            if size - offset < MOTION_HEADER.size + values.size: break
+            messages.append((MOTION, seq, t, dict(zip(names, values.unpack_from(data, offset + MOTION_HEADER.size)))))
+            offset += MOTION_HEADER.size + values.size
+        else:
+            raise ValueError(f"未知的消息类型 {kind}")
+    return messages, data[offset:]
+
+
+class Subscriber:
+    __slots__ = ('sock', 'queue', 'offset', 'motions', 'dropped')
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.queue = deque()   # (是否为运动消息, bytes)
+        self.offset = 0        # 队首消息已发送的字节数
+        self.motions = 0
+        self.dropped = 0
+
+
+class StreamServer:
+    def __init__(self, path, queue_limit=QUEUE_LIMIT, edge_limit=EDGE_LIMIT):
+        if os.path.exists(path):
+            os.unlink(path)
+        self.path = path
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(path)
+        self.listener.listen(64)
+        self.listener.setblocking(False)
+        self.queue_limit, self.edge_limit = queue_limit, edge_limit
+        self.subscribers = []
+        self.seq = 0
+        self.t = 0.0
+        self.mask = 0
+        self.axes = (0.0,) * len(AXES)
+        print(f"状态推送服务已启动: {path}")
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self.listener.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            sock.setblocking(False)
+            sub = Subscriber(sock)
+            sub.queue.append((False, SNAPSHOT_FORMAT.pack(SNAPSHOT, self.seq, self.t, self.mask, *self.axes)))
+            self.subscribers.append(sub)
+
+    def _enqueue(self, sub, data, full_motion):
+        if data is None:
+            return
+        is_motion = full_motion is not None
+        queue = sub.queue
+        if len(queue) >= self.queue_limit and is_motion and sub.motions:
+            # 订阅者跟不上：丢掉还没开始发送的运动消息，改发一条包含全部轴的
+            head = queue.popleft() if sub.offset else None
+            kept = deque(item for item in queue if not item[0])
+            sub.dropped += len(queue) - len(kept)
+            sub.motions = 0
+            if head:
+                kept.appendleft(head)
+                sub.motions = int(head[0])
+            sub.queue = queue = kept
+            data = full_motion
+        queue.append((is_motion, data))
+        sub.motions += is_motion
+
+    def _flush(self, sub):
+        """非阻塞地发送队列中的消息，返回 False 表示该订阅者已断开。"""
+        queue = sub.queue
+        while queue:
+            buffers = [memoryview(queue[0][1])[sub.offset:]]
+            for i in range(1, min(len(queue), SEND_BATCH)):
+                buffers.append(queue[i][1])
+            try:
+                sent = sub.sock.sendmsg(buffers)
+            except (BlockingIOError, InterruptedError):
+                return True
+            except OSError:
+                return False
+            sent += sub.offset
+            while queue and sent >= len(queue[0][1]):
+                is_motion, data = queue.popleft()
+                sent -= len(data)
+                sub.motions -= is_motion
+            sub.offset = sent
+            if sent:
+                return True   # 内核缓冲区已满
+        return True
+
+    def publish(self, state, t):
+        """每帧调用一次：接受新连接，生成本帧的按键事件和运动消息，批量发送给所有订阅者。"""
+        self._accept()
+        self.seq = seq = (self.seq + 1) & 0xFFFFFFFF
+        self.t = t
+        mask = state['mask'] & MASK_LIMIT
+        axes = (state['lx'], state['ly'], state['rx'], state['ry'], state['lt'], state['rt'])
+        edge = motion = full_motion = None
+        changed = mask ^ self.mask
+        if changed:
+            edge = EDGE_FORMAT.pack(EDGE, seq, t, changed & mask, changed & ~mask)
+            self.mask = mask
+        if axes != self.axes:
+            last = self.axes
+            bits = 0
+            for i in range(len(AXES)):
+                if axes[i] != last[i]:
+                    bits |= 1 << i
+            motion = encode_motion(seq, t, bits, axes)
+            full_motion = encode_motion(seq, t, ALL_AXES, axes) if bits != ALL_AXES else motion
+            self.axes = axes
+        if not self.subscribers:
+            return
+        if edge is None and motion is None and not any(sub.queue for sub in self.subscribers):
+            return
+        alive = []
+        for sub in self.subscribers:
+            self._enqueue(sub, edge, None)
+            self._enqueue(sub, motion, full_motion)
+            if len(sub.queue) > self.edge_limit:
+                print(f"\n订阅者积压了 {len(sub.queue)} 条按键事件，已断开。")
+                sub.sock.close()
+            elif self._flush(sub):
+                alive.append(sub)
+            else:
+                sub.sock.close()
+        self.subscribers = alive
+
+    def close(self):
+        for sub in self.subscribers:
+            sub.sock.close()
+        self.subscribers = []
+        self.listener.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+class StreamClient:
+    """订阅端：连接后用 messages() 逐条读取消息，并维护当前的 mask 和各轴数值。"""
+    def __init__(self, path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.buffer = b''
+        self.mask = 0
+        self.axes = dict.fromkeys(AXES, 0.0)
+
+    def messages(self, size=65536):
+        """阻塞读取，直到服务器关闭连接。"""
+        while True:
+            data = self.sock.recv(size)
+            if not data:
+                return
+            messages, self.buffer = decode_messages(self.buffer + data)
+            for message in messages:
+                kind = message[0]
+                if kind == SNAPSHOT:
+                    self.mask = message[3]
+                    self.axes.update(zip(AXES, message[4]))
+                elif kind == EDGE:
+                    self.mask = (self.mask | message[3]) & ~message[4]
+                else:
+                    self.axes.update(message[3])
+                yield message
+
+    def close(self):
+        self.sock.close()
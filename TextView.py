@@ -0,0 +1,76 @@
+import pygame
+
+# ==============================================================================
+# ======================== 带缓存、只重绘变化行的文字输出 ======================
+# ==============================================================================
+# 映射工具和手柄监视器共用。用法与原来的 TextPrint 相同（reset / tprint / indent /
+# unindent），只是 tprint 不再立即绘制，而是记录下这一帧要显示的行；flush() 与上一帧
+# 比较，只重绘内容变化的行，并返回需要交给 pygame.display.update() 的脏矩形。
+# 渲染出的文字 Surface 按文本缓存，同一行文字不会重复调用 font.render。
+# 每一行只占 y .. y + line_height 这一条带：字体比行高更高时（例如 Font(None, 25) 配
+# line_height=15）超出的部分被裁掉，擦除一行时不会碰到相邻的行。
+
+CACHE_LIMIT = 512
+
+
+class TextPrint:
+    def __init__(self, font, color, background, x=20, y=20, line_height=30, indent_width=20):
+        self.font, self.color, self.background = font, color, background
+        self.origin, self.line_height, self.indent_width = (x, y), line_height, indent_width
+        self.cache = {}     # 文本 -> Surface
+        self.shown = {}     # 行的 y 坐标 -> (x, 文本, 占用的矩形)
+        self.lines = []
+        self.full = True    # 下一次 flush 整屏重绘（第一帧或窗口被遮挡后）
+        self.reset()
+
+    def reset(self):
+        self.x, self.y = self.origin
+        self.lines = []
+
+    def tprint(self, screen, text):
+        self.lines.append((self.y, self.x, text))
+        self.y += self.line_height
+
+    def indent(self):
+        self.x += self.indent_width
+
+    def unindent(self):
+        self.x -= self.indent_width
+
+    def invalidate(self):
+        self.full = True
+
+    def _render(self, text):
+        surface = self.cache.get(text)
+        if surface is None:
+            if len(self.cache) >= CACHE_LIMIT:
+                self.cache.clear()   # 例如监视器中不断变化的轴数值，不让缓存无限增长
+            surface = self.cache[text] = self.font.render(text, True, self.color)
+        return surface
+
+    def flush(self, screen):
+        """绘制本帧与上一帧不同的行，返回脏矩形列表（没有变化时为空）。"""
+        dirty = []
+        if self.full:
+            screen.fill(self.background)
+            self.shown = {}
+            self.full = False
+            dirty.append(screen.get_rect())
+        current = {y: (x, text) for y, x, text in self.lines}
+        for y in set(self.shown) | set(current):
+            old, new = self.shown.get(y), current.get(y)
+            if old and new and old[:2] == new:
+                continue
+            rect = None
+            if old:
+                rect = old[2]
+                screen.fill(self.background, rect)
+                del self.shown[y]
+            if new:
+                x, text = new
+                surface = self._render(text)
+                area = screen.blit(surface, (x, y), pygame.Rect(0, 0, surface.get_width(), self.line_height))
+                self.shown[y] = (x, text, area)
+                rect = area.union(rect) if rect else area
+            dirty.append(rect)
+        return dirty
@@ -0,0 +1,146 @@
+import os
+import gc
+import sys
+import json
+import time
+import threading
+from collections import deque
+
+# ==============================================================================
+# ======================== 卡顿监视：记录慢帧的调用栈 ==========================
+# ==============================================================================
+# 偶发的 50–200 ms 卡顿（pynput 的 X11 往返、GC、设备读取）平时看不到。主循环每帧开始时
+# 调用 frame() 写一次心跳（只是几个属性赋值），各阶段之间把 stage 设为当前阶段的名字；
+# 后台线程每隔 budget / 4 检查一次，一帧超过 budget 时用 sys._current_frames() 取主线程
+# 此刻的调用栈；帧结束时主循环自己也比较一次耗时（不分配内存），超出预算的帧连同准确的
+# 耗时、所处阶段、其中 GC 的耗时一起交给后台线程写入日志。
+# 一帧超过 HANG_TIME 仍未结束时不再等待，先把已知的信息写下来（hung: true）。
+#
+# 日志为 JSON lines，超过 max_bytes 时轮换为 <path>.1（只保留一份），磁盘占用不超过
+# 2 * max_bytes。写入用令牌桶限速：最多连续写 burst 条，之后每秒恢复 refill 条；
+# 被丢弃的条数记在下一条写入的记录里 (suppressed)，持续卡顿时不会写满磁盘。
+#
+# stage 为 IDLE 时（等待手柄激活）不检查。
+
+HANG_TIME = 5.0
+IDLE = 'idle'
+STACK_LIMIT = 40
+SLOW_QUEUE = 64
+
+
+class StallWatchdog:
+    def __init__(self, path, budget=0.05, max_bytes=1 << 20, burst=10, refill=0.1, thread_id=None):
+        self.path, self.budget, self.max_bytes, self.burst, self.refill = path, budget, max_bytes, burst, refill
+        self.thread_id = thread_id or threading.main_thread().ident
+        # --- 主循环写、监视线程读 ---
+        self.seq = 0
+        self.started = time.monotonic()
+        self.stage = IDLE
+        self.gc_time = 0.0            # 本帧内主线程 GC 的总耗时
+        self.gc_started = 0.0
+        self.slow = deque(maxlen=SLOW_QUEUE)   # 主循环发现的慢帧 (序号, 阶段, 耗时, GC 耗时)
+        # --- 只由监视线程使用 ---
+        self.captured = {}            # 帧序号 -> 卡住时捕获的记录
+        self.tokens, self.token_time = float(burst), time.monotonic()
+        self.suppressed = 0
+        self.stalls = 0
+        self.closing = threading.Event()
+        gc.callbacks.append(self._on_gc)
+        self.thread = threading.Thread(target=self._run, name='watchdog', daemon=True)
+        self.thread.start()
+
+    # --------------------------------------------------------------------------
+    # 主循环侧
+    # --------------------------------------------------------------------------
+    def frame(self, stage='read'):
+        """每帧开始时调用，同时结束上一帧。"""
+        now = time.monotonic()
+        if now - self.started > self.budget and self.stage != IDLE:
+            self.slow.append((self.seq, self.stage, now - self.started, self.gc_time))
+        if self.gc_time: self.gc_time = 0.0
+        self.started = now
+        self.stage = stage
+        self.seq += 1
+
+    def _on_gc(self, phase, info):
+        if threading.get_ident() != self.thread_id:
+            return
+        if phase == 'start': self.gc_started = time.monotonic()
+        else: self.gc_time += time.monotonic() - self.gc_started
+
+    # --------------------------------------------------------------------------
+    # 监视线程侧
+    # --------------------------------------------------------------------------
+    def _run(self):
+        interval = max(0.005, self.budget / 4)
+        while not self.closing.wait(interval):
+            self._check()
+        self._check()
+
+    def _check(self):
+        seq, started, stage = self.seq, self.started, self.stage
+        # 已结束的慢帧：加上主循环测得的准确耗时后写出。GC 和不释放 GIL 的调用期间监视线程
+        # 无法运行，这类卡顿只有主循环在帧结束时才发现，记录中没有调用栈。
+        while self.slow:
+            slow_seq, slow_stage, duration, gc_time = self.slow.popleft()
+            record = self.captured.pop(slow_seq, None)
+            if record is None:
+                record = {'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'stage': slow_stage, 'stack': None}
+            record['duration_ms'] = round(duration * 1e3, 1)
+            record['gc_ms'] = round(gc_time * 1e3, 1)
+            record.pop('hung', None)
+            self._write(record)
+        for old in [s for s in self.captured if s < seq]:
+            del self.captured[old]   # 以 IDLE 结束的帧
+        elapsed = time.monotonic() - started
+        record = self.captured.get(seq)
+        if record is not None:
+            if elapsed > HANG_TIME and not record.get('hung'):
+                record['hung'] = True
+                self._write(dict(record, duration_ms=round(elapsed * 1e3, 1)))
+            return
+        if stage == IDLE or elapsed <= self.budget:
+            return
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None or seq != self.seq:
+            return   # 取栈之前这一帧刚好结束，由上面的慢帧队列记录
+        self.captured[seq] = {'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'stage': stage,
+                              'captured_ms': round(elapsed * 1e3, 1), 'stack': self._stack(frame)}
+        self.stalls += 1
+
+    def _stack(self, frame):
+        stack = []
+        while frame is not None and len(stack) < STACK_LIMIT:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{frame.f_lineno} {code.co_name}")
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def _write(self, record):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.token_time) * self.refill)
+        self.token_time = now
+        if self.tokens < 1:
+            self.suppressed += 1
+            return
+        self.tokens -= 1
+        record = {key: value for key, value in record.items() if key not in ('seq', 'started')}
+        if self.suppressed:
+            record['suppressed'] = self.suppressed
+            self.suppressed = 0
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) + len(line) > self.max_bytes:
+                os.replace(self.path, self.path + '.1')
+            with open(self.path, 'a') as f:
+                f.write(line)
+        except OSError as e:
+            print(f"\n卡顿日志写入失败: {e}")
+
+    def close(self):
+        self.frame(IDLE)   # 结束最后一帧
+        self.closing.set()
+        self.thread.join()
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
@@ -0,0 +1,1179 @@
+# ==============================================================================
+# ======================== 性能基准 ============================================
+# ==============================================================================
+# 用法: python bench.py <子命令> [参数]
+# 不需要真实手柄，也不需要 pygame / pynput：输入和输出都用假对象代替。
+
+import gc
+import os
+import math
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+from contextlib import contextmanager
+
+import Clock
+import History
+from State import JoystickDecoder, button_bit
+
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "controller_map.json")) as f:
+    MAPPING = json.load(f)
+
+
+class FakeJoystick:
+    """模拟 pygame 手柄：A 键和左摇杆保持按住/推动，其余静止。"""
+    def __init__(self, pressed=(0,), axes=None, hat=(0, 0)):
+        self.pressed = set(pressed)
+        self.axes = axes if axes is not None else {0: 0.5, 2: -1.0, 5: -1.0}
+        self.hat = hat
+
+    def get_numbuttons(self): return 11
+    def get_numaxes(self): return 6
+    def get_numhats(self): return 1
+    def get_button(self, i): return 1 if i in self.pressed else 0
+    def get_axis(self, i): return self.axes.get(i, 0.0)
+    def get_hat(self, i): return self.hat
+
+
+class NullOutput:
+    """什么也不做的鼠标/键盘。"""
+    def move(self, dx, dy): pass
+    def press(self, button): pass
+    def release(self, button): pass
+    def scroll(self, dx, dy): pass
+    def tap(self, key): pass
+
+    @contextmanager
+    def pressed(self, *keys):
+        yield
+
+
+def build_actions():
+    from Action import MouseMoveAction, ClickAction, ScrollAction, KeyboardAction, AnalogAsButtonScrollAction
+    from Chord import ChordAction
+    from Layers import Layers
+    layer = [
+        MouseMoveAction(x_axis='lx', y_axis='ly', sensitivity=25, deadzone=0.15), MouseMoveAction(x_axis='rx', y_axis='ry', sensitivity=15, deadzone=0.15),
+        ClickAction(controller_button='A', mouse_button='left'), ClickAction(controller_button='B', mouse_button='right'),
+        AnalogAsButtonScrollAction(axis_name='lt', threshold=0.01, scroll_speed=15, initial_delay=0.3, repeat_rate=0.05),
+        ScrollAction(controller_button='RB', scroll_speed=-15, initial_delay=0.3, repeat_rate=0.05),
+        KeyboardAction(controller_button='X', key='left', modifier='cmd'), KeyboardAction(controller_button='RS', key='w', modifier='cmd'),
+    ]
+    return [ChordAction(chords={'LAYER': ('LS', 'RS')}), Layers({'main': layer, 'other': layer[:2]}, cycle='LAYER')]
+
+
+def legacy_decode(joy, mapping):
+    """改动前 GenericController.read 的解码方式：每帧新建按钮字典、轴字典和状态字典。"""
+    button_map = {v[1]: k for k, v in mapping.items() if k != 'name' and v[0] == 'button'}
+    axis_map = {v[1]: k for k, v in mapping.items() if k != 'name' and v[0] == 'axis'}
+    bits = {i: button_bit(name) for i, name in button_map.items()}
+
+    def decode():
+        buttons = {name: False for name in button_map.values()}
+        mask = 0
+        for i in range(joy.get_numbuttons()):
+            if joy.get_button(i):
+                name = button_map.get(i)
+                if name: buttons[name] = True; mask |= bits[i]
+        hat = joy.get_hat(0)
+        buttons['UP'], buttons['DOWN'], buttons['LEFT'], buttons['RIGHT'] = (hat[1] == 1), (hat[1] == -1), (hat[0] == -1), (hat[0] == 1)
+        axes = {name: 0.0 for name in axis_map.values()}
+        for i in range(joy.get_numaxes()):
+            name = axis_map.get(i)
+            if name:
+                value = joy.get_axis(i)
+                if name in ['ly', 'ry']: value *= -1
+                axes[name] = value
+        return {"buttons": buttons, "mask": mask, "lt": (axes.get('lt', -1.0) + 1.0) / 2.0, "rt": (axes.get('rt', -1.0) + 1.0) / 2.0,
+                "lx": axes.get('lx', 0.0), "ly": axes.get('ly', 0.0), "rx": axes.get('rx', 0.0), "ry": axes.get('ry', 0.0)}
+    return decode
+
+
+def make_frame_loop(decode):
+    """返回一个跑 n 帧主循环（解码 + 定时器 + 所有 Action）的函数。"""
+    actions = build_actions()
+    output = NullOutput()
+    last = [None]
+
+    def run(frames):
+        last_state = last[0]
+        for _ in range(frames):
+            state = decode()
+            Clock.scheduler.run_due()
+            History.history.record(state, Clock.now())
+            for action in actions:
+                action.update(state, last_state, output, output)
+            last_state = state
+        last[0] = last_state
+    return run
+
+
+def measure_gc(run, frames):
+    """统计运行期间垃圾回收的次数与停顿时间。"""
+    pauses, started = [], [0.0]
+
+    def callback(phase, info):
+        if phase == 'start':
+            started[0] = time.perf_counter()
+        else:
+            pauses.append(time.perf_counter() - started[0])
+    gc.collect()
+    gc.callbacks.append(callback)
+    try:
+        t0 = time.perf_counter()
+        run(frames)
+        elapsed = time.perf_counter() - t0
+    finally:
+        gc.callbacks.remove(callback)
+    return elapsed, pauses
+
+
+# ==============================================================================
+# ======================== alloc: 稳定状态下每帧零净分配 ======================
+# ==============================================================================
+
+def bench_alloc(args):
+    joy = FakeJoystick()
+    decoder = JoystickDecoder(MAPPING)
+    decoder.bind(joy)
+    steady = make_frame_loop(lambda: decoder.decode(joy))
+    legacy = make_frame_loop(legacy_decode(joy, MAPPING))
+
+    # --- 1. tracemalloc：预热后运行 N 帧，已分配内存不应增长 ---
+    steady(1000)
+    tracemalloc.start()
+    steady(10)
+    before = tracemalloc.get_traced_memory()[0]
+    steady(args.frames)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    net = after - before
+    print(f"稳定状态 {args.frames} 帧的净分配: {net} 字节 ({net / args.frames:.3f} 字节/帧)")
+
+    # --- 2. 单帧内的临时分配峰值与 GC 停顿：改动前后的对比 ---
+    # 稳定循环里只剩 for 循环的迭代器这类临时对象，同一时刻存活的容器对象很少，
+    # 第 0 代计数不会涨到阈值，整段运行不应触发任何一次回收。
+    loops = (("改动前 (每帧新建字典)", legacy), ("双缓冲预分配", steady))
+    for label, run in loops:
+        run(1000)
+        tracemalloc.start()
+        run(1)
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        run(1)
+        transient = tracemalloc.get_traced_memory()[1] - base
+        tracemalloc.stop()
+        print(f"{label}: 单帧临时分配峰值 {transient} 字节")
+    collections = 0
+    for label, run in loops:
+        run(1000)
+        elapsed, pauses = measure_gc(run, args.gc_frames)
+        worst = max(pauses) * 1e6 if pauses else 0.0
+        collections = len(pauses)
+        print(f"{label}: {args.gc_frames} 帧耗时 {elapsed * 1e3:.1f} ms, GC {len(pauses)} 次, "
+              f"总停顿 {sum(pauses) * 1e3:.2f} ms, 最长 {worst:.0f} µs")
+
+    if net > 0 or collections:
+        print("失败：稳定状态下每帧仍有净分配或触发了垃圾回收。")
+        return 1
+    print("通过：稳定状态下每帧零净分配，零次垃圾回收。")
+    return 0
+
+
+# ==============================================================================
+# ======================== startup: 导入耗时 / 首个事件延迟 / 内存 ============
+# ==============================================================================
+
+STARTUP_CHILD = r"""
+import sys, time, json, resource
+t0 = time.perf_counter()
+sys.path.insert(0, {root!r})
+result = {{}}
+try:
+    if {eager!r}:
+        # 改动前的启动方式：一次性导入所有依赖并完整初始化 pygame
+        import pygame
+        from pynput.mouse import Button, Controller
+        from pynput.keyboard import Key, Controller
+        pygame.init()
+    sys.argv = ['s.py', '--backend', {backend!r}]
+    import s
+    result['import_ms'] = (time.perf_counter() - t0) * 1e3
+    controller = s.create_controller({backend!r}, {mapping!r})
+    result['init_ms'] = (time.perf_counter() - t0) * 1e3
+    deadline = time.perf_counter() + {timeout!r}
+    while time.perf_counter() < deadline:
+        if controller.read():
+            result['first_event_ms'] = (time.perf_counter() - t0) * 1e3
+            break
+        time.sleep(0.001)
+except Exception as e:
+    result['error'] = repr(e)
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+result['rss_mb'] = rss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+result['modules'] = len(sys.modules)
+print(json.dumps(result))
+"""
+
+
+def bench_startup(args):
+    import subprocess
+    root = os.path.dirname(os.path.abspath(__file__))
+    for label, eager in (("改动前 (全部预先导入 + pygame.init)", True), ("按需导入 + 仅初始化 joystick", False)):
+        code = STARTUP_CHILD.format(root=root, eager=eager, backend=args.backend, mapping=MAPPING, timeout=args.timeout)
+        samples = []
+        for _ in range(args.runs):
+            out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=root)
+            samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        best = min(samples, key=lambda r: r.get('import_ms', float('inf')))
+        print(f"{label}:")
+        for key, unit in (('import_ms', 'ms'), ('init_ms', 'ms'), ('first_event_ms', 'ms'), ('rss_mb', 'MB'), ('modules', '')):
+            if key in best:
+                print(f"  {key:15s} {best[key]:10.1f} {unit}")
+        if 'first_event_ms' not in best and 'error' not in best:
+            print(f"  first_event_ms  {args.timeout:.0f}s 内未收到手柄输入")
+        if 'error' in best:
+            print(f"  error           {best['error']}")
+    return 0
+
+
+# ==============================================================================
+# ======================== reconnect: 热插拔重连延迟 ===========================
+# ==============================================================================
+
+class FakeHidDevice:
+    """模拟 hidapi 设备：A 键一直按住；拔出后读取抛出 OSError，与真实设备一致。"""
+    REPORT = bytes([0, 0, 0, 0, 0x10] + [0] * 13)
+
+    def __init__(self, pad):
+        self.pad = pad
+
+    def get_manufacturer_string(self): return "Fake"
+    def get_product_string(self): return "HID pad"
+    def close(self): pass
+
+    def read(self, size, timeout_ms=0):
+        if not self.pad.present:
+            raise OSError("read error")
+        return self.REPORT
+
+
+def bench_reconnect(args):
+    import random
+    import threading
+    import statistics
+    from HidController import XboxController
+    from Hotplug import SimulatedUeventSource
+    from Action import ClickAction
+    from Simulation import RecordingMouse, RecordingKeyboard
+
+    class FakePad(XboxController):
+        present = True
+
+        def _open_device(self):
+            if not self.present:
+                raise OSError("no such device")
+            return FakeHidDevice(self), None
+
+        def _open_path(self, path):
+            if not self.present:
+                raise OSError("no such device")
+            return FakeHidDevice(self)
+
+    source = SimulatedUeventSource()
+    vid, pid = 0x045E, 0x0B12
+    pad = FakePad(vid, pid, monitor=source.monitor())
+    outputs = []
+    mouse, keyboard = RecordingMouse(outputs), RecordingKeyboard(outputs)
+    actions = [ClickAction(controller_button='A', mouse_button='left')]
+
+    loop = {'last_state': None, 'active': False}
+
+    def loop_until(done):
+        """与 s.py 主循环相同：读取 -> 定时器 -> Action；无状态时松开输出并等待。"""
+        while True:
+            state = pad.read()
+            Clock.scheduler.run_due()
+            if state:
+                loop['active'] = True
+                for action in actions:
+                    action.update(state, loop['last_state'], mouse, keyboard)
+                loop['last_state'] = state
+            else:
+                if loop['active']:
+                    loop['active'] = False
+                    for action in actions:
+                        action.release(mouse, keyboard)
+                    loop['last_state'] = None
+                pad.wait(0.1)
+            if done(state):
+                return
+
+    latencies, unreleased = [], 0
+    for _ in range(args.cycles):
+        loop_until(lambda state: state is not None)      # 按住 A
+        del outputs[:]
+        pad.present = False
+        source.inject('remove', vid, pid)
+        loop_until(lambda state: state is None)
+        if not any(item[1] == 'release' for item in outputs):
+            unreleased += 1
+
+        # 另一个线程在随机时刻插回设备；主循环此时正阻塞在 wait() 上
+        injected = []
+        def plug():
+            time.sleep(random.uniform(0.002, 0.02))
+            pad.present = True
+            injected.append(time.perf_counter())
+            source.inject('add', vid, pid)
+        thread = threading.Thread(target=plug)
+        thread.start()
+        loop_until(lambda state: state is not None)
+        latencies.append(time.perf_counter() - injected[0])
+        thread.join()
+    pad.close()
+    source.close()
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{args.cycles} 次拔插: 重连延迟 (uevent -> 第一帧状态) 中位数 {statistics.median(latencies) * 1e3:.2f} ms, "
+          f"p99 {p99 * 1e3:.2f} ms, 最大 {latencies[-1] * 1e3:.2f} ms")
+    if unreleased:
+        print(f"失败：{unreleased} 次断开后鼠标键没有被松开。")
+        return 1
+    print("通过：每次断开都松开了按住的鼠标键。")
+    return 0
+
+
+# ==============================================================================
+# ======================== probe: 并行探测设备，首个可用手柄的耗时 ============
+# ==============================================================================
+
+def bench_probe(args):
+    from Discovery import probe_parallel
+    # (名称, 响应耗时秒数, 是否是可用手柄)：模拟配对过的蓝牙耳机、键盘、不在附近的手柄等
+    devices = [("BT headset (out of range)", 5.0, False), ("BT keyboard", 0.6, False), ("old pad (asleep)", 2.5, True),
+               ("Xbox Wireless Controller", 0.15, True), ("BT mouse", 0.3, False), ("USB receiver", 0.05, False)]
+    devices = [(name, delay * args.scale, usable) for name, delay, usable in devices]
+
+    def probe(device):
+        name, delay, usable = device
+        time.sleep(delay)
+        if not usable:
+            raise OSError(f"{name}: not a game controller")
+        return name
+
+    t0 = time.perf_counter()
+    for device in devices:       # 改动前：逐个打开，没有超时
+        try:
+            name = probe(device)
+            break
+        except OSError:
+            pass
+    sequential = time.perf_counter() - t0
+    print(f"逐个探测: {sequential * 1e3:7.0f} ms -> {name}")
+
+    found = probe_parallel(devices, probe, timeout=args.timeout, workers=args.workers)
+    print(f"并行探测: {found[2] * 1e3:7.0f} ms -> {found[1]}")
+    cached = [device for device in devices if device[0] == "Xbox Wireless Controller"]
+    found = probe_parallel(cached, probe, timeout=args.timeout, workers=1)
+    print(f"先试上次的设备: {found[2] * 1e3:7.0f} ms -> {found[1]}")
+    return 0
+
+
+# ==============================================================================
+# ======================== shm: 共享内存发布的开销与快照一致性 ================
+# ==============================================================================
+
+SHM_READER_CHILD = r"""
+import sys, time, json
+sys.path.insert(0, {root!r})
+from SharedState import StateReader
+reader = StateReader({name!r})
+reads = torn = 0
+deadline = time.perf_counter() + {seconds!r}
+while time.perf_counter() < deadline:
+    seq, mask, t, lx, ly, rx, ry, lt, rt = reader.read()
+    reads += 1
+    # 写入方让所有字段都由同一个 k 决定；字段之间不一致说明读到了撕裂的快照
+    if not (mask == int(t) and lx == ly == rx == ry == lt == rt == float(mask % 4096)):
+        torn += 1
+reader.close()
+print(json.dumps({{'reads': reads, 'torn': torn}}))
+"""
+
+
+def bench_shm(args):
+    import subprocess
+    from SharedState import StatePublisher
+    name = f"xbox_bench_{os.getpid()}"
+    publisher = StatePublisher(name)
+    state = {'mask': 0, 'lx': 0.0, 'ly': 0.0, 'rx': 0.0, 'ry': 0.0, 'lt': 0.0, 'rt': 0.0}
+    try:
+        # --- 1. 主循环中每帧 publish 的耗时 ---
+        t0 = time.perf_counter()
+        for k in range(args.frames):
+            state['mask'] = k
+            publisher.publish(state, float(k))
+        per_call = (time.perf_counter() - t0) / args.frames
+        print(f"publish: {per_call * 1e6:.2f} µs/帧")
+        state['mask'] = 0
+        publisher.publish(state, 0.0)
+
+        # --- 2. 多个读取进程与写入方同时运行，检查快照是否一致 ---
+        root = os.path.dirname(os.path.abspath(__file__))
+        code = SHM_READER_CHILD.format(root=root, name=name, seconds=args.seconds)
+        readers = [subprocess.Popen([sys.executable, '-c', code], stdout=subprocess.PIPE, text=True) for _ in range(args.readers)]
+        time.sleep(0.2)   # 等读取进程启动
+        k = 0
+        while any(r.poll() is None for r in readers):
+            k += 1
+            value = float(k % 4096)
+            state['mask'] = k
+            state['lx'] = state['ly'] = state['rx'] = state['ry'] = state['lt'] = state['rt'] = value
+            publisher.publish(state, float(k))
+        results = [json.loads(r.communicate()[0].strip().splitlines()[-1]) for r in readers]
+    finally:
+        publisher.close()
+    reads, torn = sum(r['reads'] for r in results), sum(r['torn'] for r in results)
+    print(f"{args.readers} 个读取进程共 {reads} 次读取，写入 {k} 帧，不一致的快照 {torn} 次")
+    if torn:
+        print("失败：读到了不一致的快照。")
+        return 1
+    print("通过：所有快照都一致。")
+    return 0
+
+
+# ==============================================================================
+# ======================== stream: 50 个本机订阅者的负载测试 ==================
+# ==============================================================================
+
+STREAM_CLIENT_CHILD = r"""
+import sys, time, json, socket
+sys.path.insert(0, {root!r})
+from Stream import StreamClient, EDGE, MOTION
+client = StreamClient({path!r})
+if {slow!r}:
+    client.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+counts = {{EDGE: 0, MOTION: 0}}
+print('ready', flush=True)
+for message in client.messages(4096 if {slow!r} else 65536):
+    if message[0] in counts:
+        counts[message[0]] += 1
+    if {slow!r}:
+        time.sleep(0.005)
+print(json.dumps({{'edges': counts[EDGE], 'motions': counts[MOTION], 'mask': client.mask,
+                   'lx': client.axes['lx']}}))
+"""
+
+
+def bench_stream(args):
+    import math
+    import tempfile
+    import subprocess
+    from Stream import StreamServer
+    root = os.path.dirname(os.path.abspath(__file__))
+    path = os.path.join(tempfile.mkdtemp(), 'xbox.sock')
+    server = StreamServer(path)
+    children = []
+    for i in range(args.subscribers):
+        slow = i < args.slow
+        code = STREAM_CLIENT_CHILD.format(root=root, path=path, slow=slow)
+        children.append((slow, subprocess.Popen([sys.executable, '-c', code], stdout=subprocess.PIPE, text=True)))
+    state = {'buttons': {}, 'mask': 0, 'lx': 0.0, 'ly': 0.0, 'rx': 0.0, 'ry': 0.0, 'lt': 0.0, 'rt': 0.0}
+    for _, child in children:
+        child.stdout.readline()
+    while len(server.subscribers) < args.subscribers:
+        server.publish(state, 0.0)
+        time.sleep(0.001)
+
+    # --- 按 1 kHz 跑主循环：每帧摇杆都在动，每 10 帧 A 键切换一次 ---
+    timings, edges = [], 0
+    start = time.perf_counter()
+    for frame in range(args.frames):
+        state['lx'] = math.sin(frame * 0.01)
+        state['ry'] = math.cos(frame * 0.01)
+        if frame % 10 == 0:
+            state['mask'] ^= 1
+            edges += 1
+        t0 = time.perf_counter()
+        server.publish(state, t0)
+        timings.append(time.perf_counter() - t0)
+        delay = start + (frame + 1) * 0.001 - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    # 最后让慢速订阅者把积压的消息收完
+    deadline = time.perf_counter() + 30.0
+    while any(sub.queue for sub in server.subscribers) and time.perf_counter() < deadline:
+        server.publish(state, time.perf_counter())
+        time.sleep(0.001)
+    dropped = sum(sub.dropped for sub in server.subscribers)
+    connected = len(server.subscribers)
+    server.close()
+
+    timings.sort()
+    pct = lambda p: timings[min(len(timings) - 1, int(len(timings) * p))] * 1e6
+    print(f"{args.subscribers} 个订阅者（其中 {args.slow} 个慢速），{args.frames} 帧: publish 耗时 "
+          f"p50 {pct(0.5):.0f} µs, p99 {pct(0.99):.0f} µs, 最大 {timings[-1] * 1e6:.0f} µs")
+    lost_edges = 0
+    for label, want_slow in (("正常", False), ("慢速", True)):
+        results = [json.loads(child.communicate()[0].strip().splitlines()[-1]) for slow, child in children if slow == want_slow]
+        if not results:
+            continue
+        lost_edges += sum(1 for r in results if r['edges'] != edges or r['mask'] != state['mask'])
+        motions = sum(r['motions'] for r in results) / len(results)
+        print(f"  {label}订阅者: 平均收到运动消息 {motions:.0f} 条, 按键事件 {min(r['edges'] for r in results)}-{max(r['edges'] for r in results)} 条 (发送 {edges} 条)")
+    print(f"  丢弃（合并）的运动消息 {dropped} 条，结束时仍连接的订阅者 {connected} 个")
+    if lost_edges:
+        print(f"失败：{lost_edges} 个订阅者丢失了按键事件。")
+        return 1
+    print("通过：所有订阅者都收到了全部按键事件。")
+    return 0
+
+
+# ==============================================================================
+# ======================== udp: 回环网络 + 人为丢包/乱序 ======================
+# ==============================================================================
+
+class LossyLink:
+    """代替发送端的 socket：按概率丢弃数据报，或把它扣下几帧后再发出（乱序）。"""
+    def __init__(self, sock, loss, reorder, rng):
+        self.sock, self.loss, self.reorder, self.rng = sock, loss, reorder, rng
+        self.held = []   # (还要等待的帧数, 数据, 地址)
+        self.dropped = self.reordered = 0
+
+    def setblocking(self, flag): self.sock.setblocking(flag)
+    def close(self): self.sock.close()
+
+    def sendto(self, data, address):
+        if self.rng.random() < self.loss:
+            self.dropped += 1
+        elif self.rng.random() < self.reorder:
+            self.reordered += 1
+            self.held.append([self.rng.randint(1, 5), data, address])
+        else:
+            self.sock.sendto(data, address)
+
+    def tick(self):
+        for item in self.held:
+            item[0] -= 1
+            if item[0] <= 0:
+                self.sock.sendto(item[1], item[2])
+        self.held = [item for item in self.held if item[0] > 0]
+
+
+def bench_udp(args):
+    import random
+    import socket
+    from Network import UdpSender, UdpController, quantize
+    rng = random.Random(args.seed)
+    receiver_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver_sock.bind(('127.0.0.1', 0))
+    receiver = UdpController(sock=receiver_sock, timeout=10.0)
+    link = LossyLink(socket.socket(socket.AF_INET, socket.SOCK_DGRAM), args.loss, args.reorder, rng)
+    sender = UdpSender(receiver_sock.getsockname(), sock=link)
+
+    # 虚拟时钟驱动 1 kHz 的帧：摇杆缓慢移动并偶尔停住，按钮随机按下/松开
+    virtual_clock = Clock.VirtualClock(0.0)
+    old_clock = Clock.set_clock(virtual_clock)
+    state = {'buttons': {}, 'mask': 0, 'lx': 0.0, 'ly': 0.0, 'rx': 0.0, 'ry': 0.0, 'lt': 0.0, 'rt': 0.0}
+    mismatched = longest = run = 0
+    last_seq = None
+    try:
+        for frame in range(args.frames):
+            virtual_clock.t = frame * 0.001
+            if (frame // 500) % 2 == 0:
+                state['lx'] = max(-1.0, min(1.0, state['lx'] + rng.uniform(-0.02, 0.02)))
+                state['rt'] = max(0.0, min(1.0, state['rt'] + rng.uniform(-0.02, 0.02)))
+            if rng.random() < 0.01:
+                state['mask'] ^= 1 << rng.randrange(16)
+            sender.send(state, virtual_clock.t)
+            link.tick()
+            got = receiver.read()
+            if receiver.seq is not None:
+                if last_seq is not None and receiver.seq < last_seq:
+                    print("失败：接收端应用了更旧的数据报。")
+                    return 1
+                last_seq = receiver.seq
+            expected = (state['mask'], quantize(state['lx']), quantize(state['rt']))
+            actual = (got['mask'], quantize(got['lx']), quantize(got['rt'])) if got else None
+            if actual != expected:
+                mismatched += 1
+                run += 1
+                longest = max(longest, run)
+            else:
+                run = 0
+        # 停止变化后再跑一个关键帧间隔，接收端应当收敛到最终状态
+        for frame in range(args.frames, args.frames + 200):
+            virtual_clock.t = frame * 0.001
+            sender.send(state, virtual_clock.t)
+            link.tick()
+            got = receiver.read()
+    finally:
+        Clock.set_clock(old_clock)
+        sender.close()
+        receiver.close()
+
+    full = 10 + 8 + 12
+    print(f"{args.frames} 帧, 丢包 {args.loss:.0%} ({link.dropped} 个), 乱序 {args.reorder:.0%} ({link.reordered} 个)")
+    print(f"发送 {sender.sent_packets} 个数据报, 平均 {sender.sent_bytes / max(1, sender.sent_packets):.1f} 字节 (完整状态 {full} 字节)")
+    print(f"接收端: 收到 {receiver.received}, 丢弃旧数据报 {receiver.stale}, 缺少关键帧 {receiver.orphaned}")
+    print(f"与发送端不一致的帧 {mismatched} ({mismatched / args.frames:.1%}), 最长连续不一致 {longest} 帧")
+    final = got and (got['mask'], quantize(got['lx']), quantize(got['rt'])) == (state['mask'], quantize(state['lx']), quantize(state['rt']))
+    if not final:
+        print("失败：停止变化后接收端没有收敛到最终状态。")
+        return 1
+    print("通过：接收端收敛到了最终状态，且从未倒退到旧状态。")
+    return 0
+
+
+def bench_capture(args):
+    import io
+    import tempfile
+    import numpy as np
+    import Capture
+    from contextlib import redirect_stdout
+    # 合成一个 4 ms 一帧的录制文件：序号逐条加一，按比例丢掉/重复一些报文，
+    # 摇杆静止时带噪声和缓慢漂移，A 键定期按下并在一部分按下时抖动
+    rng = np.random.default_rng(args.seed)
+    count = args.size_mb * (1 << 20) // Capture.RECORD_SIZE
+    seq = np.arange(count, dtype=np.int64)
+    dropped = rng.random(count) < args.drop
+    seq = np.repeat(seq + np.cumsum(dropped), np.where(rng.random(count) < args.duplicate, 2, 1))[:count]
+    t = seq * 0.004 + rng.normal(0, 0.0002, count)
+    records = np.zeros(count, Capture.record_dtype(np))
+    records['t'] = np.sort(t)
+    records['size'] = 18
+    report = records['report']
+    report[:, 0] = 0x20
+    report[:, 2] = seq & 0xFF
+    press = (seq // 100) % 4 == 0
+    bounce = ((seq // 100) % 8 == 0) & (seq % 100 == 3)
+    report[:, 4] = np.where(press & ~bounce, 0x10, 0)
+    lx = (rng.normal(0, 40, count) + 300 * seq / count).astype(np.int16)
+    report[:, 10], report[:, 11] = lx.view(np.uint16) & 0xFF, lx.view(np.uint16) >> 8
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'capture.bin')
+        with open(path, 'wb') as f:
+            f.write(Capture.FILE_HEADER.pack(Capture.MAGIC, Capture.VERSION, Capture.REPORT_SIZE, 0x045E, 0x0B12, 0))
+            records.tofile(f)
+        del records, report, t, lx
+        size = os.path.getsize(path)
+        out = io.StringIO()
+        start = time.perf_counter()
+        with redirect_stdout(out):
+            decoded = Capture.analyze(path)
+        elapsed = time.perf_counter() - start
+    print(out.getvalue())
+    print(f"{size / (1 << 20):.0f} MB, {count} 条记录: 分析耗时 {elapsed:.2f} 秒 ({size / (1 << 20) / elapsed:.0f} MB/s)")
+    expected = int(np.diff(seq).clip(1).sum() - len(seq) + 1)
+    if f"丢失 {expected} 个" not in out.getvalue() or len(decoded) != count:
+        print(f"失败：应当报告丢失 {expected} 个报文。")
+        return 1
+    print("通过。")
+    return 0
+
+
+def bench_replay(args):
+    import random
+    import Replay
+    from Simulation import simulate
+    # 合成时间线：左摇杆做一段段的“移动-停下”，右摇杆小幅修正，LT 和 RB 偶尔按住
+    rng = random.Random(args.seed)
+    timeline, t = [], 0.0
+    while t < args.seconds:
+        angle, strength, duration = rng.uniform(0, 6.283), rng.uniform(0.2, 1.0), rng.uniform(0.1, 0.8)
+        for step in range(int(duration / 0.004)):
+            ramp = min(1.0, step * 0.004 / 0.1) * strength
+            timeline.append({'t': round(t, 6), 'buttons': ['RB'] if rng.random() < 0.002 or (timeline and timeline[-1]['buttons'] and rng.random() < 0.98) else [],
+                             'lx': round(ramp * math.cos(angle), 4), 'ly': round(ramp * math.sin(angle), 4),
+                             'rx': round(rng.gauss(0, 0.1), 4), 'ry': round(rng.gauss(0, 0.1), 4),
+                             'lt': 0.6 if (t % 7) < 0.5 else 0.0, 'rt': 0.0})
+            t += 0.004
+        timeline.append({'t': round(t, 6), 'buttons': [], 'lx': 0.0, 'ly': 0.0, 'rx': 0.0, 'ry': 0.0, 'lt': 0.0, 'rt': 0.0})
+        t += rng.uniform(0.3, 1.5)
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.bench_replay.jsonl')
+    with open(path, 'w') as f:
+        f.write('\n'.join(json.dumps(event) for event in timeline) + '\n')
+    try:
+        frame_interval = args.frame_ms / 1000.0
+        settings = [('sensitivity', False, [10, 15, 20, 25, 30, 40]), ('deadzone', False, [0.1, 0.15, 0.2]), ('exponent', False, [2, 3])]
+        variants = Replay.expand('bench', build_actions(), settings)
+        start = time.perf_counter()
+        t_frames, frames = Replay.load_frames(path, frame_interval)
+        loaded = time.perf_counter()
+        results = Replay.replay(variants, t_frames, frames, frame_interval)
+        vectorized = time.perf_counter() - start
+        print(f"时间线 {args.seconds:g} 秒, {len(t_frames)} 帧, {len(variants)} 个配置")
+        print(f"向量化回放: {vectorized:.2f} 秒 (其中读取时间线 {loaded - start:.2f} 秒)")
+
+        # 用逐帧的 Simulation.simulate 检查其中几个配置
+        checked = variants[::max(1, len(variants) // args.check)]
+        start = time.perf_counter()
+        failures = 0
+        for name, actions in checked:
+            outputs = simulate(actions, timeline, frame_interval=frame_interval)
+            per_frame = {}   # 同一帧里两个摇杆的移动合成一次
+            for o in outputs:
+                if o[1] == 'move':
+                    x, y = per_frame.get(o[0], (0.0, 0.0))
+                    per_frame[o[0]] = (x + o[2], y + o[3])
+            path_length = sum(math.hypot(x, y) for x, y in per_frame.values())
+            scroll = sum(o[3] for o in outputs if o[1] == 'scroll')
+            result = next(r for r in results if r['name'] == name)
+            if abs(path_length - result['path']) > 1e-6 * max(1.0, path_length) or scroll != result['scroll']:
+                print(f"不一致: {name}: 路径 {path_length:.3f} / {result['path']:.3f}, 滚动 {scroll} / {result['scroll']}")
+                failures += 1
+        scalar = (time.perf_counter() - start) / len(checked) * len(variants)
+        print(f"逐帧模拟 (按 {len(checked)} 个配置估算全部): {scalar:.2f} 秒, 向量化快 {scalar / vectorized:.0f} 倍")
+    finally:
+        os.unlink(path)
+    if failures:
+        print("失败：向量化回放与逐帧模拟的结果不一致。")
+        return 1
+    print("通过：路径长度和滚动量与逐帧模拟一致。")
+    return 0
+
+
+class AxisProbe:
+    """放在 Action 列表最后，记录每帧 Action 实际看到的轴值 (时间, 值)。"""
+    def __init__(self, axis, samples):
+        self.axis, self.samples = axis, samples
+
+    def update(self, state, last_state, mouse, keyboard):
+        self.samples.append((Clock.now(), state[self.axis]))
+
+    def release(self, mouse, keyboard): pass
+    def sync(self, state): pass
+
+
+def synthetic_worn_stick(seconds, rng):
+    """250 Hz 的时间线：磨损的左摇杆静止时停在死区边缘附近抖动，不时推到一个方向再松开。"""
+    timeline, t = [], 0.0
+    def rest(until):
+        nonlocal t
+        while t < until:
+            timeline.append({'t': round(t, 6), 'lx': round(0.15 + rng.gauss(0, 0.02), 4), 'ly': round(rng.gauss(0, 0.01), 4)})
+            t += 0.004
+    while t < seconds:
+        rest(t + rng.uniform(1.0, 2.0))
+        target, start, hold = rng.uniform(0.6, 1.0) * rng.choice((-1, 1)), t, rng.uniform(0.3, 1.0)
+        while t < start + 0.08 + hold + 0.05:
+            phase = t - start
+            level = min(1.0, phase / 0.08) if phase < 0.08 + hold else max(0.0, 1.0 - (phase - 0.08 - hold) / 0.05)
+            timeline.append({'t': round(t, 6), 'lx': round(0.15 + (target - 0.15) * level + rng.gauss(0, 0.005), 4), 'ly': 0.0})
+            t += 0.004
+    rest(t + 1.0)
+    return timeline
+
+
+def _crossings(samples, level):
+    """(时间, 值) 序列穿过 level 的时刻：[(时间, 是否向上)]。"""
+    result = []
+    for (t0, v0), (t1, v1) in zip(samples, samples[1:]):
+        if (v0 < level) != (v1 < level):
+            result.append((t1, v1 >= level))
+    return result
+
+
+def bench_filter(args):
+    import bisect
+    import random
+    from Action import MouseMoveAction
+    from Filter import parse_filter
+    from Simulation import simulate, load_timeline
+    timeline = load_timeline(args.timeline) if args.timeline else synthetic_worn_stick(args.seconds, random.Random(args.seed))
+    frame_interval = args.frame_ms / 1000.0
+    specs = [None] + args.filters
+    print(f"输入: {args.timeline or '合成的磨损摇杆'}，{timeline[-1]['t'] - timeline[0]['t']:.0f} 秒，帧间隔 {args.frame_ms:g} ms，"
+          f"MouseMoveAction 死区 {args.deadzone:g}")
+    print(f"{'滤波器':<26} {'理论延迟':>8} {'推动延迟 p50/p95':>16} {'松开延迟 p50/p95':>16} {'边缘速度标准差':>12} {'启停次数':>8} {'每帧开销':>8}")
+    baseline = None
+    for spec in specs:
+        stick_filter = parse_filter(spec) if spec else None
+        samples = []
+        actions = [MouseMoveAction('lx', 'ly', args.sensitivity, args.deadzone), AxisProbe('lx', samples)]
+        outputs = simulate(actions, timeline, frame_interval=frame_interval, stick_filter=stick_filter)
+        moves = {o[0]: (o[2], o[3]) for o in outputs if o[1] == 'move'}
+        if baseline is None:
+            baseline = samples   # 未滤波时 Action 看到的就是原始输入
+        # 端到端延迟：原始输入穿过 ±LEVEL 的时刻到 Action 看到的值穿过同一位置的时刻
+        delays = {True: [], False: []}
+        for level in (args.level, -args.level):
+            got = _crossings(samples, level)
+            got_times = [c[0] for c in got]
+            for t, rising in _crossings(baseline, level):
+                i = bisect.bisect_left(got_times, t)
+                while i < len(got) and got[i][1] != rising:
+                    i += 1
+                if i < len(got):
+                    delays[rising == (level > 0)].append(got[i][0] - t)
+        # 抖动：原始输入持续停在死区边缘附近 (±0.05) 时每帧光标移动距离的标准差（跳过每段开头
+        # 0.2 秒，不把滤波器在松开后的滞后算作抖动），以及整段输入中光标启停的次数
+        near = [abs(abs(raw) - args.deadzone) < 0.05 for _, raw in baseline]
+        steps, run = [], []
+        for (t, _), is_near in zip(baseline + [(None, 0.0)], near + [False]):
+            if is_near:
+                run.append(t)
+                continue
+            skip = int(0.2 / frame_interval)
+            steps.extend(math.hypot(*moves[t]) if t in moves else 0.0 for t in run[skip:])
+            run = []
+        mean = sum(steps) / max(1, len(steps))
+        edge = math.sqrt(sum((x - mean) ** 2 for x in steps) / max(1, len(steps)))
+        moving = [t in moves for t, _ in samples]
+        toggles = sum(1 for a, b in zip(moving, moving[1:]) if a != b)
+        cost = 0.0
+        if stick_filter:
+            state = {axis: 0.1 for axis in ('lx', 'ly', 'rx', 'ry', 'lt', 'rt')}
+            start = time.perf_counter()
+            for i in range(20000):
+                stick_filter.apply(state, i * 0.004)
+            cost = (time.perf_counter() - start) / 20000 * 1e6
+        def stats(values):
+            values = sorted(values)
+            return f"{values[len(values) // 2] * 1000:6.1f}/{values[int(len(values) * 0.95)] * 1000:<6.1f}" if values else f"{'-':>13}"
+        theory = f"{stick_filter.latency() * 1000:.0f} ms" if stick_filter else "-"
+        print(f"{spec or '无':<26} {theory:>8} {stats(delays[True]):>16} {stats(delays[False]):>16} {edge:>8.3f}px/帧 {toggles:>8} {cost:>6.2f}µs")
+    print(f"延迟为原始输入穿过 ±{args.level:g} 到 Action 看到滤波后的值穿过同一位置的时间 (ms)，包含帧量化。")
+    return 0
+
+
+# ==============================================================================
+# ======================== history: 输入历史的记录与查询开销 ==================
+# ==============================================================================
+
+def bench_history(args):
+    import random
+    rng = random.Random(args.seed)
+    inputs = [(1 if rng.random() < 0.3 else 0, rng.uniform(-1, 1)) for _ in range(1000)]
+    state = {'buttons': {}, 'mask': 0}
+    state.update(dict.fromkeys(('lx', 'ly', 'rx', 'ry', 'lt', 'rt'), 0.0))
+    print(f"{'缓冲区帧数':>10} {'记录/帧':>9} {'held_for':>9} {'presses':>9} {'peak':>9} {'peak(逐帧扫描)':>14} {'内存增长':>10}")
+    for size in args.sizes:
+        history = History.InputHistory(size)
+        t = 0.0
+        def feed(frames):
+            nonlocal t
+            for i in range(frames):
+                t += 0.004
+                state['mask'], state['lx'] = inputs[i % 1000]
+                history.record(state, t)
+        feed(size)
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        feed(args.frames)
+        record = (time.perf_counter() - start) / args.frames * 1e6
+        grown = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        window = size * 0.004 / 2   # 半个缓冲区
+        def timed(query, repeat=2000):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                query()
+            return (time.perf_counter() - start) / repeat * 1e6
+        held = timed(lambda: history.held_for('A'))
+        presses = timed(lambda: history.presses('A', window))
+        history.peak('lx', window)
+        peak = timed(lambda: history.peak('lx', window))
+        n, values = len(history), history.values['lx']
+        def scan():
+            first = history.total - n + history.index_at(history.now - window)
+            return max(abs(values[i % size]) for i in range(first, history.total))
+        naive = timed(scan, 20)
+        assert scan() == history.peak('lx', window)
+        print(f"{size:>10} {record:>7.2f}µs {held:>7.2f}µs {presses:>7.2f}µs {peak:>7.2f}µs {naive:>12.1f}µs {grown:>8} B")
+    print(f"每个缓冲区先填满，再记录 {args.frames} 帧；查询窗口为半个缓冲区。peak 在每帧查询时还要补上一帧 O(log N) 的线段树更新。")
+    return 0
+
+
+# ==============================================================================
+# ======================== autofire: 连发的频率与触发抖动 =====================
+# ==============================================================================
+
+class UpdateTimedTurbo:
+    """改动前的做法（与 ScrollAction 相同）：在 update 里比较时间，只有主循环调用 update 时才可能点击。"""
+    def __init__(self, controller_button, mouse_button, rate):
+        self.controller_button, self.mouse_button, self.period = controller_button, mouse_button, 1.0 / rate
+        self.next_time = None
+
+    def update(self, state, last_state, mouse, keyboard):
+        current_time = Clock.now()
+        if not state['buttons'].get(self.controller_button, False):
+            self.next_time = None
+        elif self.next_time is None or current_time >= self.next_time:
+            mouse.press(self.mouse_button); mouse.release(self.mouse_button)
+            self.next_time = current_time + self.period
+
+    def release(self, mouse, keyboard): pass
+
+
+def bench_autofire(args):
+    from Autofire import AutofireAction
+    from Simulation import RecordingMouse
+    state = {'buttons': {'A': True}, 'mask': button_bit('A')}
+    state.update(dict.fromkeys(('lx', 'ly', 'rx', 'ry', 'lt', 'rt'), 0.0))
+    report_interval = args.report_ms / 1000.0
+    print(f"按住 A {args.seconds:g} 秒，目标 {args.rate:g} 次/秒；手柄每 {args.report_ms:g} ms 才发一份报文")
+    print(f"{'主循环':<22} {'实现':<20} {'点击数':>6} {'实测频率':>10} {'间隔偏差 p50/p99/max':>22} {'触发延迟 p50/p99':>18}")
+    old_scheduler = Clock.scheduler
+    try:
+        for loop in ('poll', 'event'):
+            for label, make in (("update 比较时间", lambda: UpdateTimedTurbo('A', 'left', args.rate)),
+                                ("AutofireAction", lambda: AutofireAction('A', mouse_button='left', rate=args.rate))):
+                Clock.scheduler = Clock.Scheduler()
+                outputs = []
+                mouse = RecordingMouse(outputs)
+                action = make()
+                last_state = None
+                start = Clock.now()
+                end, next_report = start + args.seconds, start
+                while True:
+                    now = Clock.now()
+                    if now >= end:
+                        break
+                    report = now >= next_report
+                    if report:
+                        next_report += report_interval
+                    Clock.scheduler.run_due()
+                    if loop == 'poll' or report:
+                        action.update(state, last_state, mouse, None)
+                        last_state = state
+                    if loop == 'poll':
+                        time.sleep(0.001)   # 与 HID 后端 read 的 1 ms 超时相当
+                    else:
+                        deadline = Clock.scheduler.next_deadline()
+                        wake = next_report if deadline is None else min(next_report, deadline)
+                        time.sleep(max(0.0, wake - Clock.now()))
+                action.release(mouse, None)
+                presses = [o[0] for o in outputs if o[1] == 'press']
+                gaps = sorted(abs((b - a) - 1.0 / args.rate) * 1e3 for a, b in zip(presses, presses[1:]))
+                rate = (len(presses) - 1) / (presses[-1] - presses[0]) if len(presses) > 1 else 0.0
+                spread = f"{gaps[len(gaps) // 2]:.2f}/{gaps[int(len(gaps) * 0.99)]:.2f}/{gaps[-1]:.2f} ms" if gaps else "-"
+                stats = action.stats() if hasattr(action, 'stats') else {}
+                late = f"{stats['late_p50_ms']:.2f}/{stats['late_p99_ms']:.2f} ms" if 'late_p50_ms' in stats else "-"
+                loop_label = "轮询 (每轮 1 ms)" if loop == 'poll' else "事件驱动 (等报文或定时器)"
+                print(f"{loop_label:<22} {label:<20} {len(presses):>6} {rate:>8.2f}/s {spread:>22} {late:>18}")
+    finally:
+        Clock.scheduler = old_scheduler
+    print("间隔偏差为相邻两次点击的间隔与 1/rate 之差；触发延迟为定时器实际执行时刻与计划时刻之差。")
+    return 0
+
+
+# ==============================================================================
+# ======================== profiler: 采样分析器的开销 =========================
+# ==============================================================================
+
+def bench_profiler(args):
+    import signal
+    import tempfile
+    from Profiler import SamplingProfiler, install_signals
+    joy = FakeJoystick()
+    decoder = JoystickDecoder(MAPPING)
+    decoder.bind(joy)
+    run = make_frame_loop(lambda: decoder.decode(joy))
+    run(args.frames)
+    directory = tempfile.mkdtemp(prefix='profile-')
+    configs = (("未开启（已注册信号）", None), ("采样", False), ("采样 + tracemalloc", True))
+    profilers = [SamplingProfiler(directory, interval=args.interval / 1000.0, memory=bool(memory)) for _, memory in configs]
+    # 三种配置轮流测量、各取最好的一次，避免机器状态的漂移被算成开销
+    best, paths = [None] * len(configs), [None] * len(configs)
+    for _ in range(args.repeat):
+        for i, (_, memory) in enumerate(configs):
+            install_signals(profilers[i])
+            if memory is not None:
+                os.kill(os.getpid(), signal.SIGUSR1)   # 与线上一样用信号开启
+            start = time.perf_counter()
+            run(args.frames)
+            elapsed = (time.perf_counter() - start) / args.frames * 1e6
+            if memory is not None:
+                os.kill(os.getpid(), signal.SIGUSR2)
+                paths[i] = profilers[i].stop(wait=True) or profilers[i].last_paths
+            best[i] = elapsed if best[i] is None else min(best[i], elapsed)
+    print(f"{'配置':<28} {'每帧耗时':>10} {'相对未开启':>10}")
+    for (label, _), elapsed, written in zip(configs, best, paths):
+        print(f"{label:<28} {elapsed:>8.2f}µs {elapsed / best[0] - 1:>+9.1%}")
+        if written:
+            with open(written[0]) as f:
+                lines = f.readlines()
+            print(f"    {len(lines)} 个不同的栈，最多的一个: {lines[0].strip()[-90:]}")
+            for path in written:
+                print(f"    {path}")
+    signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+    signal.signal(signal.SIGUSR2, signal.SIG_DFL)
+    return 0
+
+
+# ==============================================================================
+# ======================== watchdog: 卡顿监视的开销与记录 =====================
+# ==============================================================================
+
+def slow_output_call(seconds):
+    """模拟一次很慢的输出调用（例如 pynput 的 X11 往返）。"""
+    time.sleep(seconds)
+
+
+def bench_watchdog(args):
+    import tempfile
+    from Watchdog import StallWatchdog
+    joy = FakeJoystick()
+    decoder = JoystickDecoder(MAPPING)
+    decoder.bind(joy)
+    run = make_frame_loop(lambda: decoder.decode(joy))
+    path = os.path.join(tempfile.mkdtemp(prefix='watchdog-'), 'stalls.jsonl')
+
+    # --- 1. 每帧心跳的开销 ---
+    watchdog = StallWatchdog(path, budget=args.budget_ms / 1000.0)
+    def with_heartbeat(frames):
+        for _ in range(frames):
+            watchdog.frame('read')
+            run(1)
+        watchdog.frame('idle')   # 停止心跳期间不算卡顿
+    def without(frames):
+        for _ in range(frames):
+            run(1)
+    for label, loop in (("无心跳", without), ("每帧心跳", with_heartbeat)) * 2:
+        start = time.perf_counter()
+        loop(args.frames)
+        print(f"{label}: {(time.perf_counter() - start) / args.frames * 1e6:.2f} µs/帧")
+
+    # --- 2. 注入卡顿：慢调用与正常帧混合，检查记录的阶段、耗时和调用栈 ---
+    stalls = [args.stall_ms / 1000.0 * (1 + i % 3) for i in range(args.stalls)]
+    for seconds in stalls:
+        watchdog.frame('actions')
+        slow_output_call(seconds)
+        watchdog.frame('read')
+        run(10)
+    watchdog.close()
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    print(f"注入 {len(stalls)} 次慢调用 ({args.stall_ms:g}–{args.stall_ms * 3:g} ms)，预算 {args.budget_ms:g} ms："
+          f"记录 {len(records)} 条，限速丢弃 {watchdog.suppressed + sum(r.get('suppressed', 0) for r in records)} 条")
+    for record in records[:3]:
+        print(f"    {record['stage']:<8} {record['duration_ms']:>7.1f} ms 栈顶: {record['stack'][-1]}")
+    errors = [abs(r['duration_ms'] - s * 1e3) for r, s in zip(records, stalls)]
+    print(f"记录的耗时与注入的卡顿之差：最大 {max(errors):.1f} ms")
+
+    # --- 3. GC 期间监视线程拿不到 GIL，只能由主循环在帧结束时发现 ---
+    os.remove(path)
+    watchdog = StallWatchdog(path, budget=args.budget_ms / 1000.0)
+    garbage = [[i] for i in range(3000000)]   # 让一次完整的 GC 足够慢
+    watchdog.frame('timers')
+    t0 = time.perf_counter()
+    gc.collect()
+    gc_ms = (time.perf_counter() - t0) * 1e3
+    watchdog.frame('read')
+    del garbage
+    watchdog.close()
+    with open(path) as f:
+        record = json.loads(f.readline())
+    print(f"一次 {gc_ms:.0f} ms 的 GC：记录为 {record['stage']} 阶段 {record['duration_ms']:.1f} ms，其中 GC {record['gc_ms']:.1f} ms")
+
+    # --- 3. 持续卡顿时的磁盘占用 ---
+    flood = StallWatchdog(path, budget=0.005, max_bytes=args.max_kb * 1024, burst=1000000, refill=1000000)
+    for _ in range(args.flood):
+        flood.frame('actions')
+        slow_output_call(0.012)
+    flood.frame('read')
+    time.sleep(0.02)
+    flood.close()
+    size = sum(os.path.getsize(p) for p in (path, path + '.1') if os.path.exists(p))
+    print(f"不限速时连续 {args.flood} 次卡顿：日志共 {size / 1024:.1f} KiB（上限 2 × {args.max_kb} KiB）")
+    return 0
+
+
+COMMANDS = {
+    'alloc': bench_alloc,
+    'startup': bench_startup,
+    'reconnect': bench_reconnect,
+    'probe': bench_probe,
+    'shm': bench_shm,
+    'stream': bench_stream,
+    'udp': bench_udp,
+    'capture': bench_capture,
+    'replay': bench_replay,
+    'filter': bench_filter,
+    'history': bench_history,
+    'autofire': bench_autofire,
+    'profiler': bench_profiler,
+    'watchdog': bench_watchdog,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="xbox 映射器性能基准")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('alloc', help="稳定状态帧循环的 tracemalloc 检查和 GC 停顿对比")
+    p.add_argument('--frames', type=int, default=10000)
+    p.add_argument('--gc-frames', type=int, default=200000)
+    p = sub.add_parser('startup', help="启动导入耗时、首个事件延迟和常驻内存 (RSS)")
+    p.add_argument('--backend', default='pygame', choices=('pygame', 'hid'))
+    p.add_argument('--runs', type=int, default=5, help="取导入最快的一次")
+    p.add_argument('--timeout', type=float, default=3.0, help="等待首个手柄事件的秒数")
+    p = sub.add_parser('reconnect', help="用模拟的 uevent 测量 HID 后端的热插拔重连延迟")
+    p.add_argument('--cycles', type=int, default=200)
+    p = sub.add_parser('probe', help="模拟多个响应慢的蓝牙设备，对比逐个探测与并行探测找到首个可用手柄的耗时")
+    p.add_argument('--scale', type=float, default=1.0, help="所有模拟设备响应耗时的倍数")
+    p.add_argument('--timeout', type=float, default=1.0, help="每个设备的探测超时（秒）")
+    p.add_argument('--workers', type=int, default=4)
+    p = sub.add_parser('shm', help="共享内存发布的每帧开销，以及多个读取进程下的快照一致性")
+    p.add_argument('--frames', type=int, default=200000)
+    p.add_argument('--readers', type=int, default=4)
+    p.add_argument('--seconds', type=float, default=2.0)
+    p = sub.add_parser('stream', help="UNIX socket 推送服务的负载测试：多个本机订阅者，其中一部分接收很慢")
+    p.add_argument('--subscribers', type=int, default=50)
+    p.add_argument('--slow', type=int, default=5, help="其中接收很慢的订阅者数量")
+    p.add_argument('--frames', type=int, default=3000)
+    p = sub.add_parser('udp', help="在回环网络上转发输入，人为注入丢包与乱序")
+    p.add_argument('--frames', type=int, default=20000)
+    p.add_argument('--loss', type=float, default=0.1)
+    p.add_argument('--reorder', type=float, default=0.05)
+    p.add_argument('--seed', type=int, default=1)
+    p = sub.add_parser('capture', help="合成一个 HID 原始报文录制文件，测量 Capture.py 批量分析的耗时（需要 numpy）")
+    p.add_argument('--size-mb', type=int, default=1024)
+    p.add_argument('--drop', type=float, default=0.001, help="丢失报文的比例")
+    p.add_argument('--duplicate', type=float, default=0.0005, help="重复报文的比例")
+    p.add_argument('--seed', type=int, default=1)
+    p = sub.add_parser('replay', help="Replay.py 向量化回放 36 个参数组合，与逐帧的 Simulation.simulate 比较结果和耗时（需要 numpy）")
+    p.add_argument('--seconds', type=float, default=600.0, help="合成时间线的长度")
+    p.add_argument('--frame-ms', type=float, default=8.0)
+    p.add_argument('--check', type=int, default=4, help="用逐帧模拟检查的配置数")
+    p.add_argument('--seed', type=int, default=1)
+    p = sub.add_parser('filter', help="摇杆平滑滤波器：在录制输入上比较滤波与不滤波的端到端延迟和死区边缘的光标抖动")
+    p.add_argument('--timeline', help="用 s.py --record 录制的时间线；默认合成一段磨损摇杆的输入")
+    p.add_argument('--filters', nargs='*', default=['exp', 'exp:cutoff=5', 'one-euro', 'one-euro:min_cutoff=1'])
+    p.add_argument('--seconds', type=float, default=120.0)
+    p.add_argument('--frame-ms', type=float, default=4.0)
+    p.add_argument('--sensitivity', type=float, default=25)
+    p.add_argument('--deadzone', type=float, default=0.15)
+    p.add_argument('--level', type=float, default=0.5, help="测量延迟时使用的轴位置")
+    p.add_argument('--seed', type=int, default=1)
+    p = sub.add_parser('history', help="History.py 输入历史：每帧记录开销、各种查询的耗时，以及长时间运行后的内存")
+    p.add_argument('--sizes', type=int, nargs='*', default=[256, 4096, 65536])
+    p.add_argument('--frames', type=int, default=200000)
+    p.add_argument('--seed', type=int, default=1)
+    p = sub.add_parser('autofire', help="连发：报文稀疏时，轮询与事件驱动的主循环下实测的点击频率和触发抖动")
+    p.add_argument('--rate', type=float, default=20.0)
+    p.add_argument('--seconds', type=float, default=5.0)
+    p.add_argument('--report-ms', type=float, default=100.0, help="手柄发送报文的间隔")
+    p = sub.add_parser('profiler', help="Profiler.py 采样分析器：未开启、采样、采样 + tracemalloc 时帧循环的开销，并写出一次结果")
+    p.add_argument('--frames', type=int, default=50000)
+    p.add_argument('--repeat', type=int, default=5)
+    p.add_argument('--interval', type=float, default=10.0, help="采样间隔 (ms)")
+    p = sub.add_parser('watchdog', help="Watchdog.py 卡顿监视：每帧心跳的开销、注入的慢调用和 GC 是否被记录，以及日志的磁盘上限")
+    p.add_argument('--frames', type=int, default=100000)
+    p.add_argument('--budget-ms', type=float, default=50.0)
+    p.add_argument('--stall-ms', type=float, default=60.0)
+    p.add_argument('--stalls', type=int, default=20)
+    p.add_argument('--flood', type=int, default=400)
+    p.add_argument('--max-kb', type=int, default=16)
+    args = parser.parse_args()
+    sys.exit(COMMANDS[args.command](args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,10 @@
-import hid
-import struct
 import time
 # [MODIFIED] Import keyboard controller and keys
 from pynput.mouse import Button, Controller as MouseController
 from pynput.keyboard import Key, Controller as KeyboardController
 
-# --- XboxController class remains unchanged ---
-class XboxController:
-    BUTTON_MAP = {0:"A1", 1:"A2", 2:"A3", 3:"A4", 4: "A", 5: "B", 6: "X", 7: "Y"}
-    BUTTON_MAP_2 = {0:"UP", 1:"DOWN", 2:"LEFT", 3:"RIGHT", 4: "LB", 5: "RB", 6: "LS", 7: "RS"}
-
-    def __init__(self, vendor_id=0x045E, product_id=0x0B12):
-        self.device = None
-        try:
-            self.device = hid.device()
-            self.device.open(vendor_id, product_id)
-            self.device.set_nonblocking(True)
-            print("Connected:", self.device.get_manufacturer_string(), self.device.get_product_string())
-        except OSError as e:
-            print(f"Error opening device: {e}")
-            self.device = None
-    #     self.connect_first_controller()
-
-    # def connect_first_controller(self):
-    #     devices = hid.enumerate()
-    #     controller = None
-
-    #     for d in devices:
-    #         usage = d.get("usage")
-    #         product = d.get("product_string") or ""
-    #         # 判断是否是手柄：usage=5 或者名字里包含 Controller/Gamepad
-    #         if ("Controller" in product or "Gamepad" in product):
-    #             controller = d
-    #             break
-    #     if controller:
-    #         try:
-    #             self.device = hid.device()
-    #             self.device.open(controller["vendor_id"], controller["product_id"])
-    #             self.device.set_nonblocking(True)
-    #             print("✅ Connected:",
-    #                   controller.get("manufacturer_string"),
-    #                   controller.get("product_string"))
-    #         except OSError as e:
-    #             print(f"❌ Error opening device: {e}")
-    #             self.device = None
-    #     else:
-    #         print("⚠️ 没有找到手柄设备")
-    #         self.device = None
-
-    def close(self):
-        if self.device: self.device.close()
-
-    def read(self):
-        if not self.device: return None
-        data = self.device.read(64, timeout_ms=1)
-        if not data or len(data) < 18: return None
-        raw = bytes(data)
-        buttons1_raw = raw[4]
-        buttons2_raw = raw[5]
-        lt, rt = struct.unpack_from("<HH", raw, 6)
-        lx, ly, rx, ry = struct.unpack_from("<hhhh", raw, 10)
-        buttons = self._decode_buttons(buttons1_raw, self.BUTTON_MAP)
-        buttons.update(self._decode_buttons(buttons2_raw, self.BUTTON_MAP_2))
-        return {"buttons": buttons, "lt": lt / 1023.0, "rt": rt / 1023.0, "lx": self._normalize_axis(lx), "ly": self._normalize_axis(ly), "rx": self._normalize_axis(rx), "ry": self._normalize_axis(ry)}
-
-    def _decode_buttons(self, bitmask, button_map):
-        return {name: bool(bitmask & (1 << bit)) for bit, name in button_map.items()}
-
-    def _normalize_axis(self, v):
-        v = int(v)
-        if v < 0: return max(-1.0, v / 32768.0)
-        else: return min(1.0, v / 32767.0)
+# --- 手柄读取与报文解码见 HidController.py（按 HID 报告描述符生成解码器）---
+from HidController import XboxController
 
 # ==============================================================================
 # ======================== ACTION HANDLING SYSTEM ==========================
@@ -187,7 +121,7 @@ if __name__ == "__main__":
     ]
 
     try:
-        xbox = XboxController()
+        xbox = XboxController(repeat_last=False)   # 每个 HID 报文只返回一次状态，下面的速度参数都按此调校
         if not xbox.device:
             raise OSError("Controller not found or could not be opened.")
         
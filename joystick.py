@@ -3,29 +3,8 @@ import pygame
 pygame.init()
 
 
-# This is a simple class that will help us print to the screen.
-# It has nothing to do with the joysticks, just outputting the
-# information.
-class TextPrint:
-    def __init__(self):
-        self.reset()
-        self.font = pygame.font.Font(None, 25)
-
-    def tprint(self, screen, text):
-        text_bitmap = self.font.render(text, True, (0, 0, 0))
-        screen.blit(text_bitmap, (self.x, self.y))
-        self.y += self.line_height
-
-    def reset(self):
-        self.x = 10
-        self.y = 10
-        self.line_height = 15
-
-    def indent(self):
-        self.x += 10
-
-    def unindent(self):
-        self.x -= 10
+# Caches rendered text and only redraws the lines whose values changed (see TextView.py).
+from TextView import TextPrint
 
 
 def main():
@@ -33,11 +12,8 @@ def main():
     screen = pygame.display.set_mode((500, 700))
     pygame.display.set_caption("Joystick example")
 
-    # Used to manage how fast the screen updates.
-    clock = pygame.time.Clock()
-
     # Get ready to print.
-    text_print = TextPrint()
+    text_print = TextPrint(pygame.font.Font(None, 25), (0, 0, 0), (255, 255, 255), x=10, y=10, line_height=15, indent_width=10)
 
     # This dict can be left as-is, since pygame will generate a
     # pygame.JOYDEVICEADDED event for every joystick connected
@@ -49,10 +25,15 @@ def main():
         # Event processing step.
         # Possible joystick events: JOYAXISMOTION, JOYBALLMOTION, JOYBUTTONDOWN,
         # JOYBUTTONUP, JOYHATMOTION, JOYDEVICEADDED, JOYDEVICEREMOVED
-        for event in pygame.event.get():
+        # Sleep until an event arrives; wake up once a second anyway so the
+        # power level stays current.
+        for event in [pygame.event.wait(1000)] + pygame.event.get():
             if event.type == pygame.QUIT:
                 done = True  # Flag that we are done so we exit this loop.
 
+            if event.type == pygame.VIDEOEXPOSE:
+                text_print.invalidate()
+
             if event.type == pygame.JOYBUTTONDOWN:
                 print("Joystick button pressed.")
                 if event.button == 0:
@@ -76,9 +57,7 @@ def main():
                 print(f"Joystick {event.instance_id} disconnected")
 
         # Drawing step
-        # First, clear the screen to white. Don't put other drawing commands
-        # above this, or they will be erased with this command.
-        screen.fill((255, 255, 255))
+        # Lines are collected here and only the ones that changed are redrawn below.
         text_print.reset()
 
         # Get count of joysticks.
@@ -137,11 +116,10 @@ def main():
 
             text_print.unindent()
 
-        # Go ahead and update the screen with what we've drawn.
-        pygame.display.flip()
-
-        # Limit to 30 frames per second.
-        clock.tick(30)
+        # Update only the parts of the screen that changed.
+        dirty = text_print.flush(screen)
+        if dirty:
+            pygame.display.update(dirty)
 
 
 if __name__ == "__main__":
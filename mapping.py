@@ -1,27 +1,8 @@
 import pygame
 import sys
 
-# This is a helper class from the second example to handle rendering text to the screen.
-class TextPrint:
-    def __init__(self):
-        self.reset()
-        self.font = pygame.font.SysFont(None, 28)
-
-    def tprint(self, screen, text):
-        text_bitmap = self.font.render(text, True, (255, 255, 255))
-        screen.blit(text_bitmap, (self.x, self.y))
-        self.y += self.line_height
-
-    def reset(self):
-        self.x = 20
-        self.y = 20
-        self.line_height = 30
-
-    def indent(self):
-        self.x += 20
-
-    def unindent(self):
-        self.x -= 20
+# Cached text rendering that only redraws changed lines (see TextView.py).
+from TextView import TextPrint
 
 
 def main():
@@ -29,8 +10,7 @@ def main():
 
     screen = pygame.display.set_mode((800, 400))
     pygame.display.set_caption("Gamepad Mapping Tool")
-    clock = pygame.time.Clock()
-    text_print = TextPrint()
+    text_print = TextPrint(pygame.font.SysFont(None, 28), (255, 255, 255), (30, 30, 30))
 
     # This dictionary will hold all connected joysticks, keyed by their instance_id.
     joysticks = {}
@@ -63,10 +43,14 @@ def main():
 
     while not done:
         # --- Event processing ---
-        for event in pygame.event.get():
+        # Block until something happens instead of redrawing at a fixed frame rate.
+        for event in [pygame.event.wait()] + pygame.event.get():
             if event.type == pygame.QUIT:
                 done = True
 
+            if event.type == pygame.VIDEOEXPOSE:
+                text_print.invalidate()
+
             # Handle hotplugging
             if event.type == pygame.JOYDEVICEADDED:
                 joy = pygame.joystick.Joystick(event.device_index)
@@ -127,7 +111,6 @@ def main():
                             task_i += 1
         
         # --- Drawing step ---
-        screen.fill((30, 30, 30))
         text_print.reset()
 
         if len(joysticks) == 0:
@@ -153,8 +136,9 @@ def main():
             text_print.tprint(screen, "You can now close this window.")
             done = True # Automatically mark as done to exit loop
 
-        pygame.display.flip()
-        clock.tick(30)
+        dirty = text_print.flush(screen)
+        if dirty:
+            pygame.display.update(dirty)
     
     # --- Print final results ---
     print("\n" + "="*25)
@@ -1,32 +1,39 @@
 # ==============================================================================
 # ======================= 交互式手柄映射工具=======================
 # ==============================================================================
-# 
-# import pygame, json
+# pygame 只在真正运行映射工具时才导入，s.py 正常模式下不会加载它。
+# 界面是事件驱动的：等待用户操作时阻塞在 pygame.event.wait() 上，只重绘变化的行（见 TextView.py）。
+import json
+import time
 
-MAPPING_FILE = "controller_map.json"
+from Calibration import Welford, axis_calibration
 
-class TextPrint:
-    def __init__(self): self.reset(); self.font = pygame.font.SysFont(None, 28); self.color = (230, 230, 230)
-    def tprint(self, screen, text): screen.blit(self.font.render(text, True, self.color), (self.x, self.y)); self.y += self.line_height
-    def reset(self): self.x = 20; self.y = 20; self.line_height = 30
-    def indent(self): self.x += 20
-    def unindent(self): self.x -= 20
+MAPPING_FILE = "controller_map.json"
+REST_SECONDS = 2.0   # 校准第一步：静止采样的时长
 
 def run_mapping_tool():
+    import pygame
+    from TextView import TextPrint
     pygame.init()
-    screen = pygame.display.set_mode((800, 600)); pygame.display.set_caption("手柄映射工具"); clock = pygame.time.Clock(); text_print = TextPrint()
+    screen = pygame.display.set_mode((800, 600)); pygame.display.set_caption("手柄映射工具"); clock = pygame.time.Clock()
+    text_print = TextPrint(pygame.font.SysFont(None, 28), (230, 230, 230), (30, 30, 30))
     joysticks = {}; tasks = [("A", "请按下 'A' 键"), ("B", "请按下 'B' 键"), ("X", "请按下 'X' 键"), ("Y", "请按下 'Y' 键"), ("LB", "请按下 '左肩键'"), ("RB", "请按下 '右肩键'"), ("MENU", "请按下 '菜单/Back' 键"), ("WIN", "请按下 '主页/Start' 键"), ("LS", "请按下 '左摇杆'"), ("RS", "请按下 '右摇杆'"), ("lt", "请扣下 '左扳机'"), ("rt", "请扣下 '右扳机'"), ("lx", "请左右移动 '左摇杆'"), ("ly", "请上下移动 '左摇杆'"), ("rx", "请左右移动 '右摇杆'"), ("ry", "请上下移动 '右摇杆'"), ("dpad", "请按下 '十字键'")]
     mapping = {}; task_i = 0; selected_joystick_id = None; done = False
+    # 校准阶段: None -> 'rest'（松开所有摇杆，测中心与噪声）-> 'range'（转动摇杆、按满扳机，按 A 结束）-> 'done'
+    calibration_phase = None; rest_stats = {}; range_stats = {}; rest_until = 0.0
     print("手柄映射工具已启动。请查看弹出的窗口并按提示操作。")
     while not done:
-        for event in pygame.event.get():
+        # 校准时需要持续采样，按 1 kHz 轮询；其余时间没有事件就一直阻塞，不占用 CPU
+        if calibration_phase in ('rest', 'range'): events = pygame.event.get(); clock.tick(1000)
+        else: events = [pygame.event.wait()] + pygame.event.get()
+        for event in events:
             if event.type == pygame.QUIT: done = True
+            if event.type == pygame.VIDEOEXPOSE: text_print.invalidate()
             if event.type == pygame.JOYDEVICEADDED: joy = pygame.joystick.Joystick(event.device_index); joysticks[joy.get_instance_id()] = joy; print(f"检测到手柄: {joy.get_name()}")
             if event.type == pygame.JOYDEVICEREMOVED: print(f"手柄 (ID: {event.instance_id}) 已断开"); del joysticks[event.instance_id];
             if selected_joystick_id is None and len(joysticks) > 0:
                 if (event.type == pygame.JOYBUTTONDOWN or (event.type == pygame.JOYAXISMOTION and abs(event.value) > 0.8) or (event.type == pygame.JOYHATMOTION and event.value != (0, 0))):
-                    selected_joystick_id = event.instance_id; mapping['name'] = joysticks[selected_joystick_id].get_name(); print(f"开始为手柄 '{mapping['name']}' 映射...")
+                    selected_joystick_id = event.instance_id; mapping['name'] = joysticks[selected_joystick_id].get_name(); mapping['guid'] = joysticks[selected_joystick_id].get_guid(); print(f"开始为手柄 '{mapping['name']}' 映射...")
                 continue
             if selected_joystick_id is not None and task_i < len(tasks):
                 if not hasattr(event, 'instance_id') or event.instance_id != selected_joystick_id: continue
@@ -35,12 +42,31 @@ def run_mapping_tool():
                 elif event.type == pygame.JOYAXISMOTION and abs(event.value) > 0.8: detected = ("axis", event.axis)
                 elif event.type == pygame.JOYHATMOTION and event.value != (0, 0): detected = ("hat", event.hat)
                 if detected and detected not in mapping.values(): mapping[key] = detected; print(f"  - 已映射 '{key}' -> {detected}"); task_i += 1
-        screen.fill((30, 30, 30)); text_print.reset()
+                if task_i == len(tasks) and calibration_phase is None:
+                    calibration_phase = 'rest'; rest_until = time.perf_counter() + REST_SECONDS
+                    axes = {k: v[1] for k, v in mapping.items() if isinstance(v, tuple) and v[0] == 'axis'}
+                    rest_stats = {k: Welford() for k in axes}; range_stats = {k: Welford() for k in axes}
+                    print("开始校准：请松开摇杆和扳机...")
+            elif calibration_phase == 'range' and event.type == pygame.JOYBUTTONDOWN and event.instance_id == selected_joystick_id and ("button", event.button) == mapping.get('A'):
+                calibration = {k: c for k in axes for c in [axis_calibration(k, rest_stats[k], range_stats[k])] if c}
+                if calibration: mapping['calibration'] = calibration
+                for k in axes: print(f"  - {k}: {calibration.get(k, '未校准（没有推到两端）')}")
+                calibration_phase = 'done'
+        # --- 校准：每轮循环对每个轴采样一次 ---
+        if calibration_phase in ('rest', 'range') and selected_joystick_id in joysticks:
+            joy = joysticks[selected_joystick_id]; stats = rest_stats if calibration_phase == 'rest' else range_stats
+            for k, index in axes.items(): stats[k].add(joy.get_axis(index))
+            if calibration_phase == 'rest' and time.perf_counter() >= rest_until: calibration_phase = 'range'; print("请转动两个摇杆并按满扳机，完成后按 A 键。")
+        text_print.reset()
         if len(joysticks) == 0: text_print.tprint(screen, "请连接一个手柄...")
         elif selected_joystick_id is None: text_print.tprint(screen, "请按您想映射的手柄上的任意按键来开始。")
         elif task_i < len(tasks): text_print.tprint(screen, f"正在映射: {mapping.get('name', '')}"); text_print.tprint(screen, "-"*40); text_print.tprint(screen, f"步骤 {task_i + 1}/{len(tasks)}:"); text_print.tprint(screen, f"--> {tasks[task_i][1]}")
+        elif calibration_phase == 'rest': text_print.tprint(screen, "校准 1/2:"); text_print.tprint(screen, "--> 请松开摇杆和扳机，保持不动...")
+        elif calibration_phase == 'range': text_print.tprint(screen, "校准 2/2:"); text_print.tprint(screen, "--> 请沿边缘转动两个摇杆几圈，并把两个扳机按到底"); text_print.tprint(screen, "--> 完成后按 'A' 键")
         else: text_print.tprint(screen, "映射完成!"); text_print.tprint(screen, f"将保存为 '{MAPPING_FILE}'。"); text_print.tprint(screen, "现在可以关闭此窗口。")
-    if len(mapping) > 1:
+        dirty = text_print.flush(screen)
+        if dirty: pygame.display.update(dirty)
+    if len(mapping) > 2:
         try:
             with open(MAPPING_FILE, 'w') as f: json.dump(mapping, f, indent=4)
             print(f"\n映射成功保存到 {MAPPING_FILE}")
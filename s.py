@@ -1,90 +1,228 @@
 # ==============================================================================
 # ======================== 依赖导入 ========================================
 # ==============================================================================
+# 启动时只导入标准库和本项目的轻量模块；pygame / hidapi / pynput 以及映射工具
+# 都在真正用到时才导入，由所选的后端 (--backend pygame|hid|udp) 决定。
 import os
 import sys
 import json
-import time
-import ctypes
 
 # --- 模式检测 ---
 IS_MAPPING_MODE = '--map' in sys.argv
 if not IS_MAPPING_MODE:
     os.environ["SDL_VIDEODRIVER"] = "dummy"
 
-import pygame
-from pynput.mouse import Button, Controller as MouseController
-from pynput.keyboard import Key, Controller as KeyboardController
+def get_option(name, default=None):
+    return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else default
+
+BACKEND = get_option('--backend', 'pygame')
 
-# ... (ctypes code)
-try:
-    if not IS_MAPPING_MODE:
-        ctypes.CDLL(None).SDL_EnableScreenSaver()
-except Exception:
-    pass
 
+def read_secret():
+    """--secret-file 指定的 UDP 转发共用密钥（两端相同），没有指定时为 None。"""
+    path = get_option('--secret-file')
+    if not path:
+        return None
+    with open(path, 'rb') as f:
+        secret = f.read().strip()
+    if not secret:
+        raise ValueError(f"密钥文件 '{path}' 是空的")
+    return secret
 
 
-from run_mapping_tool import run_mapping_tool, MAPPING_FILE
-from GenericController import GenericController
+from run_mapping_tool import MAPPING_FILE  # 该模块本身不导入 pygame
 from Action import *
+from Chord import ChordAction
+from Gesture import GestureAction
+from StickGesture import StickGestureAction
+from Autofire import AutofireAction
+from Layers import Layers
+import Clock
+import History
+from State import button_name
+
+
+def create_controller(backend, custom_mapping):
+    """按需导入并创建输入后端。"""
+    if backend == 'hid':
+        from HidController import XboxController
+        from Hotplug import UeventMonitor
+        return XboxController(monitor=UeventMonitor.open())
+    if backend == 'udp':
+        from Network import UdpController, parse_address
+        allow = get_option('--allow')
+        return UdpController(parse_address(get_option('--listen', '')), secret=read_secret(),
+                             allow=allow.split(',') if allow else None)
+    from GenericController import GenericController
+    from Profiles import load_profiles
+    controller = GenericController(custom_mapping, load_profiles(custom_mapping))
+    try:
+        import ctypes
+        ctypes.CDLL(None).SDL_EnableScreenSaver()
+    except Exception:
+        pass
+    return controller
 
 
 # ==============================================================================
 # ======================== 主程序与配置 (不变) =================================
 # ==============================================================================
-def main_controller_loop(custom_mapping):
+def build_action_config():
+    from pynput.mouse import Button
+    from pynput.keyboard import Key
+    # 映射带校准数据时，解码器已按每个轴实测的噪声扣除死区并重新缩放（见 Calibration.py），
+    # 这里只留一个很小的死区兜底未校准的手柄，不再在校准结果上再叠加一层大死区
+    STICK_DEADZONE = 0.03
+    BROWSER_LAYER = [
+        # 组合键/序列键需放在最前面，识别后产生虚拟按钮，例如：
+        # ChordAction(chords={'COPY': ('LB', 'A')}, sequences={'MACRO': ('UP', 'UP', 'A')}), KeyboardAction(controller_button='COPY', key='c', modifier=Key.cmd),
+        # 点按/长按/双击同样产生虚拟按钮，例如：
+        # GestureAction('Y', tap='Y_TAP', hold='Y_HOLD', double_tap='Y_DOUBLE', hold_time=0.5), KeyboardAction(controller_button='Y_DOUBLE', key=Key.f11),
+        # 右摇杆转圈滚动、快拨翻页（该层不要再用右摇杆移动鼠标），例如：
+        # StickGestureAction('rx', 'ry', scroll_speed=1, flick={'UP': 'FLICK_UP', 'DOWN': 'FLICK_DOWN'}), KeyboardAction(controller_button='FLICK_UP', key=Key.page_up), KeyboardAction(controller_button='FLICK_DOWN', key=Key.page_down),
+        # 按住手柄键时一直按住键盘键（由系统自己产生重复，代替多次点按），例如：
+        # KeyboardAction(controller_button='A2', key=Key.backspace, hold=True),
+        # 按住连发（每次点击由中央定时器触发），例如：
+        # AutofireAction(controller_button='A1', mouse_button=Button.left, rate=20),
+        MouseMoveAction(x_axis='lx', y_axis='ly', sensitivity=25, deadzone=STICK_DEADZONE), MouseMoveAction(x_axis='rx', y_axis='ry', sensitivity=15, deadzone=STICK_DEADZONE), ClickAction(controller_button='A', mouse_button=Button.left), ClickAction(controller_button='B', mouse_button=Button.right), AnalogAsButtonScrollAction(axis_name='lt', threshold=0.01, scroll_speed=15, initial_delay=0.3, repeat_rate=0.05), AnalogAsButtonScrollAction(axis_name='rt', threshold=0.01, scroll_speed=-15, initial_delay=0.3, repeat_rate=0.05), ScrollAction(controller_button='RB', scroll_speed=-15, initial_delay=0.3, repeat_rate=0.05), ScrollAction(controller_button='LB', scroll_speed=15, initial_delay=0.3, repeat_rate=0.05), ScrollAction(controller_button='UP', scroll_speed=1, initial_delay=0.4, repeat_rate=0.1), ScrollAction(controller_button='DOWN', scroll_speed=-1, initial_delay=0.4, repeat_rate=0.1), KeyboardAction(controller_button='X', key=Key.left, modifier=Key.cmd), KeyboardAction(controller_button='Y', key=Key.right, modifier=Key.cmd), KeyboardAction(controller_button='RIGHT', key=Key.tab), KeyboardAction(controller_button='LEFT', key=Key.tab, modifier=Key.shift), KeyboardAction(controller_button='WIN', key=Key.enter), KeyboardAction(controller_button='MENU', key='q', modifier=[Key.cmd, Key.ctrl]), KeyboardAction(controller_button='RS', key='w', modifier=Key.cmd),
+    ]
+    PRESENTATION_LAYER = [
+        MouseMoveAction(x_axis='lx', y_axis='ly', sensitivity=15, deadzone=STICK_DEADZONE), ClickAction(controller_button='A', mouse_button=Button.left), KeyboardAction(controller_button='RIGHT', key=Key.right), KeyboardAction(controller_button='LEFT', key=Key.left), KeyboardAction(controller_button='RB', key=Key.right), KeyboardAction(controller_button='LB', key=Key.left), KeyboardAction(controller_button='B', key='b'), KeyboardAction(controller_button='MENU', key=Key.esc),
+    ]
+    # 同时按下两个摇杆 (LS+RS) 在各层之间循环切换
     ACTION_CONFIG = [
-        MouseMoveAction(x_axis='lx', y_axis='ly', sensitivity=25, deadzone=0.15), MouseMoveAction(x_axis='rx', y_axis='ry', sensitivity=15, deadzone=0.15), ClickAction(controller_button='A', mouse_button=Button.left), ClickAction(controller_button='B', mouse_button=Button.right), AnalogAsButtonScrollAction(axis_name='lt', threshold=0.01, scroll_speed=15, initial_delay=0.3, repeat_rate=0.05), AnalogAsButtonScrollAction(axis_name='rt', threshold=0.01, scroll_speed=-15, initial_delay=0.3, repeat_rate=0.05), ScrollAction(controller_button='RB', scroll_speed=-15, initial_delay=0.3, repeat_rate=0.05), ScrollAction(controller_button='LB', scroll_speed=15, initial_delay=0.3, repeat_rate=0.05), ScrollAction(controller_button='UP', scroll_speed=1, initial_delay=0.4, repeat_rate=0.1), ScrollAction(controller_button='DOWN', scroll_speed=-1, initial_delay=0.4, repeat_rate=0.1), KeyboardAction(controller_button='X', key=Key.left, modifier=Key.cmd), KeyboardAction(controller_button='Y', key=Key.right, modifier=Key.cmd), KeyboardAction(controller_button='RIGHT', key=Key.tab), KeyboardAction(controller_button='LEFT', key=Key.tab, modifier=Key.shift), KeyboardAction(controller_button='WIN', key=Key.enter), KeyboardAction(controller_button='MENU', key='q', modifier=[Key.cmd, Key.ctrl]), KeyboardAction(controller_button='RS', key='w', modifier=Key.cmd),
+        ChordAction(chords={'LAYER': ('LS', 'RS')}), Layers({'browser': BROWSER_LAYER, 'presentation': PRESENTATION_LAYER}, cycle='LAYER'),
     ]
+    return ACTION_CONFIG
+
+PRESSED_TEXT = {}
+def pressed_text(mask):
+    """按位掩码缓存调试输出中的按钮列表，避免每次打印都重新排序生成列表。"""
+    text = PRESSED_TEXT.get(mask)
+    if text is None:
+        bits = [1 << i for i in range(mask.bit_length()) if mask >> i & 1]
+        text = PRESSED_TEXT[mask] = str(sorted(button_name(bit) for bit in bits))
+    return text
+
+def main_controller_loop(custom_mapping, record_path=None, shm_name=None, serve_path=None, send_address=None, control_path=None, capture_path=None, filter_spec=None, profile_dir='.', watchdog_path=None, budget_ms=50):
+    ACTION_CONFIG = build_action_config()
+    recorder = publisher = server = sender = control = watchdog = None
+    # 采样分析器：不开始采样时没有开销，运行中用 kill -USR1 / -USR2 开关
+    from Profiler import SamplingProfiler, install_signals
+    profiler = SamplingProfiler(profile_dir)
+    if install_signals(profiler):
+        print(f"采样分析: kill -USR1 {os.getpid()} 开始，kill -USR2 {os.getpid()} 停止并写出到 {profile_dir}")
+    if record_path:
+        from Simulation import TimelineRecorder
+        recorder = TimelineRecorder(record_path)
+    if shm_name:
+        from SharedState import StatePublisher
+        publisher = StatePublisher(shm_name)
+    if serve_path:
+        from Stream import StreamServer
+        server = StreamServer(serve_path)
+    if send_address:
+        from Network import UdpSender, parse_address
+        sender = UdpSender(parse_address(send_address), secret=read_secret())
+    if control_path:
+        from Control import ControlServer
+        control = ControlServer(control_path, ACTION_CONFIG, profiler)
+    if watchdog_path:
+        from Watchdog import StallWatchdog
+        watchdog = StallWatchdog(watchdog_path, budget=budget_ms / 1000.0)
+        print(f"卡顿监视: 超过 {budget_ms:g} ms 的帧记录到 {watchdog_path}")
+    stick_filter = None
+    if filter_spec:
+        from Filter import parse_filter
+        stick_filter = parse_filter(filter_spec)
     controller = None
     try:
-        controller = GenericController(custom_mapping)
+        controller = create_controller(BACKEND, custom_mapping)
+        if capture_path:
+            if not hasattr(controller, 'set_capture'):
+                raise ValueError("--capture 只支持 --backend hid")
+            from Capture import ReportCapture
+            controller.set_capture(ReportCapture(capture_path))
+        if stick_filter:
+            controller.filter = stick_filter
+            print(f"摇杆平滑: {filter_spec}，静止时增加约 {stick_filter.latency() * 1000:.0f} ms 延迟")
+        from pynput.mouse import Controller as MouseController
+        from pynput.keyboard import Controller as KeyboardController
         mouse = MouseController(); keyboard = KeyboardController()
         last_state = None; last_print_time = 0; is_active = False
         print("请按手柄上的任意键来激活控制...")
 
         while True:
+            if watchdog: watchdog.frame('read')
             state = controller.read()
+            if watchdog: watchdog.stage = 'timers'
+            Clock.scheduler.run_due()
+            if control and control.pending: control.apply(last_state, mouse, keyboard)
             if state:
                 if not is_active:
                     is_active = True
                     print("手柄控制已激活。按 Ctrl+C 退出。")
                     print("-" * 50)
                 
-                for action in ACTION_CONFIG:
-                    action.update(state, last_state, mouse, keyboard)
+                if watchdog: watchdog.stage = 'publish'
+                if recorder: recorder.record(state)
+                if publisher: publisher.publish(state, Clock.now())
+                if server: server.publish(state, Clock.now())
+                if sender: sender.send(state, Clock.now())
+                History.history.record(state, Clock.now())
+                if watchdog: watchdog.stage = 'actions'
+                if not (control and control.paused):
+                    for action in ACTION_CONFIG:
+                        action.update(state, last_state, mouse, keyboard)
                 last_state = state
 
-                current_time = time.time()
+                if watchdog: watchdog.stage = 'print'
+                current_time = Clock.now()
                 if current_time - last_print_time > 0.1:
-                    pressed = sorted([name for name, is_on in state["buttons"].items() if is_on])
-                    print(f"L:({state['lx']:.2f},{state['ly']:.2f}) R:({state['rx']:.2f},{state['ry']:.2f}) LT:{state['lt']:.2f} RT:{state['rt']:.2f} B:{pressed}      ", end='\r')
+                    print(f"L:({state['lx']:.2f},{state['ly']:.2f}) R:({state['rx']:.2f},{state['ry']:.2f}) LT:{state['lt']:.2f} RT:{state['rt']:.2f} B:{pressed_text(state['mask'])}      ", end='\r')
                     last_print_time = current_time
             else:
                 if is_active:
                     is_active = False
+                    # 手柄断开时松开所有仍被按住的鼠标键和键盘键
+                    for action in ACTION_CONFIG:
+                        action.release(mouse, keyboard)
                     print("\n" + "-" * 50)
                     print("手柄控制已暂停。请按任意键重新激活...")
                     last_state = None
+                    History.history.clear()
                 
-                # 在等待激活时减少CPU占用
-                time.sleep(0.1)
+                if watchdog: watchdog.stage = 'idle'
+                # 在等待激活时减少CPU占用（HID 后端在手柄插入时会被立即唤醒）
+                controller.wait(0.1)
 
     except KeyboardInterrupt: print("\n正在退出。")
     except Exception as e: print(f"\n发生严重错误: {e}")
     finally:
         if controller: controller.close()
+        if recorder: recorder.close()
+        if publisher: publisher.close()
+        if server: server.close()
+        if sender: sender.close()
+        if control: control.close()
+        if profiler.running: profiler.stop(wait=True)
+        if watchdog: watchdog.close()
 
 if __name__ == "__main__":
     if IS_MAPPING_MODE:
+        from run_mapping_tool import run_mapping_tool
         run_mapping_tool()
     else:
         try:
-            with open(MAPPING_FILE, 'r') as f: mapping_data = json.load(f)
-            print(f"已成功从 '{MAPPING_FILE}' 加载手柄映射。")
-            main_controller_loop(mapping_data)
-        except FileNotFoundError:
-            print("="*60 + f"\n错误：找不到手柄映射文件 '{MAPPING_FILE}'。\n" + "请使用 --map 参数运行一次以创建映射文件：\n" + f"    python {os.path.basename(__file__)} --map\n" + "="*60)
+            mapping_data = None
+            if BACKEND == 'pygame':
+                try:
+                    with open(MAPPING_FILE, 'r') as f: mapping_data = json.load(f)
+                    print(f"已成功从 '{MAPPING_FILE}' 加载手柄映射。")
+                except FileNotFoundError:
+                    # 没有自定义映射时只用 gamecontrollerdb 中按 GUID 匹配的配置 (load_profiles(None))
+                    print(f"未找到手柄映射文件 '{MAPPING_FILE}'，只使用手柄配置库中按 GUID 匹配的映射。\n"
+                          f"如需自定义映射，请运行: python {os.path.basename(__file__)} --map")
+            main_controller_loop(mapping_data, get_option('--record'), get_option('--shm'), get_option('--serve'), get_option('--send'), get_option('--control'), get_option('--capture'), get_option('--filter'), get_option('--profile-dir', '.'), get_option('--watchdog'), float(get_option('--budget-ms', 50)))
         except Exception as e:
             print(f"启动时发生错误: {e}")
\ No newline at end of file
@@ -0,0 +1,54 @@
+import os
+import sys
+
+import pytest
+
+# 模块都在仓库根目录下（没有包），测试直接按模块名导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Clock
+import History
+from State import AXES, mask_of
+
+
+class FrameDriver:
+    """在虚拟时钟上逐帧驱动 Action，与主循环相同：推进时钟 -> 执行到期定时器 -> 依次 update。"""
+    def __init__(self, clock, actions, interval=0.008):
+        self.clock, self.actions, self.interval = clock, actions, interval
+        self.last_state = None
+        self.mouse = self.keyboard = None
+
+    def frame(self, *buttons, **axes):
+        """推进一帧，返回经过所有 Action 之后的状态。"""
+        t = self.clock.advance(self.interval)
+        Clock.scheduler.run_due(t)
+        pressed = dict.fromkeys(buttons, True)
+        state = {'buttons': pressed, 'mask': mask_of(pressed)}
+        state.update(dict.fromkeys(AXES, 0.0))
+        state.update(axes)
+        for action in self.actions:
+            action.update(state, self.last_state, self.mouse, self.keyboard)
+        self.last_state = state
+        return state
+
+    def run(self, seconds, *buttons, **axes):
+        """以相同的输入运行 seconds 秒，返回各帧的状态。"""
+        return [self.frame(*buttons, **axes) for _ in range(max(1, round(seconds / self.interval)))]
+
+
+@pytest.fixture
+def clock():
+    """换上虚拟时钟和新的中央定时器 / 输入历史，测试结束后恢复。"""
+    virtual = Clock.VirtualClock()
+    old_clock = Clock.set_clock(virtual)
+    old_scheduler, Clock.scheduler = Clock.scheduler, Clock.Scheduler()
+    old_history, History.history = History.history, History.InputHistory()
+    yield virtual
+    Clock.set_clock(old_clock)
+    Clock.scheduler = old_scheduler
+    History.history = old_history
+
+
+@pytest.fixture
+def drive(clock):
+    return lambda *actions, interval=0.008: FrameDriver(clock, list(actions), interval)
@@ -0,0 +1,59 @@
+import pytest
+
+import Clock
+from Autofire import AutofireAction
+from Simulation import RecordingKeyboard, RecordingMouse
+
+
+@pytest.fixture
+def pad(drive):
+    """1 ms 一帧，点击时刻只被帧量化 1 ms。"""
+    outputs = []
+    def make(*actions):
+        pad = drive(*actions, interval=0.001)
+        pad.mouse, pad.keyboard = RecordingMouse(outputs), RecordingKeyboard(outputs)
+        pad.outputs = outputs
+        return pad
+    return make
+
+
+def times(outputs, kind):
+    return [t for t, event, *_ in outputs if event == kind]
+
+
+def test_clicks_follow_rate_and_duty(pad):
+    pad = pad(AutofireAction('A', mouse_button='left', rate=20, duty=0.3))
+    pad.run(0.1)
+    start = pad.clock.t + pad.interval   # 按下的第一帧
+    pad.run(0.5, 'A')
+    presses, releases = times(pad.outputs, 'press'), times(pad.outputs, 'release')
+    assert len(presses) == 10
+    # 第 k 次按下在 start + k / rate，按下保持 duty / rate 秒；虚拟时钟上没有累积误差
+    for k, (pressed, released) in enumerate(zip(presses, releases)):
+        assert pressed == pytest.approx(start + k * 0.05, abs=1e-9)
+        assert released == pytest.approx(start + k * 0.05 + 0.015, abs=pad.interval + 1e-9)
+
+
+def test_release_stops_immediately_and_cancels_timers(pad):
+    pad = pad(AutofireAction('A', mouse_button='left', rate=20))
+    pad.run(0.06, 'A')           # 第二次按下之后、松开之前
+    assert len(times(pad.outputs, 'press')) == 2
+    pad.frame()
+    assert pad.outputs[-1][1:] == ('release', 'left')
+    assert Clock.scheduler.next_deadline() is None
+    pad.run(0.2)
+    assert len(times(pad.outputs, 'press')) == 2
+
+
+def test_stalled_loop_skips_missed_clicks(pad):
+    action = AutofireAction('A', key='z', rate=50)
+    pad = pad(action)
+    pad.run(0.005, 'A')
+    pad.clock.advance(0.1)       # 主循环卡住 100 ms：周期为 20 ms，第 1 到 4 次点击都已错过
+    pad.frame('A')
+    assert action.skipped == 4
+    # 恢复后只补一次点击，而不是一口气补发错过的点击
+    assert len(times(pad.outputs, 'key_press')) == 2
+    assert action.stats()['pulses'] == 2
+    pad.frame()
+    assert pad.outputs[-1][1:] == ('key_release', 'z')
@@ -0,0 +1,56 @@
+import struct
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from Capture import ReportCapture, load_capture
+from HidDescriptor import get_decoder
+from State import AXES, button_bit, new_state
+from test_HidDescriptor import XBOX_BT_0B13, report as bt_report
+
+
+def capture(path, vendor_id, product_id, descriptor, reports):
+    recorder = ReportCapture(str(path))
+    recorder.begin(vendor_id, product_id, descriptor)
+    for i, raw in enumerate(reports):
+        recorder.write(raw, 0.008 * i)
+    recorder.close()
+    return load_capture(str(path))
+
+
+def gip_report(seq, b1=0, b2=0, lt=0, rt=0, lx=0, ly=0, rx=0, ry=0):
+    """固定布局 (USB GIP) 的输入报文：[2] 序号, [4][5] 按钮, [6:10] LT/RT, [10:18] 摇杆。"""
+    return bytes([0x20, 0, seq, 0x0E, b1, b2]) + struct.pack('<HHhhhh', lt, rt, lx, ly, rx, ry)
+
+
+def test_fixed_layout(tmp_path):
+    reports = [gip_report(1), gip_report(2, b1=0x10, lt=1023, lx=32767, ly=-32768),
+               b'\x07\x20\x03',                                # 长度不足，丢弃
+               gip_report(3, b1=0x10 | 0x80, b2=0x01 | 0x20, rx=-16384, rt=512)]
+    _, decoded, name = capture(tmp_path / 'gip.cap', 0x045E, 0x0B12, b'', reports)
+    assert name.endswith("固定布局")
+    assert list(decoded['seq']) == [1, 2, 3]
+    assert list(decoded['t']) == pytest.approx([0.0, 0.008, 0.024])
+    assert list(decoded['mask']) == [0, button_bit('A'), button_bit('A') | button_bit('Y') | button_bit('UP') | button_bit('RB')]
+    assert (decoded['lt'][1], decoded['lx'][1], decoded['ly'][1]) == (1.0, 1.0, -1.0)
+    assert decoded['rx'][2] == -0.5 and decoded['rt'][2] == pytest.approx(512 / 1023, abs=1e-6)
+
+
+def test_descriptor_layout_matches_the_generated_decoder(tmp_path):
+    reports = [bt_report(), bt_report(lx=0xFFFF, ly=0, buttons=1, hat=1),
+               bytes([4, 0x64]),                                # 电量报文，不属于手柄状态
+               bt_report(rx=0x4000, ry=0xC000, brake=1023, accelerator=300, buttons=(1 << 4) | (1 << 10), hat=6)]
+    _, decoded, name = capture(tmp_path / 'bt.cap', 0x045E, 0x0B13, XBOX_BT_0B13, reports)
+    assert "描述符布局" in name
+    decoder = get_decoder(0x045E, 0x0B13, XBOX_BT_0B13)
+    expected = []
+    for raw in reports:
+        state = new_state()
+        if decoder(raw, state, state['buttons']):
+            expected.append(state)
+    assert len(decoded) == len(expected) == 3
+    for row, state in zip(decoded, expected):
+        assert int(row['mask']) == state['mask']
+        for axis in AXES:
+            assert row[axis] == pytest.approx(state[axis], abs=1e-6)
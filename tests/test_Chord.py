@@ -0,0 +1,90 @@
+import pytest
+
+from Chord import ChordAction
+
+
+def fired(states, name):
+    return [i for i, state in enumerate(states) if state['buttons'].get(name)]
+
+
+def shown(states, name):
+    """后续 Action 看到的 name 按钮在各帧是否按下。"""
+    return [bool(state['buttons'].get(name)) for state in states]
+
+
+def tap(pad, *buttons, frames=2, gap=2):
+    states = [pad.frame(*buttons) for _ in range(frames)]
+    return states + [pad.frame() for _ in range(gap)]
+
+
+@pytest.fixture
+def chords(drive):
+    return drive(ChordAction(chords={'COPY': ['LB', 'A']}, window=0.05))
+
+
+def test_chord_inside_window(chords):
+    states = chords.run(0.024, 'LB') + chords.run(0.1, 'LB', 'A')
+    assert fired(states, 'COPY') == list(range(3, len(states)))
+    assert not any(shown(states, 'LB')) and not any(shown(states, 'A'))
+
+
+def test_chord_members_released_after_window(chords):
+    states = chords.run(0.1, 'LB')
+    visible = shown(states, 'LB')
+    first = visible.index(True)
+    # 成员按钮被隐藏 window 秒后放出，之后一直可见
+    assert (first - 1) * chords.interval < 0.05 <= first * chords.interval + 1e-9
+    assert all(visible[first:])
+
+
+def test_release_inside_window_is_flushed_as_tap(chords):
+    states = chords.run(0.02, 'A') + chords.run(0.05)
+    assert shown(states, 'A').count(True) == 1
+
+
+def test_chord_held_until_member_released(chords):
+    states = chords.run(0.01, 'LB') + chords.run(0.2, 'LB', 'A') + chords.run(0.05, 'LB')
+    combo = fired(states, 'COPY')
+    assert combo == list(range(combo[0], combo[-1] + 1))
+    assert not states[-1]['buttons'].get('COPY')
+    assert not any(shown(states, 'LB'))   # 组合键成立后成员一直隐藏到松开
+
+
+@pytest.fixture
+def sequences(drive):
+    return drive(ChordAction(sequences={'KONAMI': ['UP', 'UP', 'DOWN'], 'AAB': ['A', 'A', 'B']}, timeout=0.5))
+
+
+def test_sequence(sequences):
+    states = tap(sequences, 'UP') + tap(sequences, 'UP') + tap(sequences, 'DOWN')
+    assert fired(states, 'KONAMI') == [8, 9]
+    assert not any(shown(states[8:], 'DOWN'))   # 完成序列的最后一个按键被隐藏
+
+
+def test_sequence_step_timeout(sequences):
+    states = tap(sequences, 'UP') + tap(sequences, 'UP', gap=70) + tap(sequences, 'DOWN')   # 间隔 0.56 秒
+    assert not fired(states, 'KONAMI')
+
+
+def test_sequence_falls_back_to_longest_suffix(sequences):
+    states = []
+    for button in ('A', 'A', 'A', 'B'):
+        states += tap(sequences, button)
+    assert fired(states, 'AAB') == [12, 13]
+
+
+def test_sequence_restarts_after_mismatch(sequences):
+    states = []
+    for button in ('UP', 'UP', 'UP', 'DOWN', 'A', 'A', 'B'):
+        states += tap(sequences, button)
+    assert fired(states, 'KONAMI') and fired(states, 'AAB')
+
+
+def test_sequence_that_is_a_suffix_of_the_input_fires(drive):
+    pad = drive(ChordAction(sequences={'BA': ['B', 'A'], 'CBAD': ['C', 'B', 'A', 'D']}, timeout=0.5))
+    states = []
+    for button in ('C', 'B', 'A'):
+        states += tap(pad, button)
+    # 输入停在 C, B, A 节点上，它不是终点，但后缀 B, A 是
+    assert fired(states, 'BA') == [8, 9]
+    assert not fired(states, 'CBAD')
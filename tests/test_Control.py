@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+from Action import Action, ClickAction, MouseMoveAction
+from Control import ControlServer
+from Layers import Layers
+from Simulation import RecordingKeyboard, RecordingMouse
+from State import BUTTON_BITS, button_bit
+
+
+class VirtualButton(Action):
+    """构造时登记一个虚拟按钮位，并记下在哪个线程里构造。"""
+    def __init__(self, controller_button, output):
+        self.controller_button, self.output = controller_button, output
+        self.bit = button_bit(output)
+        self.thread = threading.current_thread()
+
+
+@pytest.fixture
+def setup(drive, tmp_path):
+    outputs = []
+    servers = []
+    def make(*actions):
+        pad = drive(*actions)
+        pad.mouse, pad.keyboard = RecordingMouse(outputs), RecordingKeyboard(outputs)
+        pad.outputs = outputs
+        server = ControlServer(str(tmp_path / 'control.sock'), pad.actions)
+        servers.append(server)
+        return pad, server
+    yield make
+    for server in servers:
+        server.close()
+
+
+def request(pad, server, message, *buttons):
+    """在后台线程处理请求，主循环照常逐帧运行，并在两帧之间调用 apply()，与 s.py 相同。"""
+    reply = {}
+    def handle():
+        try:
+            reply.update(server.handle(message))
+        except Exception as e:
+            reply['error'] = e
+    thread = threading.Thread(target=handle)
+    thread.start()
+    while thread.is_alive():
+        pad.frame(*buttons)
+        if server.pending:
+            server.apply(pad.last_state, pad.mouse, pad.keyboard)
+        time.sleep(0.001)
+    return reply
+
+
+def test_set_rebuilds_the_action_between_frames(setup):
+    move = MouseMoveAction(x_axis='lx', y_axis='ly', sensitivity=25, deadzone=0.15)
+    layers = Layers({'main': [move]})
+    pad, server = setup(layers)
+    reply = request(pad, server, {'cmd': 'set', 'id': '0/main/0', 'params': {'sensitivity': 30, 'deadzone': 0.05}})
+    assert reply['params']['sensitivity'] == 30 and reply['params']['deadzone'] == 0.05
+    new = layers.plan[0]
+    assert new is not move and type(new) is MouseMoveAction
+    assert (new.sensitivity, new.deadzone, new.x_axis) == (30, 0.05, 'lx')
+
+    pad.outputs.clear()
+    pad.frame(lx=1.0)
+    assert pad.outputs[-1][1:] == ('move', 30.0, 0.0)
+
+
+def test_set_constructs_on_the_main_thread(setup):
+    pad, server = setup(VirtualButton('A', 'A_VIRTUAL'))
+    name = f"VIRTUAL_{id(pad)}"
+    reply = request(pad, server, {'cmd': 'set', 'id': '0', 'params': {'output': name}})
+    assert reply['params']['output'] == name
+    new = pad.actions[0]
+    assert new.thread is threading.main_thread()
+    assert BUTTON_BITS[name] == new.bit
+
+
+def test_set_rejects_unknown_parameters(setup):
+    pad, server = setup(ClickAction(controller_button='A', mouse_button='left'))
+    reply = request(pad, server, {'cmd': 'set', 'id': '0', 'params': {'speed': 3}})
+    assert isinstance(reply['error'], KeyError)
+    assert not server.pending
+
+
+def test_pause_releases_held_outputs_in_the_main_loop(setup):
+    pad, server = setup(ClickAction(controller_button='A', mouse_button='left'))
+    pad.frame('A')
+    assert pad.outputs[-1][1:] == ('press', 'left')
+    reply = request(pad, server, {'cmd': 'pause'}, 'A')
+    assert reply == {'paused': True}
+    assert pad.outputs[-1][1:] == ('release', 'left')
+    assert request(pad, server, {'cmd': 'resume'}) == {'paused': False}
+
+
+def test_timed_out_request_is_cancelled(setup):
+    pad, server = setup(ClickAction(controller_button='A', mouse_button='left'))
+    ran = []
+    with pytest.raises(TimeoutError):
+        server._handoff(lambda state, mouse, keyboard: ran.append(True), timeout=0.01)
+    # 主循环之后才取出这个请求：它已被取消，不能再生效
+    server.apply(pad.frame(), pad.mouse, pad.keyboard)
+    assert not ran and not server.pending
@@ -0,0 +1,35 @@
+import threading
+import time
+
+from Discovery import probe_parallel
+
+
+def wait_for(condition, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.001)
+    return condition()
+
+
+def test_probes_succeeding_together_release_the_loser():
+    # 两个探测在同一时刻成功：没被返回的那个设备必须交给 discard，不能泄漏
+    for _ in range(50):
+        barrier = threading.Barrier(2)
+        discarded = []
+        def probe(candidate):
+            barrier.wait()
+            return f"dev-{candidate}"
+        found = probe_parallel(['a', 'b'], probe, timeout=1.0, workers=2, discard=discarded.append)
+        assert found is not None
+        candidate, result, _ = found
+        assert result == f"dev-{candidate}"
+        assert wait_for(lambda: len(discarded) == 1)
+        assert discarded == [{'a': 'dev-b', 'b': 'dev-a'}[candidate]]
+
+
+def test_all_probes_failing_returns_none():
+    def probe(candidate):
+        if candidate == 'a':
+            raise OSError("busy")
+        return None
+    assert probe_parallel(['a', 'b'], probe, timeout=1.0, workers=2) is None
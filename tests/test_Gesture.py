@@ -0,0 +1,78 @@
+import pytest
+
+import Clock
+from Gesture import GestureAction
+
+
+def fired(states, name):
+    """各帧中虚拟按钮 name 为按下的帧序号。"""
+    return [i for i, state in enumerate(states) if state['buttons'].get(name)]
+
+
+@pytest.fixture
+def gesture():
+    return GestureAction('A', tap='A_TAP', hold='A_HOLD', double_tap='A_DOUBLE', hold_time=0.4, double_tap_time=0.25)
+
+
+def test_tap_without_double_tap_fires_on_release(drive):
+    pad = drive(GestureAction('A', tap='A_TAP', hold='A_HOLD'))
+    assert not fired(pad.run(0.1, 'A'), 'A_TAP')
+    states = pad.run(0.1)
+    assert fired(states, 'A_TAP') == [0]
+    assert Clock.scheduler.next_deadline() is None   # 长按定时器已取消
+
+
+def test_tap_waits_for_double_tap_window(drive, gesture):
+    pad = drive(gesture)
+    pad.run(0.1, 'A')
+    states = pad.run(0.5)   # 第 0 帧松开
+    taps = fired(states, 'A_TAP')
+    # 在双击窗口结束后的第一帧发出，只持续一帧
+    assert len(taps) == 1
+    assert (taps[0] - 1) * pad.interval < 0.25 <= taps[0] * pad.interval + 1e-9
+    assert not fired(states, 'A_DOUBLE') and not fired(states, 'A_HOLD')
+
+
+def test_hold_threshold(drive, gesture):
+    pad = drive(gesture)
+    states = pad.run(0.8, 'A')
+    held = fired(states, 'A_HOLD')
+    # 第 i 帧在 (i + 1) * 8 ms；按下在第 0 帧，长按在按下 0.4 秒后开始并一直保持
+    assert held == list(range(held[0], len(states)))
+    assert (held[0] - 1) * pad.interval < 0.4 <= held[0] * pad.interval + 1e-9
+    after = pad.run(0.5)
+    assert not fired(after, 'A_HOLD')
+    assert not fired(after, 'A_TAP')   # 长按松开不算点按
+
+
+def test_release_during_hold_timer_is_a_tap(drive, gesture):
+    pad = drive(gesture)
+    states = pad.run(0.39, 'A') + pad.run(0.5)
+    assert not fired(states, 'A_HOLD')
+    assert len(fired(states, 'A_TAP')) == 1
+
+
+def test_double_tap_inside_window(drive, gesture):
+    pad = drive(gesture)
+    pad.run(0.05, 'A')
+    pad.run(0.1)
+    states = pad.run(0.05, 'A') + pad.run(0.5)
+    assert fired(states, 'A_DOUBLE') == [0]
+    assert not fired(states, 'A_TAP')
+
+
+def test_second_press_after_window_is_two_taps(drive, gesture):
+    pad = drive(gesture)
+    states = pad.run(0.05, 'A') + pad.run(0.3) + pad.run(0.05, 'A') + pad.run(0.5)
+    assert len(fired(states, 'A_TAP')) == 2
+    assert not fired(states, 'A_DOUBLE')
+
+
+def test_release_cancels_pending_timer(drive, gesture):
+    pad = drive(gesture)
+    pad.run(0.05, 'A')
+    pad.run(0.05)
+    assert Clock.scheduler.next_deadline() is not None   # 等待双击
+    gesture.release(None, None)
+    assert Clock.scheduler.next_deadline() is None
+    assert not fired(pad.run(0.5), 'A_TAP')
@@ -0,0 +1,101 @@
+import struct
+
+from HidDescriptor import get_decoder, parse_report_descriptor, plan_layout
+from State import new_state
+
+# Xbox Wireless Controller 045E:0B13（蓝牙）的报告描述符：
+# 报文 1 = 摇杆 X/Y/Z/Rz (16 位) + 刹车/油门 (10 位) + 方向键 + 15 个按钮 + 录制键，
+# 之后是震动输出报文 3 和电量输入报文 4
+XBOX_BT_0B13 = bytes.fromhex(
+    "05010905a101"
+    "85010901a100"
+    "09300931150027ffff0000950275108102"
+    "c0"
+    "0901a100"
+    "09320935150027ffff0000950275108102"
+    "c0"
+    "050209c5150026ff039501750a8102"
+    "15002500750695018103"
+    "050209c4150026ff039501750a8102"
+    "15002500750695018103"
+    "05010939150125083500463b01661400750495018142"
+    "75049501150025003500450065008103"
+    "05091901290f150025017501950f8102"
+    "15002500750195018103"
+    "050c0ab20015002501950175018102"
+    "15002500750795018103"
+    "050f09218503a102"
+    "099715002501750495019102"
+    "15002500750495019103"
+    "097015002564750895049102"
+    "0950660110550e150026ff00750895019102"
+    "09a7150026ff00750895019102"
+    "65005500097c150026ff00750895019102"
+    "c0"
+    "050609208504150026ff00750895018102"
+    "c0")
+
+# 045E:0B12 通过 USB 连接时的 GIP 厂商自定义描述符：只有厂商页上不透明的字节数组
+XBOX_GIP_0B12 = bytes.fromhex(
+    "0600ff0901a101"
+    "150026ff007508954009018102"
+    "954009019102"
+    "c0")
+
+
+def report(lx=0x8000, ly=0x8000, rx=0x8000, ry=0x8000, brake=0, accelerator=0, hat=0, buttons=0):
+    return struct.pack('<BHHHHHHBHB', 1, lx, ly, rx, ry, brake, accelerator, hat, buttons, 0)
+
+
+def decode(decoder, raw):
+    state = new_state()
+    buttons = state['buttons']
+    for name in buttons:
+        buttons[name] = False
+    assert decoder(raw, state, buttons)
+    return state
+
+
+def test_bluetooth_descriptor_layout():
+    layout = plan_layout(parse_report_descriptor(XBOX_BT_0B13), 0x045E, 0x0B13)
+    assert layout['report_id'] == 1
+    assert sorted(name for _, name in layout['buttons']) == sorted(['A', 'B', 'X', 'Y', 'LB', 'RB', 'MENU', 'WIN', 'LS', 'RS'])
+    assert layout['hat'] is not None
+    assert all(layout['sticks'].values()) and all(layout['triggers'].values())
+
+
+def test_bluetooth_descriptor_decodes_buttons_hat_sticks_and_triggers():
+    decoder = get_decoder(0x045E, 0x0B13, XBOX_BT_0B13)
+    assert decoder is not None
+
+    # 按钮页用途 1 (A)、5 (Y)、15 (RS)；方向键原始值 2（最小值为 1）= 右上
+    state = decode(decoder, report(buttons=(1 << 0) | (1 << 4) | (1 << 14), hat=2))
+    pressed = {name for name, down in state['buttons'].items() if down}
+    assert pressed == {'A', 'Y', 'RS', 'UP', 'RIGHT'}
+
+    # 方向键为 0（空值）时不按下任何方向
+    state = decode(decoder, report(hat=0))
+    assert not any(state['buttons'].values())
+    assert state['mask'] == 0
+
+    # 摇杆：X 向右为正，Y 取反使向上（原始值最小）为正
+    state = decode(decoder, report(lx=0xFFFF, ly=0, rx=0, ry=0xFFFF))
+    assert state['lx'] == 1.0 and state['ly'] == 1.0
+    assert state['rx'] == -1.0 and state['ry'] == -1.0
+
+    # 扳机：10 位刹车/油门归一化到 0..1
+    state = decode(decoder, report(brake=1023, accelerator=0))
+    assert state['lt'] == 1.0 and state['rt'] == 0.0
+
+
+def test_bluetooth_decoder_rejects_other_reports():
+    decoder = get_decoder(0x045E, 0x0B13, XBOX_BT_0B13)
+    state = new_state()
+    assert not decoder(bytes([4, 0x64]), state, state['buttons'])
+    assert not decoder(report()[:8], state, state['buttons'])
+
+
+def test_vendor_defined_descriptor_falls_back_to_fixed_layout():
+    layout = plan_layout(parse_report_descriptor(XBOX_GIP_0B12), 0x045E, 0x0B12)
+    assert not layout['buttons'] and layout['hat'] is None
+    assert get_decoder(0x045E, 0x0B12, XBOX_GIP_0B12) is None
@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from History import InputHistory
+from State import button_bit, new_state
+
+SIZE, PRESS_LIMIT = 16, 4
+
+
+def test_presses_and_peak_across_wraparound(clock):
+    history = InputHistory(size=SIZE, press_limit=PRESS_LIMIT)
+    rng = random.Random(46)
+    a = button_bit('A')
+    frames, press_times = [], []
+    state = new_state()
+    for frame in range(10 * SIZE):
+        t = clock.advance(rng.choice((0.004, 0.008, 0.016)))
+        was_down = bool(state['mask'] & a)
+        state['mask'] = a if rng.random() < 0.4 else 0
+        state['lx'] = rng.uniform(-1.0, 1.0)
+        history.record(state, t)
+        frames.append((t, state['lx']))
+        if state['mask'] and not was_down:
+            press_times.append(t)
+
+        # 与逐帧保存全部输入的朴素实现比较：peak 只看缓冲区里还在的最近 SIZE 帧，
+        # presses 数到 PRESS_LIMIT 为止
+        kept = frames[-SIZE:]
+        for window in (0.0, 0.02, 0.05, 0.1, 10.0):
+            start = t - window
+            assert history.peak('lx', window) == max((abs(v) for ft, v in kept if ft >= start), default=0.0)
+            assert history.presses('A', window) == min(PRESS_LIMIT, sum(1 for pt in press_times if pt >= start))
+        assert history.total == frame + 1 and len(history) == min(frame + 1, SIZE)
+    assert len(press_times) > 2 * PRESS_LIMIT
+
+
+def test_peak_after_the_whole_buffer_was_replaced(clock):
+    history = InputHistory(size=SIZE)
+    state = new_state()
+    state['ry'] = 0.9
+    history.record(state, clock.advance(0.008))
+    assert history.peak('ry', 1.0) == pytest.approx(0.9)
+    # 两次查询之间记录了超过一整圈的帧：线段树整体重建，旧的 0.9 已被覆盖
+    for i in range(SIZE + 3):
+        state['ry'] = -0.1 * (i % 3)
+        history.record(state, clock.advance(0.008))
+    assert history.peak('ry', 1.0) == pytest.approx(0.2)
+    assert history.value('ry') == pytest.approx(-0.1 * ((SIZE + 2) % 3))
+    with pytest.raises(IndexError):
+        history.value('ry', SIZE)
@@ -0,0 +1,54 @@
+import time
+
+import pytest
+
+import Clock
+from Network import UdpController, UdpSender
+from State import new_state
+
+
+def deliver(receiver, sender, lx=0.5):
+    state = new_state()
+    state['lx'] = lx
+    sender.send(state, Clock.now())
+    deadline = time.monotonic() + 1.0
+    while time.monotonic() < deadline:
+        result = receiver.read()
+        if result or receiver.rejected:
+            return result
+        time.sleep(0.001)
+    return None
+
+
+@pytest.fixture
+def receivers():
+    opened = []
+    def make(**kwargs):
+        receiver = UdpController(('127.0.0.1', 0), **kwargs)
+        opened.append(receiver)
+        return receiver
+    yield make
+    for receiver in opened:
+        receiver.close()
+
+
+def test_public_bind_needs_secret_or_allowlist():
+    with pytest.raises(ValueError):
+        UdpController(('0.0.0.0', 0))
+
+
+def test_hmac(receivers):
+    receiver = receivers(secret=b'key')
+    assert deliver(receiver, UdpSender(receiver.sock.getsockname(), secret=b'key'))['lx'] == pytest.approx(0.5, abs=1e-4)
+    for secret in (b'other', None):
+        receiver = receivers(secret=b'key')
+        assert deliver(receiver, UdpSender(receiver.sock.getsockname(), secret=secret)) is None
+        assert receiver.rejected == 1
+
+
+def test_allowlist(receivers):
+    receiver = receivers(allow=['127.0.0.1'])
+    assert deliver(receiver, UdpSender(receiver.sock.getsockname())) is not None
+    receiver = receivers(allow=['192.0.2.1'])
+    assert deliver(receiver, UdpSender(receiver.sock.getsockname())) is None
+    assert receiver.rejected == 1
@@ -0,0 +1,64 @@
+import pytest
+
+from bench import FakeJoystick
+from Profiles import ProfileStore, parse_db_line
+from State import JoystickDecoder
+
+GUID = '030000005e0400008e02000010010000'
+LINE = (GUID + ',Test pad,a:b0,b:b1,leftx:a0,lefty:a1~,righttrigger:+a5,lefttrigger:b6,'
+        'dpup:-a3,dpdown:+a3,platform:Linux,')
+
+
+def decode(axes=None, pressed=()):
+    _, name, entries = parse_db_line(LINE, 'Linux')
+    store = ProfileStore()
+    store.profiles[GUID] = (name, entries)
+    joy = FakeJoystick(pressed=pressed, axes=axes or {})
+    decoder = JoystickDecoder(store.lookup(GUID))
+    decoder.bind(joy)
+    return decoder.decode(joy)
+
+
+def test_parse_keeps_modifiers():
+    entries = {entry[0]: entry[1:] for entry in parse_db_line(LINE, 'Linux')[2]}
+    assert entries['ly'] == ('axis', 1, '~')
+    assert entries['rt'] == ('axis', 5, '+')
+    assert entries['lt'] == ('button', 6, '')
+    assert entries['UP'] == ('axis', 3, '-')
+
+
+def test_inverted_axis():
+    # lefty:a1~ 反转后再按 Y 轴向上为正取反，两次取反抵消
+    assert decode({1: 0.5})['ly'] == pytest.approx(0.5)
+    assert decode({0: 0.5})['lx'] == pytest.approx(0.5)
+
+
+def test_half_axis_trigger():
+    assert decode({5: 0.25})['rt'] == pytest.approx(0.25)
+    assert decode({5: -0.75})['rt'] == 0.0
+
+
+def test_trigger_bound_to_button_is_an_axis():
+    state = decode(pressed=(6,))
+    assert state['lt'] == 1.0 and 'lt' not in state['buttons']
+    assert decode()['lt'] == 0.0
+
+
+def test_dpad_bound_to_half_axes():
+    up = decode({3: -1.0})['buttons']
+    assert up['UP'] and not up['DOWN']
+    down = decode({3: 1.0})['buttons']
+    assert down['DOWN'] and not down['UP']
+    assert not any(decode({3: -0.3})['buttons'].values())
+
+
+def test_json_cache_round_trip(tmp_path):
+    path = tmp_path / 'gamecontrollerdb.txt'
+    path.write_text(LINE + '\n')
+    first, second = ProfileStore(), ProfileStore()
+    assert first.load_db(str(path), platform='Linux') == 1
+    assert (tmp_path / 'gamecontrollerdb.txt.cache.json').exists()
+    assert second.load_db(str(path), platform='Linux') == 1
+    assert second.profiles == first.profiles
+    (tmp_path / 'gamecontrollerdb.txt.cache.json').write_text('{"key": 1')
+    assert ProfileStore().load_db(str(path), platform='Linux') == 1
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from Action import AnalogAsButtonScrollAction, ClickAction, MouseMoveAction, ScrollAction
+from Layers import Layers
+from Replay import expand, load_frames, replay
+from Simulation import simulate
+
+FRAME = 0.008
+
+# 约 1.5 秒的输入：推左摇杆再回中、右摇杆小幅移动（部分在死区内）、按住 RB 和 LT 滚动
+TIMELINE = [
+    {'t': 10.0, 'buttons': []},
+    {'t': 10.05, 'buttons': [], 'lx': 0.4, 'ly': -0.2},
+    {'t': 10.2, 'buttons': [], 'lx': 0.9, 'ly': -0.6},
+    {'t': 10.35, 'buttons': ['A'], 'lx': 0.05, 'ly': 0.0, 'rx': 0.3},
+    {'t': 10.5, 'buttons': ['RB'], 'rx': 0.08, 'ry': -0.5},
+    {'t': 10.9, 'buttons': [], 'rx': 0.0, 'ry': 0.0, 'lt': 0.5},
+    {'t': 11.3, 'buttons': [], 'lt': 0.0},
+    {'t': 11.31, 'buttons': ['RB']},
+    {'t': 11.5, 'buttons': []},
+]
+
+
+def build():
+    return [Layers({'main': [
+        MouseMoveAction(x_axis='lx', y_axis='ly', sensitivity=25, deadzone=0.1),
+        MouseMoveAction(x_axis='rx', y_axis='ry', sensitivity=15, deadzone=0.1, exponent=2),
+        ClickAction(controller_button='A', mouse_button='left'),
+        ScrollAction(controller_button='RB', scroll_speed=-15, initial_delay=0.3, repeat_rate=0.05),
+        AnalogAsButtonScrollAction(axis_name='lt', threshold=0.01, scroll_speed=15, initial_delay=0.3, repeat_rate=0.05),
+    ]})]
+
+
+def test_vectorized_replay_matches_simulate(tmp_path):
+    path = tmp_path / 'timeline.jsonl'
+    path.write_text(''.join(json.dumps(event) + '\n' for event in TIMELINE))
+    t, frames = load_frames(str(path), FRAME)
+    variants = expand('test', build(), [('sensitivity', False, [5, 25]), ('deadzone', False, [0.1, 0.35])])
+    results = replay(variants, t, frames, FRAME)
+    assert len(results) == 4
+
+    for (name, actions), result in zip(variants, results):
+        outputs = simulate(actions, TIMELINE, FRAME)
+        moves = [o for o in outputs if o[1] == 'move']
+        scroll = sum(o[3] for o in outputs if o[1] == 'scroll')
+        assert result['moves'] == len(moves), name
+        assert result['net'] == pytest.approx((sum(o[2] for o in moves), sum(o[3] for o in moves))), name
+        assert result['scroll'] == scroll, name
+    assert results[0]['scroll'] != 0 and results[0]['moves'] > 0
@@ -0,0 +1,105 @@
+import os
+import threading
+from multiprocessing import shared_memory
+
+import pytest
+
+from SharedState import SEQ, SEQ_OFFSET, PAYLOAD, SIZE, StatePublisher, StateReader
+from State import new_state
+
+
+@pytest.fixture
+def name():
+    return f"xbox_state_test_{os.getpid()}_{threading.get_ident()}"
+
+
+@pytest.fixture
+def publisher(name):
+    publisher = StatePublisher(name)
+    yield publisher
+    publisher.close()
+
+
+def make_state(value):
+    state = new_state()
+    state['mask'] = value
+    for axis in ('lx', 'ly', 'rx', 'ry', 'lt', 'rt'):
+        state[axis] = float(value)
+    return state
+
+
+def test_reader_sees_published_frames(publisher, name):
+    reader = StateReader(name)
+    try:
+        publisher.publish(make_state(3), 1.5)
+        assert reader.read() == (1, 3, 1.5, 3.0, 3.0, 3.0, 3.0, 3.0, 3.0)
+        publisher.publish(make_state(4), 2.0)
+        assert reader.sequence() == 2
+    finally:
+        reader.close()
+
+
+def test_reader_waits_while_a_write_is_in_progress(publisher, name):
+    publisher.publish(make_state(1), 1.0)
+    reader = StateReader(name)
+    # 模拟写入方停在两次 seq 递增之间：seq 为奇数，数据只写了一半
+    buf = publisher.buf
+    SEQ.pack_into(buf, SEQ_OFFSET, 3)
+    PAYLOAD.pack_into(buf, SEQ_OFFSET + 8, 2, 2.0, 2.0, 2.0, 0.0, 0.0, 0.0, 0.0)
+    result = []
+    thread = threading.Thread(target=lambda: result.append(reader.read()), daemon=True)
+    thread.start()
+    thread.join(0.05)
+    assert thread.is_alive() and not result
+    PAYLOAD.pack_into(buf, SEQ_OFFSET + 8, 2, 2.0, 2.0, 2.0, 2.0, 2.0, 2.0, 2.0)
+    SEQ.pack_into(buf, SEQ_OFFSET, 4)
+    thread.join(1.0)
+    reader.close()
+    assert result == [(2, 2, 2.0, 2.0, 2.0, 2.0, 2.0, 2.0, 2.0)]
+
+
+def test_concurrent_reads_are_never_torn(publisher, name):
+    reader = StateReader(name)
+    stop = threading.Event()
+    def write():
+        value = 0
+        while not stop.is_set():
+            value += 1
+            publisher.publish(make_state(value), float(value))
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        for _ in range(20000):
+            seq, mask, t, *axes = reader.read()
+            assert mask == seq or seq == 0
+            assert t == mask and axes == [float(mask)] * 6
+    finally:
+        stop.set()
+        writer.join()
+        reader.close()
+
+
+def test_stale_segment_with_another_layout_is_recreated(name):
+    # 旧版本留下的段：大小不同、没有版本头
+    stale = shared_memory.SharedMemory(name=name, create=True, size=48)
+    stale.buf[:8] = b'\x02' + bytes(7)
+    stale.close()
+    publisher = StatePublisher(name)
+    try:
+        assert publisher.shm.size >= SIZE
+        reader = StateReader(name)
+        publisher.publish(make_state(5), 5.0)
+        assert reader.read()[:2] == (1, 5)
+        reader.close()
+    finally:
+        publisher.close()
+
+
+def test_reader_refuses_a_segment_without_the_header(name):
+    stale = shared_memory.SharedMemory(name=name, create=True, size=SIZE)
+    try:
+        with pytest.raises(ValueError):
+            StateReader(name)
+    finally:
+        stale.close()
+        stale.unlink()
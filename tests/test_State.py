@@ -0,0 +1,53 @@
+import gc
+import tracemalloc
+
+import pytest
+
+from bench import MAPPING, FakeJoystick, make_frame_loop
+from State import JoystickDecoder
+
+FRAMES = 5000
+
+
+@pytest.fixture
+def steady():
+    """预热后的稳定帧循环：解码 + 定时器 + 历史记录 + 全部 Action，与 bench.py alloc 相同。"""
+    joy = FakeJoystick()
+    decoder = JoystickDecoder(MAPPING)
+    decoder.bind(joy)
+    run = make_frame_loop(lambda: decoder.decode(joy))
+    run(1000)
+    return run
+
+
+def test_steady_loop_has_no_net_allocation(steady):
+    tracemalloc.start()
+    try:
+        steady(10)
+        before = tracemalloc.get_traced_memory()[0]
+        steady(FRAMES)
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    assert after - before == 0
+
+
+def test_steady_loop_triggers_no_gen0_collection(steady):
+    # 把第 0 代阈值压到 2：只要每帧还有一个容器对象跨过 for 循环存活，就会每帧触发一次回收
+    collections = []
+    def callback(phase, info):
+        if phase == 'start':
+            collections.append(info['generation'])
+    old_threshold = gc.get_threshold()
+    gc.collect()
+    gc.set_threshold(2, *old_threshold[1:])
+    gc.callbacks.append(callback)
+    try:
+        # gc.collect() 把计数清零时外层 for 循环的迭代器还活着，第一帧会因此补一次回收
+        steady(1)
+        collections.clear()
+        steady(FRAMES)
+    finally:
+        gc.callbacks.remove(callback)
+        gc.set_threshold(*old_threshold)
+    assert collections == []
@@ -0,0 +1,90 @@
+import math
+import random
+
+import pytest
+
+from Simulation import RecordingMouse
+from StickGesture import StickGestureAction
+
+FLICK = {'UP': 'FLICK_UP', 'DOWN': 'FLICK_DOWN', 'LEFT': 'FLICK_LEFT', 'RIGHT': 'FLICK_RIGHT'}
+
+
+def test_running_sums_across_wraparound():
+    action = StickGestureAction(window=12)
+    rng = random.Random(1)
+    pushed = []
+    for _ in range(12 * 50 + 5):   # 绕环形缓冲区多圈，停在中间位置
+        delta, interval = rng.uniform(-0.5, 0.5), rng.uniform(0.004, 0.012)
+        action._push(delta, interval)
+        pushed.append((delta, interval))
+        recent = pushed[-12:]
+        assert action.sum_delta == pytest.approx(sum(d for d, _ in recent), abs=1e-9)
+        assert action.sum_interval == pytest.approx(sum(i for _, i in recent), abs=1e-9)
+    assert action.count == 12
+    assert action.angular_velocity == pytest.approx(sum(d for d, _ in pushed[-12:]) / sum(i for _, i in pushed[-12:]))
+
+
+def test_angular_velocity_needs_full_window():
+    action = StickGestureAction(window=4)
+    for _ in range(3):
+        action._push(0.1, 0.01)
+    assert action.angular_velocity == 0.0
+    action._push(0.1, 0.01)
+    assert action.angular_velocity == pytest.approx(10.0)
+
+
+def test_spin_scrolls_once_per_step(drive):
+    action = StickGestureAction(step_angle=math.pi / 6, min_spin_speed=4.0, window=12)
+    pad = drive(action)
+    outputs = []
+    pad.mouse = RecordingMouse(outputs)
+    speed = 2 * math.pi * 2   # 每秒逆时针两圈
+    for i in range(125):       # 1 秒
+        angle = speed * i * pad.interval
+        pad.frame(rx=math.cos(angle), ry=math.sin(angle))
+    scrolls = [item for item in outputs if item[1] == 'scroll']
+    assert scrolls and all(item[3] > 0 for item in scrolls)
+    # 开始转圈前缓冲区里的角度也计入，总数等于转过的角度 / step_angle
+    assert len(scrolls) == pytest.approx(speed * 124 * pad.interval / (math.pi / 6), abs=1)
+
+
+def flick(pad, x, y, out_frames, hold_frames, back_frames=1):
+    """从中间用 out_frames 帧推到 (x, y)，保持 hold_frames 帧，再回到中间，返回回中各帧的状态。"""
+    pad.frame()
+    for k in range(1, out_frames + 1):
+        pad.frame(rx=x * k / out_frames, ry=y * k / out_frames)
+    for _ in range(hold_frames):
+        pad.frame(rx=x, ry=y)
+    return [pad.frame() for _ in range(back_frames)]
+
+
+@pytest.fixture
+def pad(drive):
+    return drive(StickGestureAction(flick=FLICK, rest_radius=0.25, flick_radius=0.9, flick_time=0.12, return_time=0.25))
+
+
+@pytest.mark.parametrize('x, y, name', [(0, 1, 'FLICK_UP'), (0, -1, 'FLICK_DOWN'), (-1, 0.3, 'FLICK_LEFT'), (1, -0.3, 'FLICK_RIGHT')])
+def test_flick_direction(pad, x, y, name):
+    states = flick(pad, x, y, out_frames=3, hold_frames=2)
+    assert [n for n, on in states[0]['buttons'].items() if on] == [name]
+
+
+def test_flick_pulse_lasts_one_frame(pad):
+    states = flick(pad, 0, 1, out_frames=3, hold_frames=2, back_frames=3)
+    assert [bool(state['buttons'].get('FLICK_UP')) for state in states] == [True, False, False]
+
+
+def test_slow_push_is_not_a_flick(pad):
+    # 30 帧推满：第 8 帧离开 rest_radius，第 27 帧才到 flick_radius，用了 19 帧 = 0.152 秒
+    states = flick(pad, 0, 1, out_frames=30, hold_frames=2)
+    assert not any(states[0]['buttons'].values())
+
+
+def test_late_return_is_not_a_flick(pad):
+    states = flick(pad, 0, 1, out_frames=3, hold_frames=40)   # 推出后 0.32 秒才回中
+    assert not any(states[0]['buttons'].values())
+
+
+def test_push_below_flick_radius_is_not_a_flick(pad):
+    states = flick(pad, 0, 0.85, out_frames=3, hold_frames=2)
+    assert not any(states[0]['buttons'].values())
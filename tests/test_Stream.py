@@ -0,0 +1,49 @@
+import threading
+
+from Stream import EDGE, MOTION, SNAPSHOT, StreamClient, StreamServer
+from State import button_bit, new_state
+
+A = button_bit('A')
+
+
+def test_edges_survive_a_full_queue(clock, tmp_path):
+    server = StreamServer(str(tmp_path / 'stream.sock'), queue_limit=32)
+    client = StreamClient(server.path)
+    state = new_state()
+    pressed = released = 0
+    try:
+        # 订阅者不读：先写满内核缓冲区，再让队列积压到上限，期间一直有摇杆运动和按键
+        frame = 0
+        while not server.subscribers or len(server.subscribers[0].queue) < 4 * server.queue_limit:
+            frame += 1
+            state['lx'] = (frame % 1000) / 1000.0
+            if frame % 10 == 0:
+                state['mask'] ^= A
+                if state['mask']: pressed += 1
+                else: released += 1
+            server.publish(state, clock.advance(0.008))
+            assert frame < 200000
+        sub = server.subscribers[0]
+        assert sub.dropped > 0
+        assert len(sub.queue) - sub.motions > server.queue_limit   # 按键事件不受队列上限影响
+
+        received = []
+        reader = threading.Thread(target=lambda: received.extend(client.messages()))
+        reader.start()
+        while server.subscribers and server.subscribers[0].queue:
+            server.publish(state, clock.advance(0.008))
+        server.close()
+        reader.join(5.0)
+    finally:
+        client.close()
+        server.close()
+
+    assert received[0][0] == SNAPSHOT
+    edges = [m for m in received if m[0] == EDGE]
+    # 运动消息被合并丢弃，但每一次按下和松开都按顺序送到了
+    assert sum(1 for m in edges if m[3] & A) == pressed
+    assert sum(1 for m in edges if m[4] & A) == released
+    assert [m[1] for m in edges] == sorted(m[1] for m in edges)
+    assert len([m for m in received if m[0] == MOTION]) < frame
+    assert client.mask == state['mask']
+    assert abs(client.axes['lx'] - state['lx']) < 1e-6
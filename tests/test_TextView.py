@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+pygame = pytest.importorskip('pygame')
+
+from TextView import TextPrint
+
+WHITE, BLACK = (255, 255, 255), (0, 0, 0)
+
+
+@pytest.fixture
+def screen():
+    pygame.font.init()
+    yield pygame.Surface((300, 100))
+    pygame.font.quit()
+
+
+def pixels(surface, rect):
+    return pygame.image.tobytes(surface.subsurface(rect), 'RGB')
+
+
+def draw(view, screen, *lines):
+    view.reset()
+    for line in lines:
+        view.tprint(screen, line)
+    return view.flush(screen)
+
+
+def test_font_taller_than_line_height_stays_in_band(screen):
+    # 与 joystick.py 相同：Font(None, 25) 的字形比 15 像素的行高更高
+    font = pygame.font.Font(None, 25)
+    assert font.get_linesize() > 15
+    view = TextPrint(font, BLACK, WHITE, x=10, y=10, line_height=15)
+    draw(view, screen, "Axis 0 value: -0.123", "Agjpqy Axis 1")
+    below = pygame.Rect(0, 25, 300, 15)
+    before = pixels(screen, below)
+
+    dirty = draw(view, screen, "Axis 0 value: +0.987", "Agjpqy Axis 1")
+    assert dirty and all(10 <= rect.top and rect.bottom <= 25 for rect in dirty)
+    assert pixels(screen, below) == before
+
+
+def test_unchanged_frame_has_no_dirty_rects(screen):
+    view = TextPrint(pygame.font.Font(None, 25), BLACK, WHITE, line_height=15)
+    assert draw(view, screen, "a", "b")[0] == screen.get_rect()   # 第一帧整屏重绘
+    assert draw(view, screen, "a", "b") == []
+
+
+def test_removed_line_is_erased(screen):
+    view = TextPrint(pygame.font.Font(None, 25), BLACK, WHITE, x=10, y=10, line_height=15)
+    draw(view, screen, "first", "second")
+    draw(view, screen, "first")
+    band = pixels(screen, pygame.Rect(0, 25, 300, 15))
+    assert band == bytes(WHITE) * (300 * 15)